@@ -0,0 +1,5 @@
+import sys
+
+from beezup.cli import main
+
+sys.exit(main())
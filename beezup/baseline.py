@@ -0,0 +1,141 @@
+import numpy as np
+import pandas as pd
+
+def normalize_cell_value(v) -> str:
+    """'code | label' -> 'code'; sinon valeur strippée; vide -> ''."""
+    if v is None or (isinstance(v, float) and pd.isna(v)):
+        return ""
+    s = str(v).strip()
+    if not s:
+        return ""
+    if "|" in s:
+        return s.split("|", 1)[0].strip()
+    return s
+
+class BaselineStore:
+    """
+    État courant (baseline live) des produits d'un canal, indexé par productId :
+    - overrides[product_id] = {attribute_id: valeur override} (normalisées)
+    - mappings[product_id]  = {attribute_id: valeur mappée} pour les attributs sans override
+    La valeur effective d'un attribut est l'override s'il existe, sinon la valeur mappée.
+    Les attribute_id (et valeurs) répétés d'un produit à l'autre sont partagés via un pool
+    de chaînes, pour que 50k produits x 200 attributs tiennent en mémoire.
+    """
+
+    def __init__(self):
+        self._overrides = {}
+        self._mappings = {}
+        self._pool = {}
+        self._index = None
+
+    def _shared(self, s: str) -> str:
+        return self._pool.setdefault(s, s)
+
+    @classmethod
+    def from_product_infos(cls, product_infos: list):
+        store = cls()
+        for prod in product_infos:
+            store.add_product(prod)
+        return store
+
+    def add_product(self, prod: dict):
+        """Ajoute (ou remplace) un productInfo de /channelCatalogs/{id}/products."""
+        pid = str(prod.get("productId", "")).strip()
+        if not pid:
+            return
+        overrides, mappings = {}, {}
+
+        for attr_id, obj in (prod.get("overrides", {}) or {}).items():
+            val = normalize_cell_value(obj.get("override", "")) if isinstance(obj, dict) else ""
+            if val:
+                overrides[self._shared(attr_id)] = self._shared(val)
+
+        # mapping si pas d'override
+        for attr_id, obj in (prod.get("attributeMappingValue", {}) or {}).items():
+            if attr_id in overrides:
+                continue
+            val = normalize_cell_value(obj.get("attributeMappingValue", "")) if isinstance(obj, dict) else ""
+            if val:
+                mappings[self._shared(attr_id)] = self._shared(val)
+
+        self._overrides[pid] = overrides
+        self._mappings[pid] = mappings
+        self._index = None
+
+    def __len__(self):
+        return len(self._overrides)
+
+    def __contains__(self, product_id):
+        return product_id in self._overrides
+
+    @property
+    def product_ids(self):
+        return list(self._overrides)
+
+    def index(self) -> "BaselineIndex":
+        """
+        Baseline au format long indexé par (produit, attribut), construit au premier appel
+        puis réutilisé jusqu'au prochain add_product.
+        """
+        if self._index is None:
+            self._index = BaselineIndex(self._overrides, self._mappings)
+        return self._index
+
+    def overrides(self, product_id: str) -> dict:
+        """Overrides actuels du produit ({attribute_id: valeur}) ; copie modifiable."""
+        return dict(self._overrides.get(product_id, {}))
+
+    def has_override(self, product_id: str, attribute_id: str) -> bool:
+        return attribute_id in self._overrides.get(product_id, {})
+
+    def effective(self, product_id: str, attribute_id: str) -> str:
+        """Valeur effective actuelle : override si présent, sinon mapping, sinon ''."""
+        override = self._overrides.get(product_id, {}).get(attribute_id)
+        if override is not None:
+            return override
+        return self._mappings.get(product_id, {}).get(attribute_id, "")
+
+class BaselineIndex:
+    """
+    Baseline au format long : une entrée par (produit, attribut) avec sa valeur effective
+    et son origine (override ou mapping), indexée sur une clé entière
+    code_produit * n_attributs + code_attribut. Les codes s'obtiennent avec
+    products.get_indexer / attributes.get_indexer (-1 si inconnu).
+    """
+
+    def __init__(self, overrides: dict, mappings: dict):
+        product_ids, attribute_ids, values, in_override = [], [], [], []
+        for source, flag in ((overrides, True), (mappings, False)):
+            for pid, attrs in source.items():
+                product_ids += [pid] * len(attrs)
+                attribute_ids += attrs.keys()
+                values += attrs.values()
+                in_override += [flag] * len(attrs)
+        product_codes, products = pd.factorize(np.array(product_ids, dtype=object))
+        attribute_codes, attributes = pd.factorize(np.array(attribute_ids, dtype=object))
+        self.products = pd.Index(products)
+        self.attributes = pd.Index(attributes)
+        self.n_attributes = max(len(attributes), 1)
+        self.keys = pd.Index(product_codes.astype(np.int64) * self.n_attributes + attribute_codes)
+        self.values = np.array(values, dtype=object)
+        self.in_override = np.array(in_override, dtype=bool)
+
+    def __len__(self):
+        return len(self.values)
+
+    def lookup(self, product_codes: np.ndarray, attribute_codes: np.ndarray):
+        """
+        Valeur effective et origine de chaque couple (code produit, code attribut).
+        Returns:
+            (effective, in_override) : '' / False pour un couple absent du baseline
+        """
+        positions = np.full(len(product_codes), -1, dtype=np.int64)
+        known = (product_codes >= 0) & (attribute_codes >= 0)
+        keys = product_codes[known].astype(np.int64) * self.n_attributes + attribute_codes[known]
+        positions[known] = self.keys.get_indexer(keys)
+        found = positions >= 0
+        effective = np.full(len(positions), "", dtype=object)
+        effective[found] = self.values[positions[found]]
+        in_override = np.zeros(len(positions), dtype=bool)
+        in_override[found] = self.in_override[positions[found]]
+        return effective, in_override
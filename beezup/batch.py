@@ -0,0 +1,159 @@
+import csv
+import os
+import tempfile
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import pandas as pd
+
+from beezup.cache import ResponseCache
+from beezup.client import BeezUPClient
+from beezup.pipeline import generate_template, template_filename
+from beezup.ratelimit import AdaptiveRateLimiter
+
+# Nombre de catalogues traités simultanément (un processus chacun)
+BATCH_WORKERS = 4
+# Débit de départ et plafond (req/s) pour toute la clé API, répartis entre les processus
+BATCH_RATE_LIMIT = 10.0
+BATCH_MAX_RATE = 50.0
+
+def read_jobs(path: str) -> list:
+    """
+    Lit un fichier CSV de jobs : colonnes catalog_id, eans_file et, optionnellement, store_name.
+    Les chemins eans_file relatifs sont résolus depuis le dossier du fichier de jobs.
+    """
+    base_dir = os.path.dirname(os.path.abspath(path))
+    jobs = []
+    with open(path, encoding="utf-8", newline="") as f:
+        for row in csv.DictReader(f):
+            catalog_id = (row.get("catalog_id") or "").strip()
+            eans_file = (row.get("eans_file") or "").strip()
+            if not catalog_id or not eans_file:
+                continue
+            jobs.append({
+                "catalog_id": catalog_id,
+                "eans_file": os.path.join(base_dir, eans_file),
+                "store_name": (row.get("store_name") or "").strip()
+            })
+    return jobs
+
+def _read_eans(path: str) -> list:
+    with open(path, encoding="utf-8") as f:
+        return [line.strip() for line in f if line.strip()]
+
+def _job_name(job: dict) -> str:
+    """Nom du template d'un job : boutique + catalogue, pour rester unique entre jobs d'une même boutique."""
+    return f"{job['store_name']}_{job['catalog_id']}" if job.get("store_name") else job["catalog_id"]
+
+def run_job(job: dict, api_key: str, output_dir: str, cache_path: str = None, base_url: str = None,
+            refresh_cache: bool = False, statuses=(), attribute_ids=(),
+            rate_limit: float = BATCH_RATE_LIMIT, max_rate: float = BATCH_MAX_RATE) -> dict:
+    """
+    Génère le template d'un catalogue (exécuté dans un processus du pool).
+    Le cache disque des métadonnées (SQLite) est partagé entre processus : les jobs d'une même
+    boutique réutilisent ses colonnes catalogue, et les listes de valeurs déjà récupérées.
+    rate_limit / max_rate : débit de départ et plafond du rate limiter de ce processus.
+    Ne lève pas d'exception : l'erreur éventuelle est renvoyée dans le rapport du job.
+    """
+    report = {
+        "job": job.get("index"),
+        "catalog_id": job["catalog_id"],
+        "store_name": job.get("store_name", ""),
+        "status": "OK",
+        "products": 0,
+        "output_file": "",
+        "seconds": 0.0,
+        "timings": {},
+        "calls": {},
+        "metrics": {}
+    }
+    start = time.perf_counter()
+    client = BeezUPClient(
+        api_key, cache=ResponseCache(cache_path) if cache_path else None, refresh_cache=refresh_cache,
+        rate_limiter=AdaptiveRateLimiter(rate=rate_limit, max_rate=max_rate)
+    )
+    if base_url:
+        client.BASE_URL = base_url
+    # Fichier partiel propre au job : un même catalogue peut figurer dans plusieurs jobs
+    fd, partial_file = tempfile.mkstemp(prefix=f"template_{job['catalog_id']}.", suffix=".partial.xlsx", dir=output_dir)
+    os.close(fd)
+    try:
+        with client:
+            result = generate_template(
+                client, job["catalog_id"], _read_eans(job["eans_file"]), partial_file,
+                statuses=statuses, attribute_ids=attribute_ids
+            )
+        output_file = os.path.join(output_dir, template_filename(job.get("name") or _job_name(job),
+                                                                 len(result["template_df"])))
+        os.replace(partial_file, output_file)
+        report.update({
+            "products": len(result["template_df"]),
+            "output_file": output_file,
+            "timings": result["timings"]
+        })
+    except Exception as e:
+        report["status"] = f"Erreur: {e}"
+        if os.path.exists(partial_file):
+            os.remove(partial_file)
+    report["seconds"] = time.perf_counter() - start
+    report["calls"] = dict(client.call_counts)
+    report["metrics"] = client.metrics.snapshot()
+    return report
+
+def run_batch(jobs: list, api_key: str, output_dir: str = ".", max_workers: int = BATCH_WORKERS,
+              on_job_done=None, rate_limit: float = BATCH_RATE_LIMIT, max_rate: float = BATCH_MAX_RATE,
+              **job_options) -> dict:
+    """
+    Exécute les jobs en parallèle sur un pool de processus.
+    rate_limit / max_rate valent pour toute la clé API : chaque processus en reçoit une part égale,
+    pour que N processus n'envoient pas N fois le débit prévu.
+    Un catalogue présent dans plusieurs jobs produit un template par job (nom suffixé du n° de job).
+    on_job_done(report, done, total) est appelé dans le processus appelant à chaque job terminé.
+    job_options : cache_path, base_url, refresh_cache, statuses, attribute_ids (voir run_job).
+    Returns:
+        dict : reports (dans l'ordre des jobs, avec leur n° "job"), wall_seconds, calls (total par type d'appel)
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    start = time.perf_counter()
+    reports = [None] * len(jobs)
+    workers = max(1, min(max_workers, len(jobs) or 1))
+    name_counts = Counter(_job_name(job) for job in jobs)
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = {}
+        for i, job in enumerate(jobs):
+            job = {**job, "index": i + 1}
+            if name_counts[_job_name(job)] > 1:
+                job["name"] = f"{_job_name(job)}_{i + 1}"
+            future = executor.submit(
+                run_job, job, api_key, output_dir,
+                rate_limit=rate_limit / workers, max_rate=max_rate / workers, **job_options
+            )
+            futures[future] = i
+        for done, future in enumerate(as_completed(futures), start=1):
+            reports[futures[future]] = future.result()
+            if on_job_done:
+                on_job_done(reports[futures[future]], done, len(jobs))
+
+    calls = {}
+    for report in reports:
+        for name, count in report["calls"].items():
+            calls[name] = calls.get(name, 0) + count
+    return {"reports": reports, "wall_seconds": time.perf_counter() - start, "calls": calls}
+
+def batch_report_dataframe(batch: dict) -> pd.DataFrame:
+    """Une ligne par job : statut, produits, durée, appels API (par type) et fichier généré."""
+    call_names = sorted({name for report in batch["reports"] for name in report["calls"]})
+    return pd.DataFrame([
+        {
+            "Job": report["job"],
+            "Catalog Id": report["catalog_id"],
+            "Store": report["store_name"],
+            "Status": report["status"],
+            "Products": report["products"],
+            "Seconds": round(report["seconds"], 1),
+            **{f"Calls {name}": report["calls"].get(name, 0) for name in call_names},
+            "Output": report["output_file"]
+        }
+        for report in batch["reports"]
+    ])
@@ -147,105 +147,143 @@
 
 #     print(f"\n✅ Fichier Excel généré avec styles tableaux, menus déroulants, commentaires et coloration des 'Required' : {output_file}")
 
+import logging
 import pandas as pd
 import xlsxwriter
 import numpy as np
 import math
 
-def build_and_export_excel(template_df, datainfo_df, dropdown_df, output_file="template_attributs.xlsx"):
+# Au-delà de ce nombre de cellules dans le Template, l'export passe en mode constant_memory
+# (xlsxwriter n'y gère pas add_table : les onglets reçoivent alors un en-tête stylé + autofiltre)
+CONSTANT_MEMORY_CELLS = 1_000_000
+
+FIXED_COLUMNS = [
+    "Channel Full Category Path", "Product Id", "Offer Code", "EAN", "Name", "Description", "Catalog Id"
+]
+
+def _is_blank(val):
     """
-    Exporte les DataFrames (template, datainfo, dropdowns) vers un fichier Excel
-    avec : tableau natif stylé, menus déroulants, commentaires sur headers, coloration "Required".
+    Vrai pour les valeurs à laisser vides dans Excel (None, NaN/NA/NaT, Inf).
+    """
+    if val is None or val is pd.NA or val is pd.NaT:
+        return True
+    return isinstance(val, float) and not math.isfinite(val)
+
+def _column(df, name, default=""):
+    """
+    Valeurs d'une colonne sous forme de liste (default si la colonne n'existe pas).
     """
+    return df[name].tolist() if name in df.columns else [default] * len(df)
 
-    # Helper pour écrire en évitant l'erreur NAN/INF
-    def safe_write(ws, row, col, val, cell_format=None):
-        """
-        Ecrit val dans la cellule (row, col). Si val est NaN/Inf, on écrit une chaîne vide.
-        """
-        # pandas.isna traite aussi les numpy.nan
-        if pd.isna(val):
-            ws.write(row, col, '', cell_format)
-            return
-        # float('inf') / -inf
-        if isinstance(val, float) and (math.isinf(val) or math.isnan(val)):
-            ws.write(row, col, '', cell_format)
-            return
-        # sinon écriture normale
-        ws.write(row, col, val, cell_format)
+def _write_sheet(ws, df, formats=None, header_format=None):
+    """
+    Ecrit l'en-tête puis les lignes de df dans l'ordre, chaque cellule une seule fois
+    (compatible constant_memory). formats : un format par colonne (None = sans format) ;
+    une cellule vide n'est écrite que si sa colonne porte un format.
+    """
+    if formats is None:
+        formats = [None] * len(df.columns)
+    for col_idx, col_name in enumerate(df.columns):
+        ws.write_string(0, col_idx, str(col_name), header_format)
+    for row_idx, values in enumerate(df.itertuples(index=False, name=None), start=1):
+        for col_idx, val in enumerate(values):
+            cell_format = formats[col_idx]
+            if _is_blank(val):
+                if cell_format is not None:
+                    ws.write_blank(row_idx, col_idx, None, cell_format)
+            else:
+                ws.write(row_idx, col_idx, val, cell_format)
 
-    # Optionnel : demander à xlsxwriter d'écrire NaN/Inf comme erreurs Excel
-    # (on remplace déjà les valeurs par des chaînes vides via safe_write,
-    #  mais ceci est une protection supplémentaire si d'autres API écrivent directement)
-    engine_kwargs = {"options": {"nan_inf_to_errors": True}}
+def _add_table(ws, df, name, style, constant_memory):
+    """
+    Tableau natif stylé sur df, ou autofiltre sur l'en-tête en mode constant_memory.
+    """
+    if constant_memory:
+        if len(df.columns):
+            ws.autofilter(0, 0, len(df), len(df.columns) - 1)
+        return
+    ws.add_table(
+        0, 0, len(df), len(df.columns) - 1,
+        {
+            "name": name,
+            "style": style,
+            "columns": [{"header": col} for col in df.columns]
+        }
+    )
 
-    with pd.ExcelWriter(output_file, engine="xlsxwriter", engine_kwargs=engine_kwargs) as writer:
-        # On écrit les DataFrames tels quels (les cellules potentiellement NaN seront gérées
-        # plus tard lors des writes formatés par safe_write). to_excel gère NaN en laissant vide.
-        template_df.to_excel(writer, sheet_name="Template", index=False)
-        datainfo_df.to_excel(writer, sheet_name="DataInfo", index=False)
-        dropdown_df.to_excel(writer, sheet_name="ListOfValues", index=False)
+def _datainfo_lookups(datainfo_df):
+    """
+    Construit en une passe colonne par colonne les correspondances issues de DataInfo :
+    commentaires par libellé, code de liste par libellé, libellés "Required".
+    """
+    ids = _column(datainfo_df, "Channel Attribute Id")
+    labels = [f"{name} | {attr_id}" for name, attr_id in zip(_column(datainfo_df, "Attribute Name"), ids)]
+    type_values = _column(datainfo_df, "Type Value")
+    statuses = _column(datainfo_df, "Status")
+    descriptions = _column(datainfo_df, "Attribute Description")
+    list_codes = _column(datainfo_df, "Attribute Value List Code", None)
 
-        workbook = writer.book
-        ws_template = writer.sheets["Template"]
-        ws_datainfo = writer.sheets["DataInfo"]
-        ws_dropdown = writer.sheets["ListOfValues"]
+    datainfo_map = {
+        label: (str(type_value), str(status), str(description))
+        for label, type_value, status, description in zip(labels, type_values, statuses, descriptions)
+    }
 
-        # --- Ajout des tableaux natifs avec style pour chaque onglet ---
-        ws_template.add_table(
-            0, 0, len(template_df), len(template_df.columns) - 1,
-            {
-                "name": "TemplateTable",
-                "style": "Table Style Medium 2",
-                "columns": [{"header": col} for col in template_df.columns]
-            }
-        )
-        ws_datainfo.add_table(
-            0, 0, len(datainfo_df), len(datainfo_df.columns) - 1,
-            {
-                "name": "DataInfoTable",
-                "style": "Table Style Medium 3",
-                "columns": [{"header": col} for col in datainfo_df.columns]
-            }
-        )
-        ws_dropdown.add_table(
-            0, 0, len(dropdown_df), len(dropdown_df.columns) - 1,
-            {
-                "name": "ListOfValuesTable",
-                "style": "Table Style Medium 5",
-                "columns": [{"header": col} for col in dropdown_df.columns]
-            }
-        )
+    # Dernière ligne gagnante par attribut, comme pour les dicts construits auparavant
+    id_to_label = dict(zip(ids, labels))
+    id_to_list = {
+        attr_id: (label, list_code)
+        for attr_id, label, list_code in zip(ids, labels, list_codes)
+        if pd.notnull(list_code)
+    }
+    label_to_listcode = {label: list_code for label, list_code in id_to_list.values()}
+    required_labels = {
+        id_to_label[attr_id]
+        for attr_id, status in zip(ids, statuses)
+        if str(status).strip().lower() == "required"
+    }
+    return datainfo_map, label_to_listcode, required_labels
 
-        # --- Appliquer le format couleur sur les colonnes fixes (après add_table) ---
-        fixed_cols = [
-            "Channel Full Category Path", "Product Id", "Offer Code", "EAN", "Name", "Description", "Catalog Id"
-        ]
+def build_and_export_excel(template_df, datainfo_df, dropdown_df, output_file="template_attributs.xlsx", constant_memory=None):
+    """
+    Exporte les DataFrames (template, datainfo, dropdowns) vers un fichier Excel
+    avec : tableau natif stylé, menus déroulants, commentaires sur headers, coloration "Required".
+    Chaque onglet est écrit ligne par ligne en une seule passe ; les formats sont résolus par colonne.
+    constant_memory : None = automatique selon la taille du Template (voir CONSTANT_MEMORY_CELLS).
+    """
+    if constant_memory is None:
+        constant_memory = template_df.size > CONSTANT_MEMORY_CELLS
+
+    workbook = xlsxwriter.Workbook(output_file, {
+        "constant_memory": constant_memory,
+        # Protection supplémentaire : les NaN/Inf sont déjà laissés vides par _write_sheet
+        "nan_inf_to_errors": True
+    })
+    try:
+        ws_template = workbook.add_worksheet("Template")
+        ws_datainfo = workbook.add_worksheet("DataInfo")
+        ws_dropdown = workbook.add_worksheet("ListOfValues")
+
+        header_format = workbook.add_format({"bold": True, "bg_color": "#4f81bd", "font_color": "#ffffff"}) if constant_memory else None
         fixed_format = workbook.add_format({
             "bg_color": "#eaedf6",
             "font_color": "#000000",
             "align": "left",
             "valign": "vcenter"
         })
+        required_format = workbook.add_format({"bg_color": "#ffe1db", "font_color": "#000000", "align": "left", "valign": "vcenter"})
 
-        for col_name in fixed_cols:
-            if col_name in template_df.columns:
-                col_idx = template_df.columns.get_loc(col_name)
-                # On commence à row=1 pour ne pas toucher au header du tableau
-                for row_idx in range(1, len(template_df) + 1):
-                    # récupère la valeur depuis le DataFrame original, mais écrit via safe_write
-                    val = template_df.iloc[row_idx - 1, col_idx]
-                    safe_write(ws_template, row_idx, col_idx, val, fixed_format)
+        datainfo_map, label_to_listcode, required_labels = _datainfo_lookups(datainfo_df)
+
+        # --- Format par colonne : "Required" prioritaire sur les colonnes fixes ---
+        template_formats = [
+            required_format if col_name in required_labels
+            else fixed_format if col_name in FIXED_COLUMNS
+            else None
+            for col_name in template_df.columns
+        ]
 
         # --- Ajout des commentaires dynamiques sur headers attributs dynamiques ---
-        datainfo_map = {
-            f"{row['Attribute Name']} | {row['Channel Attribute Id']}": (
-                str(row.get("Type Value", "")),
-                str(row.get("Status", "")),
-                str(row.get("Attribute Description", ""))
-            )
-            for _, row in datainfo_df.iterrows()
-        }
+        # (avant les lignes : en constant_memory, une ligne déjà écrite ne peut plus être modifiée)
         for col_idx, col_name in enumerate(template_df.columns):
             if col_name in datainfo_map:
                 type_value, status, description = datainfo_map[col_name]
@@ -268,61 +306,42 @@ def build_and_export_excel(template_df, datainfo_df, dropdown_df, output_file="t
                     }
                 )
 
-        # --- Menus déroulants sur attributs de type liste ---
-        id_to_listcode = {
-            row["Channel Attribute Id"]: row["Attribute Value List Code"]
-            for _, row in datainfo_df[datainfo_df["Attribute Value List Code"].notnull()].iterrows()
-        }
-        id_to_label = {
-            row["Channel Attribute Id"]: f"{row['Attribute Name']} | {row['Channel Attribute Id']}"
-            for _, row in datainfo_df[datainfo_df["Attribute Value List Code"].notnull()].iterrows()
-        }
-        label_to_listcode = {
-            id_to_label[attr_id]: list_code
-            for attr_id, list_code in id_to_listcode.items()
-        }
-        for col_idx, col_name in enumerate(template_df.columns):
-            if col_name in label_to_listcode:
-                list_code = label_to_listcode[col_name]
-                if list_code in dropdown_df.columns:
-                    col_values = dropdown_df[list_code].dropna()
-                    if len(col_values) == 0:
-                        continue
-                    col_excel = xlsxwriter.utility.xl_col_to_name(dropdown_df.columns.get_loc(list_code))
-                    first_row = 1  # Données à partir de la 2e ligne (ligne 1 = header)
-                    list_start_row = first_row + 1
-                    list_end_row = list_start_row + len(col_values) - 1
-                    dropdown_range = f"ListOfValues!${col_excel}${list_start_row}:${col_excel}${list_end_row}"
-
-                    ws_template.data_validation(
-                        first_row=first_row,
-                        last_row=first_row + len(template_df) - 1,
-                        first_col=col_idx,
-                        last_col=col_idx,
-                        options={
-                            "validate": "list",
-                            "source": dropdown_range
-                        }
-                    )
+        _write_sheet(ws_template, template_df, template_formats, header_format)
+        _write_sheet(ws_datainfo, datainfo_df, header_format=header_format)
+        _write_sheet(ws_dropdown, dropdown_df, header_format=header_format)
 
-        # --- Coloration des cellules "Required" du tableau uniquement ---
-        id_to_label_full = {
-            row["Channel Attribute Id"]: f"{row['Attribute Name']} | {row['Channel Attribute Id']}"
-            for _, row in datainfo_df.iterrows()
-        }
-        required_cols = [
-            id_to_label_full[row["Channel Attribute Id"]]
-            for _, row in datainfo_df.iterrows()
-            if str(row["Status"]).strip().lower() == "required" and row["Channel Attribute Id"] in id_to_label_full
-        ]
-        required_format = workbook.add_format({"bg_color": "#ffe1db", "font_color": "#000000", "align": "left", "valign": "vcenter"})
-        for col_name in required_cols:
-            if col_name in template_df.columns:
-                col_idx = template_df.columns.get_loc(col_name)
-                for row_idx in range(1, len(template_df) + 1):  # 1 = première ligne de données
-                    val = template_df.iloc[row_idx - 1, col_idx]
-                    safe_write(ws_template, row_idx, col_idx, val, required_format)
+        # --- Ajout des tableaux natifs avec style pour chaque onglet ---
+        _add_table(ws_template, template_df, "TemplateTable", "Table Style Medium 2", constant_memory)
+        _add_table(ws_datainfo, datainfo_df, "DataInfoTable", "Table Style Medium 3", constant_memory)
+        _add_table(ws_dropdown, dropdown_df, "ListOfValuesTable", "Table Style Medium 5", constant_memory)
 
-    print(f"\n✅ Fichier Excel généré avec styles tableaux, menus déroulants, commentaires et coloration des 'Required' : {output_file}")
+        # --- Menus déroulants sur attributs de type liste ---
+        dropdown_counts = dropdown_df.notna().sum()
+        for col_idx, col_name in enumerate(template_df.columns):
+            list_code = label_to_listcode.get(col_name)
+            if list_code is None or list_code not in dropdown_df.columns:
+                continue
+            value_count = int(dropdown_counts[list_code])
+            if value_count == 0:
+                continue
+            col_excel = xlsxwriter.utility.xl_col_to_name(dropdown_df.columns.get_loc(list_code))
+            first_row = 1  # Données à partir de la 2e ligne (ligne 1 = header)
+            list_start_row = first_row + 1
+            list_end_row = list_start_row + value_count - 1
+            dropdown_range = f"ListOfValues!${col_excel}${list_start_row}:${col_excel}${list_end_row}"
 
+            ws_template.data_validation(
+                first_row=first_row,
+                last_row=first_row + len(template_df) - 1,
+                first_col=col_idx,
+                last_col=col_idx,
+                options={
+                    "validate": "list",
+                    "source": dropdown_range
+                }
+            )
+    finally:
+        workbook.close()
 
+    # Journalisé (stderr) : la sortie standard de la CLI ne contient que le chemin du fichier
+    logging.info(f"✅ Fichier Excel généré avec styles tableaux, menus déroulants, commentaires et coloration des 'Required' : {output_file}")
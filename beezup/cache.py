@@ -0,0 +1,123 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+class ResponseCache:
+    """
+    Cache disque (SQLite) des réponses JSON de l'API BeezUP.
+    - Clé : (hash de la clé API, route, paramètres), voir make_key.
+    - Chaque entrée a sa propre durée de vie (TTL) et conserve ETag / Last-Modified
+      pour une revalidation conditionnelle une fois expirée.
+    - Taille bornée : au-delà de max_bytes, les entrées les moins récemment lues sont supprimées (LRU).
+    Le fichier peut être partagé entre threads, sessions Streamlit et processus.
+    """
+
+    def __init__(self, path=".cache/beezup_responses.sqlite", max_bytes=200 * 1024 * 1024):
+        self.path = path
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS responses (
+                    key TEXT PRIMARY KEY,
+                    route TEXT NOT NULL,
+                    body TEXT NOT NULL,
+                    etag TEXT,
+                    last_modified TEXT,
+                    expires_at REAL NOT NULL,
+                    last_access REAL NOT NULL,
+                    size INTEGER NOT NULL
+                )
+                """
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_responses_access ON responses(last_access)")
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    @staticmethod
+    def hash_api_key(api_key):
+        """Empreinte de la clé API (la clé elle-même n'est jamais stockée)."""
+        return hashlib.sha256(api_key.encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def make_key(api_key_hash, route, params=None):
+        raw = json.dumps([api_key_hash, route, params or {}], sort_keys=True, default=str)
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def lookup(self, key):
+        """
+        Renvoie l'entrée {"body", "etag", "last_modified", "fresh"} ou None si absente.
+        Une entrée expirée est renvoyée avec fresh=False (utilisable pour revalider).
+        """
+        now = time.time()
+        with self._lock, self._connect() as conn:
+            row = conn.execute(
+                "SELECT body, etag, last_modified, expires_at FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            conn.execute("UPDATE responses SET last_access = ? WHERE key = ?", (now, key))
+        body, etag, last_modified, expires_at = row
+        return {
+            "body": json.loads(body),
+            "etag": etag,
+            "last_modified": last_modified,
+            "fresh": expires_at > now
+        }
+
+    def store(self, key, route, body, ttl, etag=None, last_modified=None):
+        """Enregistre (ou remplace) une réponse, puis applique la borne de taille."""
+        now = time.time()
+        raw = json.dumps(body, separators=(",", ":"))
+        with self._lock, self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (key, route, raw, etag, last_modified, now + ttl, now, len(raw))
+            )
+            self._evict(conn)
+
+    def touch(self, key, ttl):
+        """Prolonge une entrée revalidée (réponse 304 Not Modified)."""
+        now = time.time()
+        with self._lock, self._connect() as conn:
+            conn.execute(
+                "UPDATE responses SET expires_at = ?, last_access = ? WHERE key = ?", (now + ttl, now, key)
+            )
+
+    def invalidate(self, key):
+        with self._lock, self._connect() as conn:
+            conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+
+    def clear(self):
+        with self._lock, self._connect() as conn:
+            conn.execute("DELETE FROM responses")
+
+    def _evict(self, conn):
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        excess = total - self.max_bytes
+        freed = 0
+        victims = []
+        for key, size in conn.execute("SELECT key, size FROM responses ORDER BY last_access ASC"):
+            victims.append((key,))
+            freed += size
+            if freed >= excess:
+                break
+        conn.executemany("DELETE FROM responses WHERE key = ?", victims)
@@ -0,0 +1,60 @@
+import pandas as pd
+
+class CategoryIndex:
+    """
+    Index bidirectionnel des catégories d'un channelCatalog, construit une seule fois
+    à partir de la réponse /channelCatalogs/{catalog_id}/categories :
+    - code catégorie catalogue (Octopia) -> chemins canal de vente ("A > B > C")
+    - chemin canal de vente -> codes catégorie catalogue
+    Chaque recherche se fait en O(1) par code ; l'index est réutilisable entre étapes et relances.
+    """
+
+    def __init__(self, configurations: list):
+        self.code_to_paths = {}
+        self.path_to_codes = {}
+        for config in configurations:
+            formatted_path = " > ".join(config.get("channelCategoryPath", []))
+            for code in config.get("catalogCategoryPath", []):
+                # dict comme ensemble ordonné : conserve l'ordre des configurations
+                self.code_to_paths.setdefault(code, {})[formatted_path] = None
+                self.path_to_codes.setdefault(formatted_path, {})[code] = None
+
+    @classmethod
+    def from_response(cls, response: dict):
+        return cls((response or {}).get("channelCatalogCategoryConfigurations", []))
+
+    @classmethod
+    def fetch(cls, client, catalog_id: str):
+        """Construit l'index depuis l'API ; None si la récupération échoue."""
+        response = client.get_category_mapping_data(catalog_id)
+        if not response:
+            return None
+        return cls.from_response(response)
+
+    def paths_for(self, code) -> list:
+        """Chemins canal associés à un code catégorie catalogue."""
+        return list(self.code_to_paths.get(code, ()))
+
+    def codes_for(self, path: str) -> list:
+        """Codes catégorie catalogue associés à un chemin canal."""
+        return list(self.path_to_codes.get(path, ()))
+
+    def channel_paths(self, codes) -> list:
+        """Chemins canal (non vides, triés) des configurations contenant au moins un des codes."""
+        paths = set()
+        for code in set(codes):
+            paths.update(self.code_to_paths.get(code, ()))
+        paths.discard("")
+        return sorted(paths)
+
+    def mapping_dataframe(self, codes) -> pd.DataFrame:
+        """DataFrame "Category Code" / "Channel Full Category Path" pour les codes demandés."""
+        category_codes, channel_paths = [], []
+        for code in dict.fromkeys(codes):
+            for path in self.code_to_paths.get(code, ()):
+                category_codes.append(code)
+                channel_paths.append(path)
+        return pd.DataFrame({
+            "Category Code": category_codes,
+            "Channel Full Category Path": channel_paths
+        })
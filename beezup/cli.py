@@ -0,0 +1,231 @@
+import argparse
+import json
+import os
+import sys
+import time
+
+import pandas as pd
+
+from beezup.batch import BATCH_RATE_LIMIT, BATCH_WORKERS, batch_report_dataframe, read_jobs, run_batch
+from beezup.cache import ResponseCache
+from beezup.client import BeezUPClient
+from beezup.extractor import IncompleteExtractionError
+from beezup.overrides import split_noop
+from beezup.pipeline import apply_template, generate_template, template_filename
+
+# Intervalle minimal (s) entre deux lignes de progression pendant l'envoi
+PROGRESS_INTERVAL = 2.0
+
+def _log(message):
+    print(message, file=sys.stderr, flush=True)
+
+def _stage_logger():
+    """on_stage(libellé, secondes) -> ligne '[  cumul s] libellé (durée s)' sur stderr."""
+    start = time.perf_counter()
+
+    def on_stage(label, seconds):
+        _log(f"[{time.perf_counter() - start:8.1f} s] {label} ({seconds:.1f} s)")
+    return on_stage
+
+def _progress_logger():
+    """on_progress(done, total, rate, eta) limité à une ligne toutes les PROGRESS_INTERVAL s."""
+    last = [0.0]
+
+    def on_progress(done, total, rate, eta):
+        now = time.monotonic()
+        if done < total and now - last[0] < PROGRESS_INTERVAL:
+            return
+        last[0] = now
+        _log(f"  envoi {done}/{total} produits — {rate:.1f} produits/s — reste ~{int(eta)} s")
+    return on_progress
+
+def _read_lines(path):
+    """Lignes non vides d'un fichier texte ('-' = entrée standard)."""
+    if path == "-":
+        lines = sys.stdin.read().splitlines()
+    else:
+        with open(path, encoding="utf-8") as f:
+            lines = f.read().splitlines()
+    return [line.strip() for line in lines if line.strip()]
+
+def _api_key(args):
+    api_key = args.api_key or os.environ.get("BEEZUP_API_KEY")
+    if not api_key:
+        raise SystemExit("Clé API manquante : --api-key ou variable d'environnement BEEZUP_API_KEY")
+    return api_key
+
+def _attribute_ids(args):
+    attribute_ids = list(args.attribute or [])
+    if args.attributes_file:
+        attribute_ids += _read_lines(args.attributes_file)
+    return attribute_ids
+
+def _write_metrics(args, data):
+    """Écrit les mesures (étapes, appels API, DataFrames) en JSON si --metrics est fourni."""
+    if args.metrics:
+        with open(args.metrics, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False, indent=2)
+        _log(f"Mesures : {args.metrics}")
+
+def _make_client(args):
+    api_key = _api_key(args)
+    cache = None if args.no_cache else ResponseCache(args.cache_path)
+    client = BeezUPClient(api_key, cache=cache, refresh_cache=args.refresh_cache)
+    client.BASE_URL = args.base_url
+    return client
+
+def run_generate(args):
+    eans = _read_lines(args.eans)
+    attribute_ids = _attribute_ids(args)
+    if not eans:
+        raise SystemExit("Aucun EAN à traiter")
+
+    # Nom provisoire tant que le nombre de produits n'est pas connu
+    output_file = args.output or f"template_{os.getpid()}.xlsx"
+    _log(f"Génération du template : {len(eans)} EAN(s), catalogue {args.catalog_id}")
+    client = _make_client(args)
+    try:
+        with client:
+            result = generate_template(
+                client, args.catalog_id, eans, output_file,
+                statuses=args.status or (), attribute_ids=attribute_ids, on_stage=_stage_logger()
+            )
+    finally:
+        _write_metrics(args, client.metrics.snapshot())
+    if not args.output:
+        final_name = template_filename(args.store_name, len(result["template_df"]))
+        os.replace(output_file, final_name)
+        output_file = final_name
+
+    for name in result["duplicate_names"]:
+        _log(f"⚠️ Attribut encore en double : {name}")
+    if result["renamed_columns"]:
+        _log("⚠️ Des colonnes en double ont été renommées (ex: 'Attribut | ID_2')")
+    _log(f"✅ {len(result['template_df'])} produit(s) — {output_file} "
+         f"({sum(result['timings'].values()):.1f} s)")
+    print(output_file)
+    return 0
+
+def run_apply(args):
+    _log(f"Réintégration de {args.template} dans le catalogue {args.catalog_id}"
+         + (" (simulation)" if args.dry_run else ""))
+    client = _make_client(args)
+    try:
+        with client:
+            result = apply_template(
+                client, args.catalog_id, args.template, dry_run=args.dry_run,
+                on_stage=_stage_logger(), on_progress=_progress_logger()
+            )
+    finally:
+        _write_metrics(args, client.metrics.snapshot())
+    candidates = result["candidates"]
+    to_send, unchanged = split_noop(candidates)
+    _log(f"Produits : {len(candidates)} — à mettre à jour : {len(to_send)}, sans changement : {len(unchanged)} — "
+         f"attributs envoyés (total) : {sum(c['count'] for c in to_send)}")
+
+    if args.dry_run:
+        report = pd.DataFrame([
+            {"EAN": c["EAN"], "Product Id": c["Product Id"], "Count": c["count"], "Changes": c.get("changes", 0)}
+            for c in candidates
+        ])
+        failed = 0
+    else:
+        report = pd.DataFrame(result["status_rows"])
+        failed = int(report["Status"].str.startswith("Erreur").sum()) if not report.empty else 0
+        _log(f"{'✅' if not failed else '❌'} Envoi terminé : {len(to_send) - failed} OK / {failed} en erreur / "
+             f"{len(unchanged)} sans changement ({sum(result['timings'].values()):.1f} s)")
+    if args.report:
+        report.to_csv(args.report, index=False)
+        _log(f"Rapport : {args.report}")
+    return 1 if failed else 0
+
+def run_batch_jobs(args):
+    jobs = read_jobs(args.jobs)
+    if not jobs:
+        raise SystemExit("Aucun job (colonnes attendues : catalog_id, eans_file[, store_name])")
+    _log(f"Lot de {len(jobs)} catalogue(s) sur {args.workers} processus — {args.rate_limit:g} req/s au total")
+
+    def on_job_done(report, done, total):
+        _log(f"[{done}/{total}] {report['catalog_id']} : {report['status']} — "
+             f"{report['products']} produit(s) en {report['seconds']:.1f} s")
+
+    batch = run_batch(
+        jobs, _api_key(args), output_dir=args.output_dir, max_workers=args.workers, on_job_done=on_job_done,
+        rate_limit=args.rate_limit,
+        cache_path=None if args.no_cache else args.cache_path, base_url=args.base_url,
+        refresh_cache=args.refresh_cache, statuses=tuple(args.status or ()), attribute_ids=tuple(_attribute_ids(args))
+    )
+    # Par n° de job : un même catalogue peut figurer dans plusieurs jobs
+    _write_metrics(args, {
+        str(r["job"]): {"catalog_id": r["catalog_id"], "store_name": r["store_name"], "metrics": r["metrics"]}
+        for r in batch["reports"]
+    })
+    report = batch_report_dataframe(batch)
+    failed = int((report["Status"] != "OK").sum())
+    job_seconds = sum(r["seconds"] for r in batch["reports"])
+    calls = ", ".join(f"{name}: {count}" for name, count in sorted(batch["calls"].items()))
+    _log(f"{'✅' if not failed else '❌'} {len(jobs) - failed} OK / {failed} en erreur — "
+         f"{report['Products'].sum()} produit(s) en {batch['wall_seconds']:.1f} s "
+         f"(cumul des jobs {job_seconds:.1f} s)")
+    _log(f"Appels API : {calls or 'aucun'}")
+    if args.report:
+        report.to_csv(args.report, index=False)
+        _log(f"Rapport : {args.report}")
+    return 1 if failed else 0
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog="python -m beezup",
+        description="Génération et réintégration des templates produits BeezUP, sans interface."
+    )
+    parser.add_argument("--api-key", help="Clé API BeezUP (défaut : variable BEEZUP_API_KEY)")
+    parser.add_argument("--base-url", default=BeezUPClient.BASE_URL, help="URL de l'API (défaut : %(default)s)")
+    parser.add_argument("--cache-path", default=".cache/beezup_responses.sqlite",
+                        help="Cache disque des métadonnées catalogue")
+    parser.add_argument("--no-cache", action="store_true", help="Désactive le cache disque")
+    parser.add_argument("--refresh-cache", action="store_true", help="Recharge les métadonnées depuis l'API")
+    parser.add_argument("--metrics", help="Fichier JSON des mesures : étapes, appels API par endpoint, DataFrames")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    gen = sub.add_parser("generate", help="EANs -> template Excel")
+    gen.add_argument("--catalog-id", required=True, help="Channel Catalog ID")
+    gen.add_argument("--eans", required=True, help="Fichier d'EANs, un par ligne ('-' = entrée standard)")
+    gen.add_argument("--status", action="append", choices=["Required", "Recommended", "Optional"],
+                     help="Attributs à inclure selon leur statut (répétable)")
+    gen.add_argument("--attribute", action="append", help="Channel Attribute Id à inclure (répétable)")
+    gen.add_argument("--attributes-file", help="Fichier de Channel Attribute Id, un par ligne")
+    gen.add_argument("--store-name", default="", help="Nom de la boutique (nom du fichier par défaut)")
+    gen.add_argument("--output", help="Fichier .xlsx de sortie (défaut : template_{boutique}_{date} [n products].xlsx)")
+    gen.set_defaults(func=run_generate)
+
+    bat = sub.add_parser("batch", help="Plusieurs catalogues en parallèle -> un template par catalogue")
+    bat.add_argument("jobs", help="CSV des jobs : catalog_id, eans_file[, store_name]")
+    bat.add_argument("--output-dir", default=".", help="Dossier des templates générés")
+    bat.add_argument("--workers", type=int, default=BATCH_WORKERS, help="Catalogues traités simultanément")
+    bat.add_argument("--rate-limit", type=float, default=BATCH_RATE_LIMIT,
+                     help="Débit de départ (req/s) pour la clé API, réparti entre les processus (défaut : %(default)s)")
+    bat.add_argument("--status", action="append", choices=["Required", "Recommended", "Optional"],
+                     help="Attributs à inclure selon leur statut (répétable)")
+    bat.add_argument("--attribute", action="append", help="Channel Attribute Id à inclure (répétable)")
+    bat.add_argument("--attributes-file", help="Fichier de Channel Attribute Id, un par ligne")
+    bat.add_argument("--report", help="Fichier CSV du rapport par catalogue (durées, appels API)")
+    bat.set_defaults(func=run_batch_jobs)
+
+    app = sub.add_parser("apply", help="Template rempli -> overrides BeezUP")
+    app.add_argument("template", help="Template Excel rempli (.xlsx)")
+    app.add_argument("--catalog-id", required=True, help="Channel Catalog ID")
+    app.add_argument("--dry-run", action="store_true", help="Calcule le plan sans rien envoyer")
+    app.add_argument("--report", help="Fichier CSV du statut par produit (ou du plan en simulation)")
+    app.set_defaults(func=run_apply)
+    return parser
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    try:
+        return args.func(args)
+    except (IncompleteExtractionError, ValueError) as e:
+        _log(f"❌ {e}")
+        return 1
+
+if __name__ == "__main__":
+    sys.exit(main())
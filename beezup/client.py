@@ -1,106 +1,297 @@
+import copy
 import requests
 import logging
+import threading
+import time
+from collections import Counter
+from requests.adapters import HTTPAdapter
+
+from beezup.cache import ResponseCache
+from beezup.metrics import Metrics
+from beezup.ratelimit import AdaptiveRateLimiter, parse_retry_after
+from beezup.retry import RETRYABLE_STATUSES, CircuitBreaker, backoff_delay
 
 class BeezUPClient:
     """
     Client pour interagir avec l'API BeezUP v2.
     Gère les méthodes GET, POST, PUT avec gestion d'erreur centralisée.
     Fournit des méthodes utilitaires pour chaque endpoint clé utilisé dans le projet.
+    Les requêtes passent par une session HTTP partagée (pool de connexions keep-alive),
+    utilisable depuis plusieurs threads, et par un rate limiter adaptatif (429/503, Retry-After).
+    Les requêtes idempotentes sont reprises avec backoff ; un coupe-circuit stoppe les envois
+    quand l'API ne répond plus.
+    Si un ResponseCache est fourni, les endpoints de métadonnées catalogue sont mis en cache
+    disque (TTL par endpoint, revalidation ETag / Last-Modified) ; refresh=True force l'appel API.
+    Chaque requête est mesurée dans self.metrics (voir beezup.metrics) : nombre, statuts,
+    octets et latence par endpoint.
     """
 
     BASE_URL = "https://api.beezup.com/v2"
 
-    def __init__(self, api_key):
+    # Durée de vie (s) des réponses en cache, par endpoint
+    CACHE_TTLS = {
+        "channel_catalog": 3600,
+        "catalog_columns": 24 * 3600,
+        "category_mapping": 6 * 3600,
+        "channel_attributes": 24 * 3600,
+        "attribute_value_list": 24 * 3600,
+        # Listes de valeurs déjà formatées, partagées par code de liste (voir beezup.value_lists)
+        "value_list": 24 * 3600,
+        "custom_columns": 3600,
+    }
+
+    def __init__(self, api_key, pool_size=20, rate_limit=10.0, rate_limiter=None, max_throttle_retries=3, max_retries=3,
+                 cache=None, cache_ttls=None, refresh_cache=False, metrics=None):
         self.headers = {
             "Content-Type": "application/json",
             "Accept-Encoding": "gzip, deflate, br",
             "X-BeezUP-Decrypted-Expression": "true",
             "Ocp-Apim-Subscription-Key": api_key
         }
+        self.pool_size = pool_size
+        self.rate_limiter = rate_limiter or AdaptiveRateLimiter(rate=rate_limit)
+        self.max_throttle_retries = max_throttle_retries
+        self.max_retries = max_retries
+        self.circuit_breaker = CircuitBreaker()
+        self.cache = cache
+        self.cache_ttls = {**self.CACHE_TTLS, **(cache_ttls or {})}
+        self.refresh_cache = refresh_cache
+        self._api_key_hash = ResponseCache.hash_api_key(api_key)
+        # Client propriétaire de la session HTTP (lui-même, ou celui dont on est une vue)
+        self._owner = self
+        self._session = None
+        self._session_lock = threading.Lock()
+        # Compteurs d'appels : requêtes HTTP par méthode, 429/503, réponses servies par le cache
+        self.call_counts = Counter()
+        self._counts_lock = threading.Lock()
+        self.metrics = metrics or Metrics()
+
+    @property
+    def session(self):
+        """
+        Session requests partagée, créée à la première utilisation.
+        Le pool urllib3 sous-jacent est thread-safe : pool_size connexions
+        sont conservées ouvertes vers api.beezup.com et réutilisées.
+        """
+        owner = self._owner
+        if owner._session is None:
+            with owner._session_lock:
+                if owner._session is None:
+                    session = requests.Session()
+                    adapter = HTTPAdapter(
+                        pool_connections=1,
+                        pool_maxsize=self.pool_size,
+                        pool_block=True
+                    )
+                    session.mount("https://", adapter)
+                    session.mount("http://", adapter)
+                    session.headers.update(self.headers)
+                    owner._session = session
+        return owner._session
+
+    def close(self):
+        """Ferme la session et libère les connexions du pool (partagés avec les vues)."""
+        owner = self._owner
+        with owner._session_lock:
+            if owner._session is not None:
+                owner._session.close()
+                owner._session = None
+
+    def view(self, refresh_cache=False, metrics=None):
+        """
+        Vue du client pour un appelant (session Streamlit...) : même pool de connexions,
+        rate limiter, coupe-circuit et cache disque, mais refresh_cache et compteurs d'appels
+        propres, et mesures dans metrics si fourni (sinon celles du client partagé).
+        Une seule instance par clé API régule ainsi le débit de tous les appelants.
+        """
+        view = copy.copy(self)
+        view.refresh_cache = refresh_cache
+        view.call_counts = Counter()
+        view._counts_lock = threading.Lock()
+        if metrics is not None:
+            view.metrics = metrics
+        return view
+
+    def _count(self, name):
+        with self._counts_lock:
+            self.call_counts[name] += 1
+        self.metrics.increment(name)
 
-    def get(self, route, params=None):
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _send(self, method, route, params=None, data=None, timeout=10, headers=None):
+        """
+        Envoie une requête via la session partagée en respectant le rate limiter.
+        Sur 429/503, le limiter réduit le débit (et attend Retry-After) puis la requête
+        est renvoyée, au plus max_throttle_retries fois. Renvoie la réponse brute.
+        """
         url = f"{self.BASE_URL}{route}"
-        try:
-            resp = requests.get(url, headers=self.headers, params=params, timeout=10)
-            resp.raise_for_status()
-            return resp.json()
-        except requests.exceptions.Timeout:
-            logging.error(f"[BeezUPClient] Timeout lors de la requête GET : {url}")
-        except requests.exceptions.ConnectionError:
-            logging.error(f"[BeezUPClient] Erreur de connexion lors de la requête GET : {url}")
-        except requests.exceptions.HTTPError:
-            logging.error(f"[BeezUPClient] Erreur HTTP {resp.status_code} pour l'URL {url} : {resp.text}")
-        except Exception as e:
-            logging.error(f"[BeezUPClient] Erreur inattendue lors de la requête GET : {e}")
-        return None
+        for attempt in range(self.max_throttle_retries + 1):
+            self.rate_limiter.acquire()
+            self._count(method)
+            start = time.perf_counter()
+            try:
+                resp = self.session.request(method, url, params=params, json=data, timeout=timeout, headers=headers)
+            except requests.exceptions.RequestException:
+                self.metrics.record_request(method, route, None, time.perf_counter() - start)
+                raise
+            self.metrics.record_request(
+                method, route, resp.status_code, time.perf_counter() - start,
+                bytes_sent=len(resp.request.body or b""), bytes_received=len(resp.content)
+            )
+            if resp.status_code not in (429, 503):
+                self.rate_limiter.on_success()
+                return resp
+            self._count("throttled")
+            self.rate_limiter.on_throttle(parse_retry_after(resp.headers.get("Retry-After")))
+            logging.warning(
+                f"[BeezUPClient] {resp.status_code} sur {method} {url}, "
+                f"débit réduit à {self.rate_limiter.rate:.1f} req/s (tentative {attempt + 1})"
+            )
+        return resp
 
-    def post(self, route, data=None):
+    def _request(self, method, route, params=None, data=None, retry=None, headers=None, meta=None):
+        """
+        Envoie la requête et renvoie le JSON de la réponse ({} si corps vide), None en cas d'échec.
+        Les requêtes idempotentes (GET/PUT par défaut, ou retry=True) sont reprises sur
+        timeout, erreur de connexion ou 5xx transitoire, avec backoff exponentiel et jitter.
+        Si le coupe-circuit est ouvert, la requête n'est pas envoyée.
+        Si meta (dict) est fourni, il reçoit le statut HTTP et les en-têtes de validation.
+        """
         url = f"{self.BASE_URL}{route}"
-        try:
-            resp = requests.post(url, headers=self.headers, json=data, timeout=10)
-            resp.raise_for_status()
-            return resp.json()
-        except requests.exceptions.Timeout:
-            logging.error(f"[BeezUPClient] Timeout lors de la requête POST : {url}")
-        except requests.exceptions.ConnectionError:
-            logging.error(f"[BeezUPClient] Erreur de connexion lors de la requête POST : {url}")
-        except requests.exceptions.HTTPError:
-            logging.error(f"[BeezUPClient] Erreur HTTP {resp.status_code} pour l'URL {url} : {resp.text}")
-        except Exception as e:
-            logging.error(f"[BeezUPClient] Erreur inattendue lors de la requête POST : {e}")
+        if retry is None:
+            retry = method in ("GET", "PUT")
+        attempts = self.max_retries + 1 if retry else 1
+
+        if not self.circuit_breaker.allow():
+            logging.error(f"[BeezUPClient] Coupe-circuit ouvert, requête {method} non envoyée : {url}")
+            return None
+
+        for attempt in range(attempts):
+            last_attempt = attempt == attempts - 1
+            try:
+                resp = self._send(method, route, params=params, data=data, headers=headers)
+                if resp.status_code in RETRYABLE_STATUSES and not last_attempt:
+                    logging.warning(f"[BeezUPClient] Erreur HTTP {resp.status_code} sur {method} {url}, reprise {attempt + 1}/{self.max_retries}")
+                    time.sleep(backoff_delay(attempt))
+                    continue
+                resp.raise_for_status()
+                self.circuit_breaker.record_success()
+                if meta is not None:
+                    meta["status"] = resp.status_code
+                    meta["etag"] = resp.headers.get("ETag")
+                    meta["last_modified"] = resp.headers.get("Last-Modified")
+                return resp.json() if resp.content else {}
+            except (requests.exceptions.Timeout, requests.exceptions.ConnectionError) as e:
+                if not last_attempt:
+                    logging.warning(f"[BeezUPClient] {type(e).__name__} sur {method} {url}, reprise {attempt + 1}/{self.max_retries}")
+                    time.sleep(backoff_delay(attempt))
+                    continue
+                if isinstance(e, requests.exceptions.Timeout):
+                    logging.error(f"[BeezUPClient] Timeout lors de la requête {method} : {url}")
+                else:
+                    logging.error(f"[BeezUPClient] Erreur de connexion lors de la requête {method} : {url}")
+            except requests.exceptions.HTTPError:
+                logging.error(f"[BeezUPClient] Erreur HTTP {resp.status_code} pour l'URL {url} : {resp.text}")
+                if resp.status_code < 500:
+                    # Erreur client : l'API répond, inutile d'ouvrir le coupe-circuit
+                    self.circuit_breaker.record_success()
+                    return None
+            except Exception as e:
+                logging.error(f"[BeezUPClient] Erreur inattendue lors de la requête {method} : {e}")
+            break
+
+        self.circuit_breaker.record_failure()
         return None
 
+    def get(self, route, params=None, ttl=None, refresh=False):
+        if self.cache is None or ttl is None:
+            return self._request("GET", route, params=params)
+
+        key = self.cache_key(route, params)
+        entry = None if refresh or self.refresh_cache else self.cache.lookup(key)
+        if entry and entry["fresh"]:
+            self._count("cache_hit")
+            return entry["body"]
+
+        # Entrée expirée : revalidation conditionnelle si l'API a fourni un validateur
+        headers = {}
+        if entry and entry["etag"]:
+            headers["If-None-Match"] = entry["etag"]
+        if entry and entry["last_modified"]:
+            headers["If-Modified-Since"] = entry["last_modified"]
+        meta = {}
+        body = self._request("GET", route, params=params, headers=headers or None, meta=meta)
+        if meta.get("status") == 304 and entry:
+            self._count("not_modified")
+            self.cache.touch(key, ttl)
+            return entry["body"]
+        if body:
+            self.cache.store(key, route, body, ttl, meta.get("etag"), meta.get("last_modified"))
+        return body
+
+    def cache_key(self, route, params=None):
+        """Clé du cache disque pour une route (ou une donnée dérivée), propre à la clé API."""
+        return ResponseCache.make_key(self._api_key_hash, route, params)
+
+    def invalidate_cache(self, route, params=None):
+        """Supprime du cache la réponse d'une route (après une écriture qui la modifie)."""
+        if self.cache is not None:
+            self.cache.invalidate(self.cache_key(route, params))
+
+    def post(self, route, data=None, retry=False):
+        return self._request("POST", route, data=data, retry=retry)
+
     def put(self, route, data=None):
-        url = f"{self.BASE_URL}{route}"
-        try:
-            resp = requests.put(url, headers=self.headers, json=data, timeout=10)
-            resp.raise_for_status()
-            return resp.json()
-        except requests.exceptions.Timeout:
-            logging.error(f"[BeezUPClient] Timeout lors de la requête PUT : {url}")
-        except requests.exceptions.ConnectionError:
-            logging.error(f"[BeezUPClient] Erreur de connexion lors de la requête PUT : {url}")
-        except requests.exceptions.HTTPError:
-            logging.error(f"[BeezUPClient] Erreur HTTP {resp.status_code} pour l'URL {url} : {resp.text}")
-        except Exception as e:
-            logging.error(f"[BeezUPClient] Erreur inattendue lors de la requête PUT : {e}")
-        return None
+        return self._request("PUT", route, data=data)
 
     # --- Endpoints spécifiques BeezUP --- #
 
-    def get_channel_catalog_data(self, catalog_id):
+    def get_channel_catalog_data(self, catalog_id, refresh=False):
         """Récupère les infos du channelCatalog (storeId, channelId, etc.)."""
-        return self.get(f"/user/channelCatalogs/{catalog_id}")
+        return self.get(f"/user/channelCatalogs/{catalog_id}", ttl=self.cache_ttls["channel_catalog"], refresh=refresh)
 
-    def get_catalog_columns(self, store_id):
+    def get_catalog_columns(self, store_id, refresh=False):
         """Récupère la liste des colonnes du catalogue vendeur."""
-        return self.get(f"/user/catalogs/{store_id}/catalogColumns")
+        return self.get(f"/user/catalogs/{store_id}/catalogColumns", ttl=self.cache_ttls["catalog_columns"], refresh=refresh)
 
     def get_products(self, catalog_id, payload):
         """Récupère les produits (canal de vente) à partir d'une liste d'EANs."""
-        return self.post(f"/user/channelCatalogs/{catalog_id}/products", data=payload)
+        return self.post(f"/user/channelCatalogs/{catalog_id}/products", data=payload, retry=True)
 
     def get_product_values(self, store_id, payload):
         """Récupère les valeurs de champs catalogue via products/list (productIdList ou eanList)."""
-        return self.post(f"/user/catalogs/{store_id}/products/list", data=payload)
+        return self.post(f"/user/catalogs/{store_id}/products/list", data=payload, retry=True)
 
-    def get_category_mapping_data(self, catalog_id):
+    def get_category_mapping_data(self, catalog_id, refresh=False):
         """Récupère le mapping des catégories canal de vente ↔ catalogue Octopia."""
-        return self.get(f"/user/channelCatalogs/{catalog_id}/categories")
+        return self.get(f"/user/channelCatalogs/{catalog_id}/categories", ttl=self.cache_ttls["category_mapping"], refresh=refresh)
 
-    def get_channel_attributes_data(self, catalog_id):
+    def get_channel_attributes_data(self, catalog_id, refresh=False):
         """Récupère la liste des attributs canal de vente (par catégorie)."""
-        return self.get(f"/user/channelCatalogs/{catalog_id}/attributes")
+        return self.get(f"/user/channelCatalogs/{catalog_id}/attributes", ttl=self.cache_ttls["channel_attributes"], refresh=refresh)
 
-    def get_attribute_value_list(self, catalog_id, attribute_id):
+    def get_attribute_value_list(self, catalog_id, attribute_id, refresh=False):
         """Récupère les valeurs autorisées (listes) pour un attribut donné."""
-        return self.get(f"/user/channelCatalogs/{catalog_id}/attributes/{attribute_id}/mapping")
+        return self.get(
+            f"/user/channelCatalogs/{catalog_id}/attributes/{attribute_id}/mapping",
+            ttl=self.cache_ttls["attribute_value_list"],
+            refresh=refresh
+        )
+
+    def put_product_overrides(self, catalog_id, product_id, payload):
+        """Remplace les overrides d'un produit du canal de vente ({attribute_id: valeur})."""
+        return self.put(f"/user/channelCatalogs/{catalog_id}/products/{product_id}/overrides", data=payload)
 
     # --- Gestion du mapping et des colonnes personnalisées --- #
 
-    def get_custom_columns(self, store_id):
+    def get_custom_columns(self, store_id, refresh=False):
         """Récupère la liste des colonnes personnalisées du catalogue vendeur."""
-        return self.get(f"/user/catalogs/{store_id}/customColumns")
+        return self.get(f"/user/catalogs/{store_id}/customColumns", ttl=self.cache_ttls["custom_columns"], refresh=refresh)
 
     def create_custom_column(self, store_id, name="Champ perso vide généré par API"):
         """Crée une colonne personnalisée vide (renvoie son ID si succès)."""
@@ -115,8 +306,9 @@ class BeezUPClient:
             "userColumnName": name,
         }
 
-        resp = requests.put(f"{self.BASE_URL}{route}", headers=self.headers, json=body)
+        resp = self._send("PUT", route, data=body, timeout=None)
         if resp.status_code == 204:
+            self.invalidate_cache(f"/user/catalogs/{store_id}/customColumns")
             return column_id
         else:
             import logging
@@ -126,8 +318,12 @@ class BeezUPClient:
     def update_column_mapping(self, catalog_id, payload):
         """Met à jour le mapping complet (columnMappings) pour le channelCatalog."""
         route = f"/user/channelCatalogs/{catalog_id}/columnMappings"
-        resp = requests.put(f"{self.BASE_URL}{route}", headers=self.headers, json=payload)
-        if resp.status_code not in (200, 204):
+        resp = self._send("PUT", route, data=payload, timeout=None)
+        if resp.status_code in (200, 204):
+            # Le channelCatalog et les attributs en cache reflètent l'ancien columnMappings
+            self.invalidate_cache(f"/user/channelCatalogs/{catalog_id}")
+            self.invalidate_cache(f"/user/channelCatalogs/{catalog_id}/attributes")
+        else:
             import logging
             logging.error(f"[BeezUPClient] Erreur mapping ({resp.status_code}): {resp.text}")
         return resp
@@ -0,0 +1,113 @@
+import re
+
+import numpy as np
+import pandas as pd
+
+from beezup.baseline import BaselineStore
+
+def extract_attr_id(col_name: str) -> str | None:
+    """En-tête 'Label | AttributeId' -> AttributeId, sinon None (colonne fixe)."""
+    if not isinstance(col_name, str):
+        return None
+    parts = [p.strip() for p in col_name.split("|", 1)]
+    return parts[1] if len(parts) == 2 and parts[1] else None
+
+def is_duplicate_header(col_name, columns) -> bool:
+    """
+    En-tête copie d'une autre colonne du template : suffixe de dedupe_template_columns
+    ('Label | Id_2') ou de la lecture Excel ('Label | Id.1') ajouté à un en-tête présent.
+    Ces colonnes ne désignent pas un attribut et sont ignorées par le diff.
+    """
+    if not isinstance(col_name, str):
+        return False
+    match = re.fullmatch(r"(.+?)(?:_\d+|\.\d+)", col_name)
+    return bool(match) and match.group(1) in columns
+
+def normalize_values(values: pd.Series) -> pd.Series:
+    """
+    Équivalent vectorisé de normalize_cell_value : vide/NaN -> '', 'code | label' -> 'code',
+    sinon valeur strippée.
+    """
+    values = values.astype(object).where(values.notna(), "").astype(str).str.strip()
+    # Tout ce qui suit le premier '|' (et les espaces qui le précèdent) est retiré
+    return values.str.replace(r"\s*\|[\s\S]*", "", regex=True)
+
+def _fixed_column(filled_df: pd.DataFrame, name: str) -> np.ndarray:
+    """Colonne fixe en chaînes strippées (comme str(valeur).strip()), '' si absente."""
+    if name not in filled_df.columns:
+        return np.full(len(filled_df), "", dtype=object)
+    return filled_df[name].astype(object).map(str).str.strip().to_numpy(dtype=object)
+
+def build_payloads(filled_df: pd.DataFrame, baseline: BaselineStore) -> list[dict]:
+    """
+    Construit la liste des payloads à envoyer, en s'assurant que :
+      - TOUTES les clés déjà en override sont renvoyées (même si identiques)
+      - Les nouvelles valeurs du template écrasent celles des overrides
+      - Les attributs non overridés ne sont envoyés que si différents du baseline effectif
+    "changes" compte les attributs dont la valeur diffère des overrides actuels : à 0, le payload
+    final est identique aux overrides en place et le produit n'a pas besoin d'être envoyé.
+    Le diff est calculé en colonnes : template au format long (ligne, attribut, valeur) joint
+    à l'index du baseline (BaselineStore.index, construit une fois pour tous les lots).
+    """
+    for req in ["Product Id", "Catalog Id"]:
+        if req not in filled_df.columns:
+            raise ValueError(f"Colonne obligatoire manquante : '{req}'")
+
+    product_ids = _fixed_column(filled_df, "Product Id")
+    catalog_ids = _fixed_column(filled_df, "Catalog Id")
+    eans = _fixed_column(filled_df, "EAN")
+    keep = (product_ids != "") & (catalog_ids != "")
+
+    # 1) Template au format long : une entrée par cellule dynamique non vide
+    # (les en-têtes en double, 'Label | Id_2', ne sont pas des attributs)
+    columns = set(filled_df.columns)
+    dynamic = [
+        (j, extract_attr_id(c)) for j, c in enumerate(filled_df.columns)
+        if extract_attr_id(c) and not is_duplicate_header(c, columns)
+    ]
+    n_rows = len(filled_df)
+    attr_index = pd.Index(list(dict.fromkeys(attr_id for _, attr_id in dynamic)))
+    if dynamic and n_rows:
+        values = np.concatenate([filled_df.iloc[:, j].to_numpy(dtype=object) for j, _ in dynamic])
+        rows = np.tile(np.arange(n_rows), len(dynamic))
+        attr_codes = np.repeat(attr_index.get_indexer([attr_id for _, attr_id in dynamic]), n_rows)
+        mask = pd.notna(values) & keep[rows]
+        values = normalize_values(pd.Series(values[mask])).to_numpy(dtype=object)
+        rows, attr_codes = rows[mask], attr_codes[mask]
+        mask = values != ""
+        values, rows, attr_codes = values[mask], rows[mask], attr_codes[mask]
+    else:
+        values = np.empty(0, dtype=object)
+        rows = attr_codes = np.empty(0, dtype=np.int64)
+
+    # 2) Jointure avec l'index du baseline : seuls les produits et attributs du lot sont codés
+    index = baseline.index()
+    row_products = index.products.get_indexer(product_ids)
+    lot_attributes = index.attributes.get_indexer(attr_index)
+    effective, in_override = index.lookup(row_products[rows], lot_attributes[attr_codes])
+
+    # 3) Déjà overridé : renvoyé tel quel ; sinon envoyé seulement si différent de l'effectif
+    send = in_override | (values != effective)
+    rows, attr_codes, values = rows[send], attr_codes[send], values[send]
+    order = np.argsort(rows, kind="stable")  # ordre des colonnes conservé dans chaque ligne
+    rows, attr_codes, values = rows[order], attr_codes[order], values[order]
+    bounds = np.searchsorted(rows, np.arange(n_rows + 1))
+    attr_ids = attr_index.to_numpy(dtype=object)
+
+    rows_out = []
+    for i in np.flatnonzero(keep):
+        product_id = product_ids[i]
+        # point de départ : TOUTES les clés déjà en override pour ce produit
+        live = baseline.overrides(product_id)
+        payload = dict(live)
+        start, end = bounds[i], bounds[i + 1]
+        payload.update(zip(attr_ids[attr_codes[start:end]], values[start:end]))
+        rows_out.append({
+            "EAN": eans[i],
+            "Product Id": product_id,
+            "Catalog Id": catalog_ids[i],
+            "payload": payload,
+            "count": len(payload),
+            "changes": sum(1 for attr_id, value in payload.items() if live.get(attr_id) != value)
+        })
+    return rows_out
@@ -1,5 +1,38 @@
+from beezup.categories import CategoryIndex
 from beezup.client import BeezUPClient
+from beezup.retry import backoff_delay
+import time
 import pandas as pd
+from concurrent.futures import ThreadPoolExecutor
+
+# Nombre de reprises par page quand le client renvoie None malgré ses propres reprises
+PAGE_RETRIES = 1
+# Nombre de pages demandées simultanément après la première
+PAGE_WORKERS = 8
+# Nombre d'EANs envoyés par requête products (productFilters.channelEans)
+EAN_CHUNK_SIZE = 1000
+# Taille de page et nombre de productId par requête products/list (champs catalogue).
+# La taille de page reste celle éprouvée sur l'API (100) ; le nombre de pages est celui
+# renvoyé par l'API (paginationResult.pageCount), pas déduit de la taille demandée.
+OCTOPIA_PAGE_SIZE = 100
+PRODUCT_ID_CHUNK_SIZE = 1000
+
+class IncompleteExtractionError(Exception):
+    """
+    Extraction paginée interrompue : certaines pages n'ont pas pu être récupérées.
+    `partial` contient ce qui a été extrait, `missing_pages` les pages manquantes.
+    """
+
+    def __init__(self, stage, partial, missing_pages, page_count=None):
+        self.stage = stage
+        self.partial = partial
+        self.missing_pages = missing_pages
+        self.page_count = page_count
+        total = f" sur {page_count}" if page_count else ""
+        super().__init__(
+            f"Extraction {stage} incomplète : page(s) {', '.join(map(str, missing_pages))}{total} "
+            f"en échec après reprises ({len(partial)} ligne(s) récupérée(s))."
+        )
 
 def get_store_and_channel_ids(client: BeezUPClient, catalog_id: str):
     """
@@ -19,40 +52,168 @@ def get_catalog_column_id(columns: list, column_name: str):
             return column.get("id")
     return None
 
-def extract_products(client: BeezUPClient, catalog_id: str, eans: list):
+def _products_payload(page: int, eans: list) -> dict:
     """
-    Extrait tous les produits (productInfos) d'un canal à partir d'une liste d'EANs.
+    Corps de requête POST /channelCatalogs/{catalog_id}/products pour une page donnée.
     """
-    products = []
-    page = 1
-    while True:
-        payload = {
-            "pageNumber": page,
-            "pageSize": 1000,
-            "criteria": {
-                "logic": "cumulative",
-                "exist": True,
-                "uncategorized": False,
-                "excluded": False,
-                "disabled": False
-            },
-            "productFilters": {
-                "channelEans": eans
-            }
+    return {
+        "pageNumber": page,
+        "pageSize": 1000,
+        "criteria": {
+            "logic": "cumulative",
+            "exist": True,
+            "uncategorized": False,
+            "excluded": False,
+            "disabled": False
+        },
+        "productFilters": {
+            "channelEans": eans
         }
-        response = client.get_products(catalog_id, payload)
-        if not response:
-            break
-        products += response.get("productInfos", [])
-        page_count = response.get("paginationResult", {}).get("pageCount", 1)
-        if page >= page_count:
-            break
-        page += 1
+    }
+
+def _octopia_payload(page: int, column_ids: dict, product_ids: list, page_size: int = OCTOPIA_PAGE_SIZE) -> dict:
+    """
+    Corps de requête POST /catalogs/{store_id}/products/list pour une page donnée.
+    """
+    return {
+        "pageNumber": page,
+        "pageSize": page_size,
+        "exists": "true",
+        "columnIdList": list(column_ids.values()),
+        "productIdList": product_ids
+    }
+
+def _assemble_octopia_results(results: list, column_ids: dict) -> pd.DataFrame:
+    """
+    Construit le DataFrame des champs catalogue à partir des résultats (réponses, pages manquantes,
+    pageCount) des lots de productId, colonne par colonne.
+    La correspondance column_id -> valeur est insensible à la casse : les clés de `values`
+    sont indexées une fois en minuscules par produit.
+    Lève IncompleteExtractionError s'il manque des pages.
+    """
+    product_col = []
+    value_cols = {name: [] for name in column_ids}
+    lookup = [(value_cols[name], (col_id or "").lower()) for name, col_id in column_ids.items()]
+    missing = []
+    for chunk_idx, (responses, chunk_missing, _) in enumerate(results, start=1):
+        for response in responses:
+            for product in response.get("products", []):
+                product_col.append(product.get("productId"))
+                lowered = {}
+                for key, value in (product.get("values") or {}).items():
+                    lowered.setdefault(key.lower(), value)
+                for col, col_id in lookup:
+                    col.append(lowered.get(col_id, ""))
+        missing += [page if len(results) == 1 else f"{page} (lot {chunk_idx})" for page in chunk_missing]
+
+    df = pd.DataFrame({"Product Id": product_col, **value_cols})
+    if missing:
+        page_count = results[0][2] if len(results) == 1 else None
+        raise IncompleteExtractionError("champs catalogue", df, missing, page_count)
+    return df
+
+def _fetch_page(fetch, *args, retries=PAGE_RETRIES):
+    """
+    Récupère une page via fetch(*args) ; si la page échoue malgré les reprises du client,
+    elle est redemandée (retries fois) après un backoff, sans relancer toute l'extraction.
+    """
+    for attempt in range(retries + 1):
+        response = fetch(*args)
+        if response is not None:
+            return response
+        if attempt < retries:
+            time.sleep(backoff_delay(attempt, base=1.0))
+    return None
+
+def _fetch_pages(fetch, target, build_payload, max_workers=PAGE_WORKERS):
+    """
+    Récupère la page 1 (qui donne pageCount) puis les pages suivantes en parallèle,
+    sur max_workers threads partageant le pool de connexions du client.
+    Returns:
+        (réponses obtenues dans l'ordre des pages, pages manquantes, pageCount)
+    """
+    first = _fetch_page(fetch, target, build_payload(1))
+    if first is None:
+        return [], [1], None
+    page_count = first.get("paginationResult", {}).get("pageCount", 1)
+    responses = [first]
+    if page_count > 1:
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            # executor.map conserve l'ordre des pages
+            responses += executor.map(
+                lambda page: _fetch_page(fetch, target, build_payload(page)),
+                range(2, page_count + 1)
+            )
+    missing = [page for page, response in enumerate(responses, start=1) if response is None]
+    return [response for response in responses if response is not None], missing, page_count
+
+def _chunks(items: list, size: int) -> list:
+    """Découpe une liste en lots de `size` éléments (dernier lot éventuellement plus court)."""
+    return [items[i:i + size] for i in range(0, len(items), size)]
+
+def _assemble_chunk_results(results: list, eans: list, unique_eans: list, chunk_size: int, stats: dict = None) -> list:
+    """
+    Fusionne les résultats (réponses, pages manquantes, pageCount) des lots d'EANs :
+    productInfos dans l'ordre lots/pages, sans doublon de productId (premier vu conservé).
+    Renseigne stats et lève IncompleteExtractionError s'il manque des pages.
+    """
+    seen = set()
+    products, missing = [], []
+    for chunk_idx, (responses, chunk_missing, _) in enumerate(results, start=1):
+        for response in responses:
+            for info in response.get("productInfos", []):
+                product_id = info.get("productId")
+                if product_id in seen:
+                    continue
+                seen.add(product_id)
+                products.append(info)
+        missing += [page if len(results) == 1 else f"{page} (lot {chunk_idx})" for page in chunk_missing]
+
+    if stats is not None:
+        stats.update({
+            "eans": len(eans),
+            "unique_eans": len(unique_eans),
+            "chunk_size": chunk_size,
+            "chunks": len(results),
+            "pages": sum(page_count or 0 for _, _, page_count in results),
+            "products": len(products)
+        })
+    if missing:
+        page_count = results[0][2] if len(results) == 1 else None
+        raise IncompleteExtractionError("produits canal", products, missing, page_count)
     return products
 
-def extract_octopia_product_fields(client: BeezUPClient, store_id: str, column_ids: dict, product_ids: list) -> pd.DataFrame:
+def extract_products(client: BeezUPClient, catalog_id: str, eans: list, max_workers: int = PAGE_WORKERS,
+                     chunk_size: int = EAN_CHUNK_SIZE, stats: dict = None):
+    """
+    Extrait tous les produits (productInfos) d'un canal à partir d'une liste d'EANs.
+    Les EANs sont dédoublonnés puis découpés en lots de chunk_size, interrogés en parallèle ;
+    dans un lot, les pages 2..pageCount sont aussi demandées en parallèle.
+    Le résultat est dans l'ordre lots/pages, dédoublonné par productId.
+    Si stats (dict) est fourni, il reçoit les compteurs de l'extraction.
+    Lève IncompleteExtractionError si une page reste en échec après reprise.
+    """
+    unique_eans = list(dict.fromkeys(eans))
+    chunks = _chunks(unique_eans, chunk_size)
+    # Le parallélisme est réparti entre les lots pour ne pas multiplier les threads
+    page_workers = max(1, max_workers // max(1, len(chunks)))
+
+    def fetch_chunk(chunk):
+        return _fetch_pages(
+            client.get_products, catalog_id, lambda page: _products_payload(page, chunk), page_workers
+        )
+
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(chunks)))) as executor:
+        results = list(executor.map(fetch_chunk, chunks))
+    return _assemble_chunk_results(results, eans, unique_eans, chunk_size, stats)
+
+def extract_octopia_product_fields(client: BeezUPClient, store_id: str, column_ids: dict, product_ids: list,
+                                   page_size: int = OCTOPIA_PAGE_SIZE, chunk_size: int = PRODUCT_ID_CHUNK_SIZE,
+                                   max_workers: int = PAGE_WORKERS) -> pd.DataFrame:
     """
     Extrait les champs fixes pour chaque productId (via /catalogs/{store_id}/products/list).
+    Les productId sont dédoublonnés et découpés en lots de chunk_size interrogés en parallèle,
+    les pages (page_size produits) de chaque lot aussi.
     Args:
         client: BeezUPClient
         store_id: str
@@ -60,72 +221,42 @@ def extract_octopia_product_fields(client: BeezUPClient, store_id: str, column_i
         product_ids: list de productId
     Returns:
         DataFrame (une ligne par produit, une colonne par champ demandé)
+    Raises:
+        IncompleteExtractionError si une page reste en échec après reprise
     """
-    data = []
-    page = 1
-    while True:
-        payload = {
-            "pageNumber": page,
-            "pageSize": 100,
-            "exists": "true",
-            "columnIdList": list(column_ids.values()),
-            "productIdList": product_ids
-        }
-        response = client.get_product_values(store_id, payload)
-        if not response:
-            break
-        products = response.get("products", [])
-        page_count = response.get("paginationResult", {}).get("pageCount", 1)
-        for product in products:
-            product_id = product.get("productId")
-            values = product.get("values", {})
-            row = {"Product Id": product_id}
-            for name, col_id in column_ids.items():
-                # Recherche insensible à la casse
-                row[name] = next((v for k, v in values.items() if k.lower() == col_id.lower()), "")
-            data.append(row)
-        if page >= page_count:
-            break
-        page += 1
-    return pd.DataFrame(data)
-
-def extract_channel_paths(client: BeezUPClient, catalog_id: str, categ3_codes: list):
+    chunks = _chunks(list(dict.fromkeys(product_ids)), chunk_size)
+    page_workers = max(1, max_workers // max(1, len(chunks)))
+
+    def fetch_chunk(chunk):
+        return _fetch_pages(
+            client.get_product_values, store_id,
+            lambda page: _octopia_payload(page, column_ids, chunk, page_size), page_workers
+        )
+
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(chunks)))) as executor:
+        results = list(executor.map(fetch_chunk, chunks))
+    return _assemble_octopia_results(results, column_ids)
+
+def extract_channel_paths(client: BeezUPClient, catalog_id: str, categ3_codes: list, index: CategoryIndex = None):
     """
     Extrait tous les chemins canal correspondant aux catégories Octopia niveau 3 utilisées.
+    Un CategoryIndex déjà construit pour ce catalogue peut être fourni pour éviter l'appel API.
     """
-    response = client.get_category_mapping_data(catalog_id)
-    if not response:
+    index = index or CategoryIndex.fetch(client, catalog_id)
+    if index is None:
         return []
-    path_set = set()
-    codes_set = set(categ3_codes)
-    for config in response.get("channelCatalogCategoryConfigurations", []):
-        if any(code in config.get("catalogCategoryPath", []) for code in codes_set):
-            path = config.get("channelCategoryPath", [])
-            formatted = " > ".join(path)
-            if formatted:
-                path_set.add(formatted)
-    return sorted(path_set)
-
-def extract_octopia_channel_mapping(client: BeezUPClient, catalog_id: str, categ3_codes: list) -> pd.DataFrame:
+    return index.channel_paths(categ3_codes)
+
+def extract_octopia_channel_mapping(client: BeezUPClient, catalog_id: str, categ3_codes: list,
+                                    index: CategoryIndex = None) -> pd.DataFrame:
     """
     Crée un mapping code Octopia <-> chemin complet canal de vente.
+    Un CategoryIndex déjà construit pour ce catalogue peut être fourni pour éviter l'appel API.
     """
-    response = client.get_category_mapping_data(catalog_id)
-    if not response:
+    index = index or CategoryIndex.fetch(client, catalog_id)
+    if index is None:
         return pd.DataFrame()
-    codes_set = set(categ3_codes)
-    mapping_rows = []
-    for config in response.get("channelCatalogCategoryConfigurations", []):
-        catalog_path = config.get("catalogCategoryPath", [])
-        channel_path = config.get("channelCategoryPath", [])
-        formatted_path = " > ".join(channel_path)
-        for code in catalog_path:
-            if code in codes_set:
-                mapping_rows.append({
-                    "Category Code": code,
-                    "Channel Full Category Path": formatted_path
-                })
-    return pd.DataFrame(mapping_rows).drop_duplicates()
+    return index.mapping_dataframe(categ3_codes)
 
 def extract_channel_attributes(client: BeezUPClient, catalog_id: str, channel_paths: list):
     """
@@ -1,5 +1,7 @@
 import pandas as pd
-import time
+
+from beezup.frames import sparse_columns
+from beezup.value_lists import fetch_value_lists, plan_value_lists, value_lists_dataframe
 
 def build_template_dataframe(product_df, selected_attributes, catalog_id):
     """
@@ -10,54 +12,87 @@ def build_template_dataframe(product_df, selected_attributes, catalog_id):
         f"{row['Attribute Name']} | {row['Channel Attribute Id']}": row["Channel Attribute Id"]
         for _, row in selected_attributes.iterrows()
     }
-    template_data = []
-    for _, product in product_df.iterrows():
-        row = {
-            "Catalog Id": catalog_id,
-            "Product Id": product.get("Product Id"),
-            "Ean": product.get("Ean") or "",
-            "Sku": product.get("Product Sku"),
-            "Product Title": product.get("Product Title")
-        }
-        mapping = product.get("attributeMappingValue", {})
-        overrides = product.get("overrides", {})
-        for column_name, attribute_id in template_columns_mapping.items():
-            value = None
-            override_obj = overrides.get(attribute_id)
-            if isinstance(override_obj, dict):
-                value = override_obj.get("override")
-            if not value:
-                mapping_obj = mapping.get(attribute_id)
-                if isinstance(mapping_obj, dict):
-                    value = mapping_obj.get("attributeMappingValue")
-            row[column_name] = value if value is not None else ""
-        template_data.append(row)
+    def column(name):
+        return product_df[name].tolist() if name in product_df.columns else [None] * len(product_df)
+
+    def as_dicts(name):
+        return [obj if isinstance(obj, dict) else {} for obj in column(name)]
+
+    attribute_ids = list(dict.fromkeys(template_columns_mapping.values()))
+    missing = object()
+    overrides = sparse_columns(
+        as_dicts("overrides"), attribute_ids,
+        lambda obj: obj.get("override") if isinstance(obj, dict) else None
+    )
+    mappings = sparse_columns(
+        as_dicts("attributeMappingValue"), attribute_ids,
+        lambda obj: obj.get("attributeMappingValue") if isinstance(obj, dict) else missing,
+        missing
+    )
+
+    template_data = {
+        "Catalog Id": [catalog_id] * len(product_df),
+        "Product Id": column("Product Id"),
+        "Ean": [ean or "" for ean in column("Ean")],
+        "Sku": column("Product Sku"),
+        "Product Title": column("Product Title")
+    }
+    for column_name, attribute_id in template_columns_mapping.items():
+        values = []
+        for value, mapped in zip(overrides[attribute_id], mappings[attribute_id]):
+            if not value and mapped is not missing:
+                value = mapped
+            values.append(value if value is not None else "")
+        template_data[column_name] = values
     return pd.DataFrame(template_data)
 
 def build_dropdown_dataframe(client, catalog_id, selected_attributes_df):
     """
     Construit l'onglet ListOfValues (menus déroulants) pour tous les attributs de type liste à éditer.
     Retourne un DataFrame, chaque colonne correspondant à une liste de valeurs d'attribut.
+    Une liste partagée par plusieurs attributs n'est récupérée qu'une fois (voir beezup.value_lists).
     """
-    df_list_attributes = selected_attributes_df[selected_attributes_df["Attribute Value List Code"].notnull()]
-    attribute_mapping = {
-        row["Channel Attribute Id"]: row["Attribute Value List Code"]
-        for _, row in df_list_attributes.iterrows()
-    }
-    value_dict = {}
-    for attribute_id, value_list_code in attribute_mapping.items():
-        response = client.get_attribute_value_list(catalog_id, attribute_id)
-        if not response:
-            continue
-        values = response.get("channelAttributeValuesWithMapping", [])
-        value_dict[value_list_code] = [
-            f"{v.get('code')} | {v.get('label')}"
-            for v in values
-            if v.get("label") and v.get("code")
-        ]
-        time.sleep(0.1)  # pour éviter d'abuser de l'API
-    # Chaque colonne = une liste de valeurs, lignes = valeur ou None
-    return pd.DataFrame({k: pd.Series(v) for k, v in value_dict.items()})
+    plan = plan_value_lists(selected_attributes_df)
+    return value_lists_dataframe(fetch_value_lists(client, catalog_id, plan))
+
+def clean_attribute_df(attribute_df):
+    """
+    Prépare la liste des attributs pour la sélection :
+      - statut normalisé (Required / Recommended / Optional), chemin de catégorie sans NaN
+      - suppression des attributs dépréciés marqués [REMOVED BY MKP]
+      - une ligne par paire (Attribute Name, Channel Attribute Id) : statut le plus restrictif,
+        puis catégorie spécifique avant "Cross Categories"
+      - ajout du libellé d'affichage "Nom [Statut]"
+    """
+    attribute_df = attribute_df.copy()
+    attribute_df["Status"] = attribute_df["Status"].fillna("").astype(str).str.strip().str.capitalize()
+    attribute_df["Channel Full Category Path"] = attribute_df["Channel Full Category Path"].fillna("")
+
+    attribute_df = attribute_df[
+        ~attribute_df["Attribute Name"].str.contains(r"\[REMOVED BY MKP\]", case=False, na=False)
+    ].copy()
+
+    if {"Attribute Name", "Channel Attribute Id"}.issubset(attribute_df.columns):
+        # Priorité des statuts (plus petit = plus restrictif)
+        status_rank = {"Required": 0, "Recommended": 1, "Optional": 2, "": 3}
+        attribute_df["__status_rank"] = attribute_df["Status"].map(status_rank).fillna(3).astype(int)
+
+        # Flag : 0 = spécifique (préféré), 1 = Cross Categories (moins prioritaire)
+        attribute_df["__is_cross"] = attribute_df["Channel Full Category Path"].eq("Cross Categories").astype(int)
+
+        attribute_df = (
+            attribute_df
+            .sort_values(
+                by=["Attribute Name", "Channel Attribute Id", "__status_rank", "__is_cross"],
+                ascending=[True, True, True, True]
+            )
+            .drop_duplicates(subset=["Attribute Name", "Channel Attribute Id"], keep="first")
+            .reset_index(drop=True)
+        )
+        attribute_df.drop(columns=["__status_rank", "__is_cross"], inplace=True, errors="ignore")
+
+    attribute_df["display_label"] = attribute_df["Attribute Name"] + " [" + attribute_df["Status"] + "]"
+    return attribute_df
 
 def build_datainfo_dataframe(full_attribute_df):
     """
@@ -0,0 +1,62 @@
+import pandas as pd
+
+def sparse_columns(records: list, columns: list, extract, default=None) -> dict:
+    """
+    Construit des colonnes à partir d'une liste de dicts clairsemés ({clé: objet}).
+    colonne[clé][i] = extract(records[i][clé]) si la clé est présente, sinon default.
+    Seules les clés présentes sont parcourues : le coût suit le nombre de valeurs réelles,
+    pas produits x colonnes.
+    """
+    n = len(records)
+    data = {col: [default] * n for col in columns}
+    for i, record in enumerate(records):
+        for key, obj in record.items():
+            col = data.get(key)
+            if col is not None:
+                col[i] = extract(obj)
+    return data
+
+def _override_value(obj):
+    return obj.get("override") if isinstance(obj, dict) else ""
+
+def _mapping_label(obj):
+    """"attributeMappingValue | catalogValue" ; vide sans valeur mappée (jamais "None | None")."""
+    if not isinstance(obj, dict) or obj.get("attributeMappingValue") in (None, ""):
+        return ""
+    if obj.get("catalogValue") in (None, ""):
+        return str(obj["attributeMappingValue"])
+    return f"{obj['attributeMappingValue']} | {obj['catalogValue']}"
+
+def build_product_frame(product_infos: list, catalog_id: str) -> tuple[pd.DataFrame, list, list]:
+    """
+    Convertit les productInfos (/channelCatalogs/{id}/products) en DataFrame colonne par colonne :
+    Product Id, Offer Code, Name, Catalog Id, puis une colonne par attribut en override
+    (valeur override) et par attribut mappé ("attributeMappingValue | catalogValue").
+    Un attribut à la fois en override et mappé n'a qu'une colonne (dans override_columns) :
+    l'override du produit s'il existe, sinon son mapping, comme la valeur effective.
+    Returns:
+        (product_df, override_columns, attr_mapping_columns) ; colonnes d'attributs triées, disjointes
+    """
+    overrides = [prod.get("overrides") or {} for prod in product_infos]
+    mappings = [prod.get("attributeMappingValue") or {} for prod in product_infos]
+    override_columns = sorted(set().union(*overrides))
+    attr_mapping_columns = sorted(set().union(*mappings) - set(override_columns))
+    shared_columns = sorted(set().union(*mappings) & set(override_columns))
+
+    data = {
+        "Product Id": [prod.get("productId") for prod in product_infos],
+        "Offer Code": [prod.get("productSku") for prod in product_infos],
+        "Name": [prod.get("productTitle") for prod in product_infos],
+        "Catalog Id": [catalog_id] * len(product_infos),
+    }
+    # Attribut absent d'un produit : override None, mapping vide
+    data.update(sparse_columns(overrides, override_columns, _override_value, None))
+    data.update(sparse_columns(mappings, attr_mapping_columns, _mapping_label, ""))
+    # Override et mapping sur le même attribut : le mapping ne remplace pas l'override
+    shared_mappings = sparse_columns(mappings, shared_columns, _mapping_label, "")
+    for col in shared_columns:
+        data[col] = [
+            value if value not in (None, "") else mapped
+            for value, mapped in zip(data[col], shared_mappings[col])
+        ]
+    return pd.DataFrame(data), override_columns, attr_mapping_columns
@@ -0,0 +1,143 @@
+from beezup.client import BeezUPClient
+
+# Nom du champ personnalisé vide auquel les attributs non mappés sont associés
+EMPTY_CUSTOM_COLUMN_NAME = "Champ perso vide généré par API"
+
+class AttributeIndex:
+    """
+    Index des attributs canal d'un channelCatalog (réponse /channelCatalogs/{catalog_id}/attributes,
+    mise en cache disque par le client) : Channel Attribute Id -> nom de l'attribut.
+    Un attribut présent dans plusieurs catégories n'est indexé qu'une fois.
+    """
+
+    def __init__(self, categories: list):
+        self.names = {}
+        for category in categories:
+            for attr in category.get("attributes", []):
+                attr_id = attr.get("channelAttributeId")
+                if attr_id:
+                    self.names.setdefault(attr_id, attr.get("attributeName"))
+
+    @classmethod
+    def fetch(cls, client: BeezUPClient, catalog_id: str, refresh: bool = False):
+        """Construit l'index depuis l'API (ou le cache) ; None si la récupération échoue."""
+        response = client.get_channel_attributes_data(catalog_id, refresh=refresh)
+        if not response:
+            return None
+        return cls(response)
+
+    def __contains__(self, attribute_id):
+        return attribute_id in self.names
+
+    def __len__(self):
+        return len(self.names)
+
+    def name(self, attribute_id):
+        return self.names.get(attribute_id)
+
+def _column_name(column: dict):
+    # L'API renvoie userColumnName ; l'ancienne lecture utilisait "userColumName"
+    return column.get("userColumnName") or column.get("userColumName")
+
+def find_custom_column(client: BeezUPClient, store_id: str, name: str = EMPTY_CUSTOM_COLUMN_NAME,
+                       refresh: bool = False):
+    """ID de la colonne personnalisée portant ce nom (liste mise en cache par le client), sinon None."""
+    custom_columns = client.get_custom_columns(store_id, refresh=refresh) or {}
+    for column in custom_columns.get("customColumns", []):
+        if _column_name(column) == name:
+            return column.get("id")
+    return None
+
+def parse_attribute_ids(text: str) -> list:
+    """Channel Attribute Id saisis (un par ligne), strippés, sans doublon, dans l'ordre."""
+    return list(dict.fromkeys(line.strip() for line in text.splitlines() if line.strip()))
+
+def plan_column_mappings(existing: list, attribute_ids: list, catalog_column_id: str,
+                         index: AttributeIndex, keep_existing: bool = False) -> dict:
+    """
+    Calcule le columnMappings complet à envoyer, fusionné par channelColumnId :
+      - les IDs absents de l'index d'attributs du catalogue sont écartés (unknown)
+      - un attribut sans mapping (ou sans catalogColumnId) est associé à catalog_column_id (added)
+      - un attribut déjà associé à catalog_column_id n'est pas modifié (already)
+      - un attribut associé à une autre colonne est réassocié (remapped),
+        sauf keep_existing=True où il est conservé tel quel (mapped_elsewhere)
+      - les doublons du columnMappings actuel (même channelColumnId) sont supprimés, le dernier l'emporte
+    Returns:
+        dict : payload, changed (False -> aucun PUT nécessaire), added, remapped, already,
+        mapped_elsewhere, unknown, duplicates_removed
+    """
+    merged = {}
+    duplicates_removed = 0
+    for mapping in existing:
+        key = mapping.get("channelColumnId")
+        if key in merged:
+            duplicates_removed += 1
+            # Réinsertion : le dernier doublon l'emporte, à sa position
+            del merged[key]
+        merged[key] = mapping
+
+    plan = {
+        "added": [], "remapped": [], "already": [], "mapped_elsewhere": [], "unknown": [],
+        "duplicates_removed": duplicates_removed
+    }
+    for attr_id in dict.fromkeys(attribute_ids):
+        if attr_id not in index:
+            plan["unknown"].append(attr_id)
+            continue
+        current = merged.get(attr_id)
+        if current is None or not current.get("catalogColumnId"):
+            plan["added"].append(attr_id)
+        elif current.get("catalogColumnId") == catalog_column_id:
+            plan["already"].append(attr_id)
+            continue
+        elif not keep_existing:
+            plan["remapped"].append(attr_id)
+        else:
+            plan["mapped_elsewhere"].append(attr_id)
+            continue
+        merged[attr_id] = {"channelColumnId": attr_id, "catalogColumnId": catalog_column_id}
+
+    plan["payload"] = list(merged.values())
+    plan["changed"] = bool(plan["added"] or plan["remapped"] or duplicates_removed)
+    return plan
+
+def apply_column_mappings(client: BeezUPClient, catalog_id: str, store_id: str, attribute_ids: list,
+                          index: AttributeIndex, keep_existing: bool = False, dry_run: bool = False) -> dict:
+    """
+    Associe des attributs au champ personnalisé vide, en un seul PUT columnMappings :
+    le champ est recherché (liste en cache), créé seulement s'il y a des attributs à associer,
+    le mapping courant est relu sur l'API, puis fusionné (plan_column_mappings).
+    Aucun PUT n'est envoyé si rien ne change, ni en dry_run.
+    Returns:
+        le plan, complété par custom_column_id, created (champ créé), sent (PUT envoyé)
+        et status_code / error (réponse du PUT)
+    Raises:
+        ValueError si le channelCatalog ou le champ personnalisé est indisponible
+    """
+    custom_id = find_custom_column(client, store_id)
+    mapping_data = client.get_channel_catalog_data(catalog_id, refresh=True)
+    if not mapping_data:
+        raise ValueError(f"Channel catalog introuvable : {catalog_id}")
+    existing = mapping_data.get("columnMappings") or []
+
+    plan = plan_column_mappings(existing, attribute_ids, custom_id, index, keep_existing)
+    created = False
+    if custom_id is None and (plan["added"] or plan["remapped"]) and not dry_run:
+        # Le cache peut dater d'avant la création du champ : relecture sur l'API avant d'en créer un
+        custom_id = find_custom_column(client, store_id, refresh=True)
+        if custom_id is None:
+            custom_id = client.create_custom_column(store_id)
+            if not custom_id:
+                raise ValueError("Impossible de créer le champ personnalisé vide")
+            created = True
+        plan = plan_column_mappings(existing, attribute_ids, custom_id, index, keep_existing)
+
+    plan.update({"custom_column_id": custom_id, "created": created, "sent": False,
+                 "status_code": None, "error": None})
+    if plan["changed"] and not dry_run:
+        resp = client.update_column_mapping(catalog_id, plan["payload"])
+        plan["sent"] = True
+        plan["status_code"] = resp.status_code
+        if resp.status_code not in (200, 204):
+            plan["error"] = resp.text
+    return plan
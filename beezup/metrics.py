@@ -0,0 +1,168 @@
+import json
+import threading
+import time
+from collections import Counter, deque
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+# Bornes supérieures (s) des tranches de l'histogramme de latence par endpoint
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# Nombre maximal d'étapes et de DataFrames conservés (les plus anciens sont oubliés)
+MAX_SPANS = 1000
+MAX_FRAMES = 1000
+
+# Segments fixes des routes BeezUP ; tout autre segment est un identifiant
+_ROUTE_WORDS = {
+    "user", "channelCatalogs", "catalogs", "catalogColumns", "categories", "attributes", "mapping",
+    "products", "list", "overrides", "customColumns", "decrypted", "columnMappings"
+}
+
+def endpoint_name(method: str, route: str) -> str:
+    """Nom d'endpoint sans identifiants : 'POST /user/channelCatalogs/{id}/products'."""
+    path = route.split("?")[0]
+    segments = [s if s in _ROUTE_WORDS or not s else "{id}" for s in path.split("/")]
+    return f"{method} {'/'.join(segments)}"
+
+def _new_endpoint():
+    return {
+        "requests": 0,
+        "errors": 0,
+        "statuses": Counter(),
+        "bytes_sent": 0,
+        "bytes_received": 0,
+        "seconds": 0.0,
+        "max_seconds": 0.0,
+        "histogram": [0] * (len(LATENCY_BUCKETS) + 1)
+    }
+
+class Metrics:
+    """
+    Instrumentation d'un client BeezUP et des pipelines qui l'utilisent, thread-safe :
+      - étapes chronométrées (span), imbriquables
+      - requêtes HTTP par endpoint : nombre, statuts, octets, histogramme de latence
+      - compteurs d'évènements (cache, 429/503...)
+      - dimensions des DataFrames aux points de passage entre étapes
+    snapshot() / to_json() exportent l'ensemble.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.started_at = datetime.now(timezone.utc)
+            self._origin = time.perf_counter()
+            self.spans = deque(maxlen=MAX_SPANS)
+            self.endpoints = {}
+            self.counters = Counter()
+            self.frames = deque(maxlen=MAX_FRAMES)
+
+    def _stack(self):
+        if not hasattr(self._local, "stack"):
+            self._local.stack = []
+        return self._local.stack
+
+    @contextmanager
+    def span(self, name: str):
+        """Chronomètre le bloc ; l'étape est enregistrée même si le bloc lève une exception."""
+        stack = self._stack()
+        parent = stack[-1] if stack else None
+        stack.append(name)
+        start = time.perf_counter()
+        error = None
+        try:
+            yield
+        except BaseException as e:
+            error = type(e).__name__
+            raise
+        finally:
+            stack.pop()
+            self.add_span(name, time.perf_counter() - start, parent=parent, start=start, error=error)
+
+    def add_span(self, name: str, seconds: float, parent: str = None, start: float = None, error: str = None):
+        """Enregistre une étape déjà chronométrée (start : time.perf_counter() au début)."""
+        if parent is None:
+            stack = self._stack()
+            parent = stack[-1] if stack else None
+        if start is None:
+            start = time.perf_counter() - seconds
+        with self._lock:
+            self.spans.append({
+                "name": name,
+                "parent": parent,
+                "start": round(start - self._origin, 4),
+                "seconds": round(seconds, 4),
+                "error": error
+            })
+
+    def record_request(self, method: str, route: str, status, seconds: float,
+                       bytes_sent: int = 0, bytes_received: int = 0):
+        """Enregistre une requête HTTP (status None : pas de réponse, timeout ou connexion)."""
+        name = endpoint_name(method, route)
+        bucket = next((i for i, bound in enumerate(LATENCY_BUCKETS) if seconds <= bound), len(LATENCY_BUCKETS))
+        with self._lock:
+            endpoint = self.endpoints.get(name)
+            if endpoint is None:
+                endpoint = self.endpoints[name] = _new_endpoint()
+            endpoint["requests"] += 1
+            endpoint["statuses"][str(status) if status is not None else "none"] += 1
+            if status is None or status >= 400:
+                endpoint["errors"] += 1
+            endpoint["bytes_sent"] += bytes_sent
+            endpoint["bytes_received"] += bytes_received
+            endpoint["seconds"] += seconds
+            endpoint["max_seconds"] = max(endpoint["max_seconds"], seconds)
+            endpoint["histogram"][bucket] += 1
+
+    def increment(self, name: str, count: int = 1):
+        with self._lock:
+            self.counters[name] += count
+
+    def record_frame(self, label: str, df, span: str = None):
+        """
+        Dimensions d'un DataFrame passé d'une étape à l'autre, rattaché à l'étape span
+        (par défaut l'étape en cours dans ce thread).
+        """
+        if span is None:
+            stack = self._stack()
+            span = stack[-1] if stack else None
+        rows, columns = df.shape if df is not None else (0, 0)
+        with self._lock:
+            self.frames.append({
+                "label": label,
+                "span": span,
+                "rows": int(rows),
+                "columns": int(columns)
+            })
+
+    def snapshot(self) -> dict:
+        """Copie sérialisable (JSON) de toutes les mesures."""
+        bounds = [str(bound) for bound in LATENCY_BUCKETS] + ["+Inf"]
+        with self._lock:
+            endpoints = {
+                name: {
+                    "requests": e["requests"],
+                    "errors": e["errors"],
+                    "statuses": dict(e["statuses"]),
+                    "bytes_sent": e["bytes_sent"],
+                    "bytes_received": e["bytes_received"],
+                    "seconds": round(e["seconds"], 4),
+                    "mean_seconds": round(e["seconds"] / e["requests"], 4) if e["requests"] else 0.0,
+                    "max_seconds": round(e["max_seconds"], 4),
+                    "latency_histogram": dict(zip(bounds, e["histogram"]))
+                }
+                for name, e in sorted(self.endpoints.items())
+            }
+            return {
+                "started_at": self.started_at.isoformat(),
+                "elapsed_seconds": round(time.perf_counter() - self._origin, 3),
+                "spans": list(self.spans),
+                "endpoints": endpoints,
+                "counters": dict(self.counters),
+                "frames": list(self.frames)
+            }
+
+    def to_json(self, indent: int = 2) -> str:
+        return json.dumps(self.snapshot(), ensure_ascii=False, indent=indent)
@@ -0,0 +1,72 @@
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from beezup.client import BeezUPClient
+
+# Nombre de PUT overrides envoyés simultanément (le rate limiter du client reste prioritaire)
+PUSH_WORKERS = 8
+# Statut des produits dont les overrides sont déjà à jour (aucun PUT envoyé)
+UNCHANGED_STATUS = "— (aucun changement)"
+
+def is_noop(candidate: dict) -> bool:
+    """True si le payload est vide ou identique aux overrides actuels du produit (voir build_payloads)."""
+    return not candidate["payload"] or candidate.get("changes", 1) == 0
+
+def split_noop(candidates: list) -> tuple[list, list]:
+    """Sépare les candidats à envoyer de ceux dont les overrides sont déjà à jour."""
+    to_send, unchanged = [], []
+    for candidate in candidates:
+        (unchanged if is_noop(candidate) else to_send).append(candidate)
+    return to_send, unchanged
+
+def _push_one(client: BeezUPClient, candidate: dict) -> dict:
+    """Envoie le payload d'un produit et renvoie sa ligne de statut."""
+    payload = candidate["payload"]
+    status = {
+        "EAN": candidate["EAN"],
+        "Product Id": candidate["Product Id"],
+        "Count": len(payload),
+    }
+    if is_noop(candidate):
+        status["Count"] = 0
+        status["Status"] = UNCHANGED_STATUS
+        return status
+    try:
+        response = client.put_product_overrides(candidate["Catalog Id"], candidate["Product Id"], payload)
+        status["Status"] = "OK" if response is not None else "Erreur: envoi refusé ou en échec (voir logs)"
+    except Exception as e:
+        status["Status"] = f"Erreur: {e}"
+    return status
+
+def push_overrides(client: BeezUPClient, candidates: list, max_workers: int = PUSH_WORKERS, on_progress=None) -> list:
+    """
+    Envoie les overrides de chaque produit (PUT /products/{id}/overrides) sur un pool de
+    max_workers threads, au débit autorisé par le rate limiter du client.
+    Les produits déjà à jour (is_noop) ne sont pas envoyés : leur statut est UNCHANGED_STATUS.
+    Args:
+        candidates: list de dicts {"EAN", "Product Id", "Catalog Id", "payload"[, "changes"]}
+        on_progress: callable(done, total, rate, eta) appelé dans le thread appelant après
+                     chaque produit envoyé (rate en produits/s, eta en secondes)
+    Returns:
+        Lignes de statut {"EAN", "Product Id", "Count", "Status"} dans l'ordre des candidats
+    """
+    status_rows = [None] * len(candidates)
+    to_send = []
+    for i, candidate in enumerate(candidates):
+        if is_noop(candidate):
+            status_rows[i] = _push_one(client, candidate)
+        else:
+            to_send.append(i)
+    client.metrics.increment("overrides_unchanged", len(candidates) - len(to_send))
+
+    total = len(to_send)
+    start = time.monotonic()
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {executor.submit(_push_one, client, candidates[i]): i for i in to_send}
+        for done, future in enumerate(as_completed(futures), start=1):
+            status_rows[futures[future]] = future.result()
+            if on_progress is not None:
+                elapsed = max(time.monotonic() - start, 1e-6)
+                rate = done / elapsed
+                on_progress(done, total, rate, (total - done) / rate)
+    return status_rows
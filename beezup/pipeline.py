@@ -0,0 +1,329 @@
+import time
+from datetime import datetime
+
+import pandas as pd
+
+from beezup.baseline import BaselineStore
+from beezup.builder import build_and_export_excel
+from beezup.categories import CategoryIndex
+from beezup.client import BeezUPClient
+from beezup.diff import build_payloads
+from beezup.extractor import (
+    extract_channel_attributes, extract_octopia_channel_mapping, extract_octopia_product_fields,
+    extract_products, get_catalog_column_id, get_store_and_channel_ids
+)
+from beezup.formatter import build_datainfo_dataframe, build_dropdown_dataframe, clean_attribute_df
+from beezup.frames import build_product_frame
+from beezup.overrides import push_overrides
+from beezup.reader import SpooledTemplate
+
+FIXED_COLUMNS = [
+    "Channel Full Category Path", "Product Id", "Offer Code", "EAN", "Name", "Description", "Catalog Id"
+]
+IMAGE_COLUMNS = [f"Image {i}" for i in range(1, 7)]
+
+# ---------- GÉNÉRATION DU TEMPLATE ---------- #
+
+def catalog_column_ids(client: BeezUPClient, store_id: str) -> dict:
+    """
+    IDs des colonnes catalogue à extraire : catégorie niveau 3, EAN, description,
+    et les images 1..6 réellement présentes dans ce catalogue.
+    """
+    catalog_columns = (client.get_catalog_columns(store_id) or {}).get("catalogColumns", [])
+    column_ids = {
+        "Category Code": get_catalog_column_id(catalog_columns, "categ3Code"),
+        "EAN": get_catalog_column_id(catalog_columns, "ean"),
+        "Description": get_catalog_column_id(catalog_columns, "description")
+    }
+    for i in range(1, 7):
+        img_id = get_catalog_column_id(catalog_columns, f"imageUrl{i}")
+        if img_id:
+            column_ids[f"Image {i}"] = img_id
+    return column_ids
+
+def merge_octopia_fields(product_df: pd.DataFrame, octopia_df: pd.DataFrame,
+                         override_columns: list, attr_mapping_columns: list) -> pd.DataFrame:
+    """
+    Fusionne les produits du canal avec les champs catalogue (catégorie, EAN, description, images)
+    et ordonne les colonnes : fixes, images, overrides puis mappings.
+    Les Product Id des deux DataFrames sont normalisés en chaînes strippées (en place).
+    """
+    product_df["Product Id"] = product_df["Product Id"].astype(str).str.strip()
+    octopia_df["Product Id"] = octopia_df["Product Id"].astype(str).str.strip()
+
+    base_fixed = ["Category Code", "EAN", "Description"]
+    image_fixed = [col for col in IMAGE_COLUMNS if col in octopia_df.columns]
+    octo_cols = ["Product Id"] + base_fixed + image_fixed
+
+    merged_df = pd.merge(product_df, octopia_df[octo_cols], on="Product Id", how="left")
+
+    cols_order = (
+            ["Category Code", "Product Id", "Offer Code", "EAN", "Name", "Description", "Catalog Id"] +
+            image_fixed +
+            override_columns +
+            attr_mapping_columns
+    )
+    return merged_df[[col for col in cols_order if col in merged_df.columns]]
+
+def attach_channel_paths(client: BeezUPClient, catalog_id: str, merged_df: pd.DataFrame,
+                         index: CategoryIndex = None) -> pd.DataFrame:
+    """
+    Remplace la colonne "Category Code" par "Channel Full Category Path" (placée en tête).
+    """
+    mapping_df = extract_octopia_channel_mapping(client, catalog_id, merged_df["Category Code"].unique(), index=index)
+    merged_df = merged_df.merge(mapping_df, on="Category Code", how="left")
+    merged_df = merged_df.drop(columns=["Category Code"])
+
+    cols = merged_df.columns.tolist()
+    cols.insert(0, cols.pop(cols.index("Channel Full Category Path")))
+    return merged_df[cols]
+
+def select_attributes(attribute_df: pd.DataFrame, statuses=(), attribute_ids=()) -> pd.DataFrame:
+    """
+    Sélection finale des attributs (attribute_df nettoyé par clean_attribute_df) :
+    ceux dont le statut est dans statuses, plus les Channel Attribute Id listés.
+    """
+    statuses = [s.capitalize() for s in statuses]
+    selected_ids = set(attribute_df.loc[attribute_df["Status"].isin(statuses), "Channel Attribute Id"])
+    selected_ids.update(attribute_ids)
+    return (
+        attribute_df[attribute_df["Channel Attribute Id"].isin(selected_ids)]
+        .drop_duplicates(subset=["Channel Attribute Id", "Attribute Name"])
+        .reset_index(drop=True)
+    )
+
+def build_template_frame(merged_df: pd.DataFrame, selected_df: pd.DataFrame,
+                         override_columns: list, attr_mapping_columns: list):
+    """
+    Construit le DataFrame du template : colonnes fixes, images, overrides, mappings des attributs
+    sélectionnés puis attributs sélectionnés restants ; en-têtes d'attributs "Nom | Id".
+    Returns:
+        (template_df, selected_df dédoublonné par Channel Attribute Id, noms d'attributs encore en double)
+    """
+    fixed_columns = FIXED_COLUMNS + [col for col in IMAGE_COLUMNS if col in merged_df.columns]
+
+    # Un attribut sélectionné dans plusieurs catégories n'a qu'une colonne
+    selected_attr_cols = list(dict.fromkeys(selected_df["Channel Attribute Id"]))
+    attr_mapping_to_keep = [col for col in attr_mapping_columns if col in selected_attr_cols]
+    attr_mapping_to_drop = [col for col in attr_mapping_columns if col not in selected_attr_cols]
+    merged_df_ = merged_df.drop(columns=[col for col in attr_mapping_to_drop if col in merged_df.columns])
+
+    final_cols = (
+        fixed_columns +
+        override_columns +
+        attr_mapping_to_keep +
+        [col for col in selected_attr_cols if col not in override_columns + attr_mapping_to_keep]
+    )
+    for col in final_cols:
+        if col not in merged_df_.columns:
+            merged_df_[col] = ""
+    template_df = merged_df_[[col for col in final_cols if col in merged_df_.columns]]
+
+    # Doublons Cross Categories / catégorie spécifique : la version spécifique est conservée
+    if "Channel Origin Category Name" in selected_df.columns:
+        selected_df = (
+            selected_df.sort_values(
+                by=["Channel Attribute Id", "Channel Origin Category Name"],
+                key=lambda col: col.eq("Cross Categories"),  # True = CrossCat → passe après
+                ascending=True
+            )
+            .drop_duplicates(subset=["Channel Attribute Id"], keep="first")
+            .reset_index(drop=True)
+        )
+    dupes = selected_df[selected_df.duplicated(subset=["Channel Attribute Id"], keep=False)]
+    duplicate_names = dupes["Attribute Name"].unique().tolist()
+
+    id_to_label = {
+        attr_id: f"{name} | {attr_id}"
+        for attr_id, name in zip(selected_df["Channel Attribute Id"], selected_df["Attribute Name"])
+    }
+    return template_df.rename(columns=id_to_label), selected_df, duplicate_names
+
+def dedupe_template_columns(template_df: pd.DataFrame):
+    """
+    Rend les en-têtes uniques ('Attribut | ID', 'Attribut | ID_2', ...).
+    Returns:
+        (template_df, True si des colonnes ont été renommées)
+    """
+    if not template_df.columns.duplicated().any():
+        return template_df, False
+    seen = {}
+    new_cols = []
+    for col in template_df.columns:
+        if col not in seen:
+            seen[col] = 1
+            new_cols.append(col)
+        else:
+            seen[col] += 1
+            new_cols.append(f"{col}_{seen[col]}")
+    template_df = template_df.copy()
+    template_df.columns = new_cols
+    return template_df, True
+
+def template_filename(store_name: str, nb_products: int, day: datetime = None) -> str:
+    """Nom du fichier exporté : template_{boutique}_{date} [{n} products].xlsx"""
+    today_str = (day or datetime.now()).strftime("%Y-%m-%d")
+    if not store_name:
+        store_name_safe = "no_name"
+    else:
+        store_name_safe = "".join(c for c in store_name if c.isalnum() or c in ("_", "-")).strip().lower()
+    return f"template_{store_name_safe}_{today_str} [{nb_products} products].xlsx"
+
+class _Stages:
+    """
+    Chronomètre les étapes d'un pipeline et les signale via on_stage(libellé, secondes).
+    Si metrics (beezup.metrics.Metrics) est fourni, chaque étape y est aussi enregistrée
+    sous un nom stable (name), le libellé affiché pouvant contenir des volumes.
+    """
+
+    def __init__(self, on_stage=None, metrics=None):
+        self.on_stage = on_stage
+        self.metrics = metrics
+        self.timings = {}
+        self._last = time.perf_counter()
+
+    def done(self, label, name=None):
+        now = time.perf_counter()
+        self.timings[label] = now - self._last
+        if self.metrics is not None:
+            self.metrics.add_span(name or label, self.timings[label], start=self._last)
+        self._last = now
+        if self.on_stage:
+            self.on_stage(label, self.timings[label])
+
+def generate_template(client: BeezUPClient, catalog_id: str, eans: list, output_file: str,
+                      statuses=(), attribute_ids=(), on_stage=None) -> dict:
+    """
+    Pipeline complet EANs -> template Excel, sans interface :
+    extraction produits / catalogue, chemins canal, attributs, sélection, export.
+    on_stage(libellé, secondes) est appelé à la fin de chaque étape ; étapes et dimensions
+    des DataFrames intermédiaires sont aussi enregistrées dans client.metrics.
+    Returns:
+        dict : template_df, output_file, stats (extraction), timings (s par étape),
+        duplicate_names, renamed_columns
+    Raises:
+        ValueError si le catalogue est introuvable ou si aucun attribut n'est sélectionné ;
+        IncompleteExtractionError si une extraction reste partielle.
+    """
+    metrics = client.metrics
+    stages = _Stages(on_stage, metrics)
+    store_id, _channel_id = get_store_and_channel_ids(client, catalog_id)
+    if store_id is None:
+        raise ValueError(f"Channel catalog introuvable : {catalog_id}")
+    stages.done("Identifiants boutique / canal", "store_and_channel_ids")
+
+    stats = {}
+    product_infos = extract_products(client, catalog_id, eans, stats=stats)
+    product_df, override_columns, attr_mapping_columns = build_product_frame(product_infos, catalog_id)
+    metrics.record_frame("product_df", product_df, span="extract_products")
+    stages.done(f"Extraction produits ({len(product_df)})", "extract_products")
+
+    column_ids = catalog_column_ids(client, store_id)
+    octopia_df = extract_octopia_product_fields(client, store_id, column_ids, product_df["Product Id"].tolist())
+    merged_df = merge_octopia_fields(product_df, octopia_df, override_columns, attr_mapping_columns)
+    metrics.record_frame("octopia_df", octopia_df, span="extract_octopia_product_fields")
+    metrics.record_frame("merged_df", merged_df, span="extract_octopia_product_fields")
+    stages.done("Extraction champs catalogue", "extract_octopia_product_fields")
+
+    merged_df = attach_channel_paths(client, catalog_id, merged_df)
+    channel_paths = merged_df["Channel Full Category Path"].unique().tolist()
+    attribute_df = clean_attribute_df(extract_channel_attributes(client, catalog_id, channel_paths))
+    metrics.record_frame("attribute_df", attribute_df, span="channel_paths_and_attributes")
+    stages.done(f"Catégories et attributs ({len(attribute_df)})", "channel_paths_and_attributes")
+
+    selected_df = select_attributes(attribute_df, statuses, attribute_ids)
+    if selected_df.empty:
+        raise ValueError("Aucun attribut sélectionné (statuts / Channel Attribute Id)")
+    template_df, selected_df, duplicate_names = build_template_frame(
+        merged_df, selected_df, override_columns, attr_mapping_columns
+    )
+    template_df, renamed_columns = dedupe_template_columns(template_df)
+    dropdown_df = build_dropdown_dataframe(client, catalog_id, selected_df)
+    datainfo_df = build_datainfo_dataframe(selected_df)
+    for label, df in (("selected_df", selected_df), ("template_df", template_df),
+                      ("dropdown_df", dropdown_df), ("datainfo_df", datainfo_df)):
+        metrics.record_frame(label, df, span="build_template")
+    stages.done(f"Template ({len(template_df)} x {len(template_df.columns)})", "build_template")
+
+    build_and_export_excel(template_df, datainfo_df, dropdown_df, output_file=output_file)
+    stages.done("Export Excel", "build_and_export_excel")
+
+    return {
+        "template_df": template_df,
+        "output_file": output_file,
+        "stats": stats,
+        "timings": stages.timings,
+        "duplicate_names": duplicate_names,
+        "renamed_columns": renamed_columns
+    }
+
+# ---------- RÉINTÉGRATION DU TEMPLATE ---------- #
+
+# Colonnes du template rempli sans lesquelles aucun payload ne peut être construit
+REQUIRED_TEMPLATE_COLUMNS = ("Product Id", "Catalog Id")
+
+def scan_template(source) -> SpooledTemplate:
+    """
+    Lecture unique du template rempli (voir SpooledTemplate) : EANs et nombre de lignes,
+    lots mis de côté pour plan_overrides. À fermer après usage (with).
+    Raises:
+        ValueError si l'onglet Template est vide ou s'il manque une colonne obligatoire
+    """
+    template = SpooledTemplate(source)
+    if template.columns is None:
+        template.close()
+        raise ValueError("onglet Template vide")
+    for req in REQUIRED_TEMPLATE_COLUMNS:
+        if req not in template.columns:
+            template.close()
+            raise ValueError(f"Colonne obligatoire manquante : '{req}'")
+    return template
+
+def fetch_current_state_by_eans(client: BeezUPClient, catalog_id: str, eans: list) -> BaselineStore:
+    """
+    Retourne l'état courant des produits (overrides et valeurs effectives normalisés),
+    indexé par productId.
+    """
+    if not eans:
+        return BaselineStore()
+    return BaselineStore.from_product_infos(extract_products(client, catalog_id, eans))
+
+def plan_overrides(client: BeezUPClient, catalog_id: str, template: SpooledTemplate) -> list:
+    """
+    Construit la liste des payloads à envoyer, en s'assurant que :
+      - TOUTES les clés déjà en override sont renvoyées (même si identiques)
+      - Les nouvelles valeurs du template écrasent celles des overrides
+      - Les attributs non overridés ne sont envoyés que si différents du baseline effectif
+    L'état courant est récupéré sur les EANs du template (scan_template), puis chaque lot
+    est relu et comparé à l'index du baseline, construit une seule fois : un seul lot de
+    lignes est en mémoire à la fois.
+    """
+    baseline = fetch_current_state_by_eans(client, catalog_id, template.eans)
+    baseline.index()
+
+    candidates = []
+    for i, batch in enumerate(template, start=1):
+        client.metrics.record_frame(f"template_batch_{i}", batch)
+        candidates.extend(build_payloads(batch, baseline))
+    return candidates
+
+def apply_template(client: BeezUPClient, catalog_id: str, source, dry_run: bool = False,
+                   on_stage=None, on_progress=None) -> dict:
+    """
+    Pipeline complet template rempli -> overrides BeezUP, sans interface.
+    dry_run=True calcule le plan sans rien envoyer. on_progress : voir push_overrides.
+    Returns:
+        dict : candidates, status_rows (vide en dry_run), timings (s par étape)
+    """
+    stages = _Stages(on_stage, client.metrics)
+    with scan_template(source) as template:
+        stages.done(f"Lecture du template ({template.rows} lignes)", "read_template")
+        candidates = plan_overrides(client, catalog_id, template)
+    stages.done(f"Plan de mise à jour ({len(candidates)} produits)", "plan_overrides")
+
+    status_rows = []
+    if not dry_run:
+        status_rows = push_overrides(client, candidates, on_progress=on_progress)
+        stages.done("Envoi des overrides", "push_overrides")
+
+    return {"candidates": candidates, "status_rows": status_rows, "timings": stages.timings}
@@ -0,0 +1,79 @@
+import threading
+import time
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+
+class AdaptiveRateLimiter:
+    """
+    Token bucket adaptatif partagé par toutes les requêtes d'un client BeezUP.
+    - Démarre à `rate` requêtes/s (rafale max `burst`).
+    - Sur 429/503 : divise le débit par `1 / decrease` et suspend les envois
+      pendant la durée Retry-After si l'API la fournit.
+    - Sur succès : remonte le débit de `increase` req/s, jusqu'à `max_rate`.
+    Utilisable depuis plusieurs threads (acquire).
+    """
+
+    def __init__(self, rate=10.0, min_rate=0.5, max_rate=50.0, increase=0.5, decrease=0.5, burst=None):
+        self.rate = float(rate)
+        self.min_rate = float(min_rate)
+        self.max_rate = max(float(max_rate), self.rate)
+        self.increase = float(increase)
+        self.decrease = float(decrease)
+        self.burst = float(burst) if burst else max(1.0, self.rate)
+        self._tokens = self.burst
+        self._updated = time.monotonic()
+        self._last_throttle = 0.0
+        self._lock = threading.Lock()
+
+    def _reserve(self):
+        """Réserve un jeton et renvoie le temps d'attente (s) avant de pouvoir envoyer."""
+        with self._lock:
+            now = time.monotonic()
+            # _updated peut être dans le futur pendant une pause Retry-After
+            elapsed = max(0.0, now - self._updated)
+            self._tokens = min(self.burst, self._tokens + elapsed * self.rate)
+            self._updated = max(self._updated, now)
+            self._tokens -= 1
+            deficit = max(0.0, -self._tokens)
+            return (self._updated - now) + deficit / self.rate
+
+    def acquire(self):
+        """Bloque le thread courant jusqu'à obtention d'un jeton."""
+        wait = self._reserve()
+        if wait > 0:
+            time.sleep(wait)
+
+    def on_success(self):
+        """Réponse normale : remontée progressive du débit."""
+        with self._lock:
+            self.rate = min(self.max_rate, self.rate + self.increase)
+
+    def on_throttle(self, retry_after=None):
+        """Réponse 429/503 : réduction du débit et pause éventuelle (Retry-After, en secondes)."""
+        with self._lock:
+            now = time.monotonic()
+            # Une rafale de 429 correspond à une seule surcharge : on ne réduit qu'une fois par seconde
+            if now - self._last_throttle >= 1.0:
+                self.rate = max(self.min_rate, self.rate * self.decrease)
+                self._last_throttle = now
+            self._tokens = min(self._tokens, 0.0)
+            if retry_after:
+                self._updated = max(self._updated, now + retry_after)
+
+def parse_retry_after(value):
+    """
+    Convertit un en-tête Retry-After (secondes ou date HTTP) en secondes, None si absent/invalide.
+    """
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if retry_at.tzinfo is None:
+        retry_at = retry_at.replace(tzinfo=timezone.utc)
+    return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
@@ -0,0 +1,132 @@
+import pickle
+import tempfile
+
+import pandas as pd
+from openpyxl import load_workbook
+
+TEMPLATE_SHEET = "Template"
+TEMPLATE_BATCH_SIZE = 5000
+# Colonnes lues en texte quel que soit le type de cellule saisi dans Excel
+STRING_COLUMNS = ("EAN", "Product Id")
+
+def _as_text(value):
+    """
+    Valeur de cellule -> chaîne stable (3600000000000.0 -> '3600000000000'), None si vide.
+    """
+    if value is None:
+        return None
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value)
+
+def _as_value(value):
+    """
+    Conversion alignée sur pd.read_excel : flottants entiers -> int.
+    """
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    return value
+
+def _unique_headers(header_row):
+    """
+    En-têtes du Template, dédoublonnés comme pandas ('Col', 'Col.1', ...) ;
+    une cellule d'en-tête vide devient 'Unnamed: i'.
+    """
+    headers, seen = [], {}
+    for i, name in enumerate(header_row):
+        name = f"Unnamed: {i}" if name is None else str(name)
+        if name in seen:
+            seen[name] += 1
+            name = f"{name}.{seen[name]}"
+        else:
+            seen[name] = 0
+        headers.append(name)
+    return headers
+
+def iter_template_batches(source, batch_size: int = TEMPLATE_BATCH_SIZE):
+    """
+    Lit uniquement l'onglet Template (premier onglet à défaut) en lecture seule / streaming
+    et produit des DataFrames d'au plus batch_size lignes. Toutes les colonnes sont de type
+    object pour un typage identique d'un lot à l'autre ; EAN et Product Id sont des chaînes.
+    Les lignes entièrement vides sont ignorées ; un Template sans ligne donne un lot vide.
+    """
+    workbook = load_workbook(source, read_only=True, data_only=True)
+    try:
+        ws = workbook[TEMPLATE_SHEET] if TEMPLATE_SHEET in workbook.sheetnames else workbook.worksheets[0]
+        rows = ws.iter_rows(values_only=True)
+        header_row = next(rows, None)
+        if header_row is None:
+            return
+        # Colonnes d'en-tête vides en fin de ligne ignorées (cellules formatées hors tableau)
+        width = len(header_row)
+        while width and header_row[width - 1] is None:
+            width -= 1
+        headers = _unique_headers(header_row[:width])
+        converters = [_as_text if name in STRING_COLUMNS else _as_value for name in headers]
+
+        batch, yielded = [], False
+        for row in rows:
+            row = row[:width]
+            if all(value is None for value in row):
+                continue
+            if len(row) < width:
+                row = row + (None,) * (width - len(row))
+            batch.append([convert(value) for convert, value in zip(converters, row)])
+            if len(batch) >= batch_size:
+                yield pd.DataFrame(batch, columns=headers, dtype=object)
+                batch, yielded = [], True
+        if batch or not yielded:
+            # Template sans ligne : un lot vide conserve les en-têtes
+            yield pd.DataFrame(batch, columns=headers, dtype=object)
+    finally:
+        workbook.close()
+
+class SpooledTemplate:
+    """
+    Template rempli lu une seule fois (iter_template_batches) : les lots sont mis de côté
+    dans un fichier temporaire et relus un par un en itérant sur l'objet. Nombre de lignes,
+    colonnes et EANs sont connus dès la lecture, sans garder les lots en mémoire.
+    """
+
+    def __init__(self, source, batch_size: int = TEMPLATE_BATCH_SIZE):
+        self.rows = 0
+        self.batches = 0
+        self.columns = None
+        eans = []
+        self._file = tempfile.TemporaryFile()
+        try:
+            for batch in iter_template_batches(source, batch_size):
+                if self.columns is None:
+                    self.columns = list(batch.columns)
+                if "EAN" in batch.columns:
+                    eans.extend(x.strip() for x in batch["EAN"].dropna().astype(str) if x.strip())
+                pickle.dump(batch, self._file, protocol=pickle.HIGHEST_PROTOCOL)
+                self.rows += len(batch)
+                self.batches += 1
+        except BaseException:
+            self.close()
+            raise
+        self.eans = list(dict.fromkeys(eans))
+
+    def __iter__(self):
+        self._file.seek(0)
+        for _ in range(self.batches):
+            yield pickle.load(self._file)
+
+    def close(self):
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def read_template(source, batch_size: int = TEMPLATE_BATCH_SIZE) -> pd.DataFrame:
+    """
+    Lit l'onglet Template en un seul DataFrame (voir iter_template_batches).
+    """
+    batches = list(iter_template_batches(source, batch_size))
+    if not batches:
+        return pd.DataFrame(dtype=object)
+    return pd.concat(batches, ignore_index=True)
@@ -0,0 +1,57 @@
+import random
+import threading
+import time
+
+# Statuts HTTP considérés comme transitoires (429/503 sont gérés par le rate limiter)
+RETRYABLE_STATUSES = (500, 502, 504)
+
+def backoff_delay(attempt, base=0.5, cap=30.0):
+    """
+    Délai avant la reprise n° attempt (0 = première reprise) :
+    backoff exponentiel plafonné, avec jitter "full" pour désynchroniser les threads.
+    """
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
+
+class CircuitBreaker:
+    """
+    Coupe-circuit partagé par les requêtes d'un client BeezUP.
+    - Fermé : les requêtes passent ; chaque échec transitoire incrémente un compteur.
+    - Ouvert : après `failure_threshold` échecs consécutifs, les requêtes sont refusées
+      immédiatement pendant `reset_timeout` secondes.
+    - Semi-ouvert : une requête d'essai passe ; succès -> fermé, échec -> ré-ouvert.
+    """
+
+    def __init__(self, failure_threshold=5, reset_timeout=30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._failures = 0
+        self._opened_at = None
+        self._trial_in_progress = False
+        self._lock = threading.Lock()
+
+    @property
+    def is_open(self):
+        return self._opened_at is not None
+
+    def allow(self):
+        """True si une requête peut être envoyée."""
+        with self._lock:
+            if self._opened_at is None:
+                return True
+            if time.monotonic() - self._opened_at < self.reset_timeout or self._trial_in_progress:
+                return False
+            self._trial_in_progress = True
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._trial_in_progress = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            self._trial_in_progress = False
+            if self._opened_at is not None or self._failures >= self.failure_threshold:
+                self._opened_at = time.monotonic()
@@ -0,0 +1,279 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+import pandas as pd
+
+from beezup.client import BeezUPClient
+from beezup.extractor import PAGE_WORKERS, extract_octopia_product_fields, extract_products
+
+# Fraîcheur (s) au-delà de laquelle un produit mémorisé est ré-extrait
+SNAPSHOT_MAX_AGE = 3600
+# Nombre de paramètres par requête SQL (IN (...)), sous la limite SQLite
+SQL_CHUNK_SIZE = 500
+
+def _content_hash(info: dict, fields) -> str:
+    raw = json.dumps([info, fields], sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+def _fields_key(column_ids: dict) -> str:
+    """Empreinte des colonnes catalogue extraites : les champs mémorisés avec d'autres colonnes sont périmés."""
+    raw = json.dumps(sorted(column_ids.items()), default=str)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+def _chunks(items: list, size: int = SQL_CHUNK_SIZE) -> list:
+    return [items[i:i + size] for i in range(0, len(items), size)]
+
+class ProductSnapshotStore:
+    """
+    Mémoire locale (SQLite) des extractions produits, par (périmètre, catalogue, EAN demandé, productId) :
+    productInfo (/channelCatalogs/{id}/products), champs catalogue (products/list),
+    empreinte du contenu et date d'extraction. L'EAN est celui envoyé au filtre channelEans,
+    qui peut différer du champ EAN du catalogue.
+    Le périmètre isole les comptes (dérivé de la clé API, voir snapshot_scope).
+    Le fichier peut être partagé entre threads, sessions Streamlit et processus.
+    """
+
+    def __init__(self, path=".cache/beezup_snapshots.sqlite"):
+        self.path = path
+        self._lock = threading.Lock()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS products_by_ean (
+                    scope TEXT NOT NULL,
+                    catalog_id TEXT NOT NULL,
+                    ean TEXT NOT NULL,
+                    product_id TEXT NOT NULL,
+                    info TEXT NOT NULL,
+                    fields TEXT,
+                    fields_key TEXT NOT NULL,
+                    content_hash TEXT NOT NULL,
+                    fetched_at REAL NOT NULL,
+                    PRIMARY KEY (scope, catalog_id, ean, product_id)
+                )
+                """
+            )
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_products_by_ean_product ON products_by_ean(scope, catalog_id, product_id)"
+            )
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def lookup(self, scope: str, catalog_id: str, eans: list, fields_key: str, max_age: float = SNAPSHOT_MAX_AGE) -> dict:
+        """
+        Produits mémorisés encore frais pour ces EANs demandés, avec les mêmes colonnes catalogue.
+        Returns:
+            dict {ean: [(product_id, info, fields), ...]}
+        """
+        found = {}
+        if max_age <= 0:
+            return found
+        min_fetched_at = time.time() - max_age
+        with self._lock, self._connect() as conn:
+            for chunk in _chunks(eans):
+                rows = conn.execute(
+                    f"""
+                    SELECT ean, product_id, info, fields FROM products_by_ean
+                    WHERE scope = ? AND catalog_id = ? AND fields_key = ? AND fetched_at >= ?
+                      AND ean IN ({','.join('?' * len(chunk))})
+                    ORDER BY rowid
+                    """,
+                    (scope, catalog_id, fields_key, min_fetched_at, *chunk)
+                ).fetchall()
+                for ean, product_id, info, fields in rows:
+                    found.setdefault(ean, []).append(
+                        (product_id, json.loads(info), json.loads(fields) if fields is not None else None)
+                    )
+        return found
+
+    def save(self, scope: str, catalog_id: str, rows: list, fields_key: str, eans: list = ()) -> int:
+        """
+        Enregistre des produits : rows = [(product_id, ean demandé, info, fields)].
+        Les produits mémorisés pour les EANs de `eans` (ré-extraits) sont remplacés par rows.
+        Returns:
+            nombre de produits déjà mémorisés dont le contenu a changé
+        """
+        now = time.time()
+        records = [
+            (scope, catalog_id, ean, product_id, json.dumps(info, separators=(",", ":")),
+             json.dumps(fields, separators=(",", ":")) if fields is not None else None,
+             fields_key, _content_hash(info, fields), now)
+            for product_id, ean, info, fields in rows
+        ]
+        with self._lock, self._connect() as conn:
+            previous = {}
+            for chunk in _chunks([record[3] for record in records]):
+                previous.update(conn.execute(
+                    f"""
+                    SELECT product_id, content_hash FROM products_by_ean
+                    WHERE scope = ? AND catalog_id = ? AND product_id IN ({','.join('?' * len(chunk))})
+                    """,
+                    (scope, catalog_id, *chunk)
+                ).fetchall())
+            changed = sum(
+                1 for record in {record[3]: record for record in records}.values()
+                if record[3] in previous and previous[record[3]] != record[7]
+            )
+            for chunk in _chunks(list(eans)):
+                conn.execute(
+                    f"""
+                    DELETE FROM products_by_ean
+                    WHERE scope = ? AND catalog_id = ? AND ean IN ({','.join('?' * len(chunk))})
+                    """,
+                    (scope, catalog_id, *chunk)
+                )
+            for chunk in _chunks(records):
+                conn.executemany("INSERT OR REPLACE INTO products_by_ean VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", chunk)
+        return changed
+
+    def invalidate(self, scope: str, catalog_id: str, product_ids: list = None):
+        """Oublie des produits (après un envoi d'overrides), ou tout le catalogue si product_ids est None."""
+        with self._lock, self._connect() as conn:
+            if product_ids is None:
+                conn.execute("DELETE FROM products_by_ean WHERE scope = ? AND catalog_id = ?", (scope, catalog_id))
+                return
+            for chunk in _chunks(list(product_ids)):
+                conn.execute(
+                    f"""
+                    DELETE FROM products_by_ean
+                    WHERE scope = ? AND catalog_id = ? AND product_id IN ({','.join('?' * len(chunk))})
+                    """,
+                    (scope, catalog_id, *chunk)
+                )
+
+    def clear(self):
+        with self._lock, self._connect() as conn:
+            conn.execute("DELETE FROM products_by_ean")
+
+def snapshot_scope(client: BeezUPClient, catalog_id: str) -> str:
+    """Périmètre des produits mémorisés : propre à la clé API du client et au catalogue."""
+    return client.cache_key(f"/snapshots/{catalog_id}")
+
+def _attribute_products(client: BeezUPClient, catalog_id: str, eans: list, product_infos: list,
+                        catalog_eans: dict, max_workers: int = PAGE_WORKERS) -> dict:
+    """
+    Rattache chaque produit extrait à l'EAN demandé qui l'a renvoyé.
+    Un produit dont l'EAN catalogue est l'un des EANs demandés lui est rattaché directement ;
+    s'il en reste d'autres, les EANs demandés restés sans produit sont interrogés un par un.
+    Returns:
+        dict {ean demandé: [productId, ...]} (ordre d'extraction) ; EANs sans produit absents
+    """
+    requested = set(eans)
+    by_ean, unattributed = {}, []
+    for info in product_infos:
+        product_id = str(info.get("productId", "")).strip()
+        ean = catalog_eans.get(product_id, "")
+        if ean in requested:
+            by_ean.setdefault(ean, []).append(product_id)
+        else:
+            unattributed.append(product_id)
+    unresolved = [ean for ean in eans if ean not in by_ean]
+    if not unattributed or not unresolved:
+        return by_ean
+
+    remaining = set(unattributed)
+    def fetch_one(ean):
+        return [str(info.get("productId", "")).strip() for info in extract_products(client, catalog_id, [ean], max_workers=1)]
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(unresolved)))) as executor:
+        for ean, product_ids in zip(unresolved, executor.map(fetch_one, unresolved)):
+            matched = [product_id for product_id in product_ids if product_id in remaining]
+            if matched:
+                by_ean[ean] = matched
+    return by_ean
+
+def extract_products_incremental(client: BeezUPClient, store: ProductSnapshotStore, catalog_id: str,
+                                 store_id: str, column_ids: dict, eans: list,
+                                 max_age: float = SNAPSHOT_MAX_AGE, stats: dict = None):
+    """
+    Extraction produits + champs catalogue avec reprise des produits mémorisés :
+    seuls les EANs absents du store, ou extraits il y a plus de max_age secondes, sont
+    demandés à l'API (extract_products puis extract_octopia_product_fields) ; le résultat
+    est fusionné avec les produits mémorisés, puis enregistré sous l'EAN demandé.
+    Ordre des produits : celui de extract_products quand tout est extrait (max_age=0 notamment),
+    sinon celui des EANs saisis (identique quand l'API renvoie les produits dans l'ordre demandé).
+    Un EAN sans produit n'est pas mémorisé (il est redemandé à chaque fois).
+    Returns:
+        (product_infos, octopia_df) ; stats (dict) reçoit les compteurs de extract_products
+        plus cached_eans, fetched_eans, fetched_products, changed_products.
+    Raises:
+        IncompleteExtractionError si une extraction reste partielle (rien n'est enregistré)
+    """
+    unique_eans = list(dict.fromkeys(str(ean).strip() for ean in eans if str(ean).strip()))
+    scope = snapshot_scope(client, catalog_id)
+    fields_key = _fields_key(column_ids)
+    by_ean = store.lookup(scope, catalog_id, unique_eans, fields_key, max_age)
+    stale_eans = [ean for ean in unique_eans if ean not in by_ean]
+
+    fetch_stats = {}
+    fetched = []
+    changed = 0
+    if stale_eans:
+        product_infos = extract_products(client, catalog_id, stale_eans, stats=fetch_stats)
+        product_ids = [str(info.get("productId", "")).strip() for info in product_infos]
+        octopia_df = extract_octopia_product_fields(client, store_id, column_ids, product_ids)
+        octopia_df["Product Id"] = octopia_df["Product Id"].astype(str).str.strip()
+        fields_by_id = {
+            record.pop("Product Id"): record
+            for record in octopia_df.drop_duplicates("Product Id").to_dict("records")
+        }
+        fetched = [(product_id, info, fields_by_id.get(product_id)) for product_id, info in zip(product_ids, product_infos)]
+        catalog_eans = {
+            product_id: str(fields.get("EAN") or "").strip() for product_id, _, fields in fetched if fields
+        }
+        entries = {product_id: (product_id, info, fields) for product_id, info, fields in fetched}
+        rows = []
+        for ean, ids in _attribute_products(client, catalog_id, stale_eans, product_infos, catalog_eans).items():
+            by_ean[ean] = [entries[product_id] for product_id in ids]
+            rows += [(product_id, ean, entries[product_id][1], entries[product_id][2]) for product_id in ids]
+        changed = store.save(scope, catalog_id, rows, fields_key, eans=stale_eans)
+
+    if len(stale_eans) == len(unique_eans):
+        # Tout vient de l'API : ordre de extract_products
+        ordered = fetched
+    else:
+        # Produits dans l'ordre des EANs saisis, puis ceux qu'aucun EAN n'a pu revendiquer
+        seen = set()
+        ordered = []
+        for entry in [entry for ean in unique_eans for entry in by_ean.get(ean, [])] + fetched:
+            if entry[0] not in seen:
+                seen.add(entry[0])
+                ordered.append(entry)
+
+    product_infos = [info for _, info, _ in ordered]
+    with_fields = [(product_id, fields) for product_id, _, fields in ordered if fields is not None]
+    octopia_df = pd.DataFrame({
+        "Product Id": [product_id for product_id, _ in with_fields],
+        **{name: [fields.get(name, "") for _, fields in with_fields] for name in column_ids}
+    })
+
+    if stats is not None:
+        stats.update({
+            "eans": len(eans),
+            "unique_eans": len(unique_eans),
+            "chunk_size": fetch_stats.get("chunk_size", 0),
+            "chunks": fetch_stats.get("chunks", 0),
+            "pages": fetch_stats.get("pages", 0),
+            "products": len(product_infos),
+            "cached_eans": len(unique_eans) - len(stale_eans),
+            "fetched_eans": len(stale_eans),
+            "fetched_products": len(fetched),
+            "changed_products": changed
+        })
+    return product_infos, octopia_df
@@ -0,0 +1,89 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+
+# Listes de valeurs récupérées simultanément (le rate limiter du client reste prioritaire)
+VALUE_LIST_WORKERS = 8
+
+def format_value_list(response):
+    """
+    Formate la réponse /attributes/{id}/mapping en liste de "code | label".
+    """
+    values = response.get("channelAttributeValuesWithMapping", [])
+    return [
+        f"{v.get('code')} | {v.get('label')}"
+        for v in values
+        if v.get("label") and v.get("code")
+    ]
+
+def plan_value_lists(selected_attributes_df) -> dict:
+    """
+    Regroupe les attributs de type liste par code de liste : {code: Channel Attribute Id}.
+    Une seule liste est récupérée par code, via le dernier attribut qui le porte.
+    """
+    df_list_attributes = selected_attributes_df[selected_attributes_df["Attribute Value List Code"].notnull()]
+    attribute_mapping = dict(zip(
+        df_list_attributes["Channel Attribute Id"],
+        df_list_attributes["Attribute Value List Code"]
+    ))
+    plan = {}
+    for attribute_id, value_list_code in attribute_mapping.items():
+        plan[value_list_code] = attribute_id
+    return plan
+
+def _value_list_route(catalog_id, value_list_code):
+    """Route synthétique sous laquelle la liste formatée est mise en cache."""
+    return f"/valueLists/{catalog_id}/{value_list_code}"
+
+def _cached_value_list(client, catalog_id, value_list_code):
+    """Liste formatée encore valide dans le cache disque du client, sinon None."""
+    if client.cache is None or client.refresh_cache:
+        return None
+    entry = client.cache.lookup(client.cache_key(_value_list_route(catalog_id, value_list_code)))
+    return entry["body"] if entry and entry["fresh"] else None
+
+def _store_value_list(client, catalog_id, value_list_code, values):
+    if client.cache is not None:
+        route = _value_list_route(catalog_id, value_list_code)
+        client.cache.store(client.cache_key(route), route, values, client.cache_ttls["value_list"])
+
+def _split_cached(client, catalog_id, plan):
+    """Sépare les listes déjà en cache de celles à récupérer."""
+    value_lists, missing = {}, []
+    for value_list_code in plan:
+        values = _cached_value_list(client, catalog_id, value_list_code)
+        if values is None:
+            missing.append(value_list_code)
+        else:
+            value_lists[value_list_code] = values
+    return value_lists, missing
+
+def _fetch_value_list(client, catalog_id, attribute_id):
+    response = client.get_attribute_value_list(catalog_id, attribute_id)
+    return format_value_list(response) if response else None
+
+def _merge_fetched(client, catalog_id, plan, value_lists, missing, results):
+    """Met en cache les listes récupérées et renvoie toutes les listes dans l'ordre du plan."""
+    for value_list_code, values in zip(missing, results):
+        if values is None:
+            continue
+        _store_value_list(client, catalog_id, value_list_code, values)
+        value_lists[value_list_code] = values
+    return {code: value_lists[code] for code in plan if code in value_lists}
+
+def fetch_value_lists(client, catalog_id, plan, max_workers=VALUE_LIST_WORKERS) -> dict:
+    """
+    Récupère les listes de valeurs du plan ({code: [valeurs "code | label"]}) : cache disque
+    d'abord (partagé entre exécutions et sessions pour ce catalogue), puis une requête par code
+    manquant, en parallèle. Les codes sans réponse exploitable sont absents du résultat.
+    """
+    value_lists, missing = _split_cached(client, catalog_id, plan)
+    if not missing:
+        return _merge_fetched(client, catalog_id, plan, value_lists, [], [])
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(missing))) as executor:
+        results = list(executor.map(lambda code: _fetch_value_list(client, catalog_id, plan[code]), missing))
+    return _merge_fetched(client, catalog_id, plan, value_lists, missing, results)
+
+def value_lists_dataframe(value_lists: dict) -> pd.DataFrame:
+    """Chaque colonne = une liste de valeurs, lignes = valeur ou None."""
+    return pd.DataFrame({k: pd.Series(v) for k, v in value_lists.items()})
@@ -0,0 +1,234 @@
+"""
+API BeezUP simulée pour les benchmarks : catalogue synthétique servi en local
+(N produits, M attributs, K listes de valeurs), pagination comme l'API réelle
+(pageSize plafonné à max_page_size, pageCount / totalNumberOfEntries), latence configurable
+et compteurs de requêtes par endpoint.
+
+    server = MockBeezUP(n_products=10_000, n_attributes=300, n_value_lists=40, latency=0.05)
+    server.start()
+    client.BASE_URL = server.base_url
+    ...
+    server.stop()
+"""
+import json
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+STORE_ID = "store-bench"
+CHANNEL_ID = "channel-bench"
+FIRST_EAN = 3600000000000
+
+class SyntheticCatalog:
+    """
+    Catalogue déterministe : le produit i a l'EAN FIRST_EAN + i et une catégorie parmi n_categories.
+    Comme sur un vrai catalogue, les overrides et mappings se concentrent sur quelques attributs
+    (override_pool / mapping_pool premiers attributs), et chaque catégorie n'expose qu'une partie
+    des M attributs (les 10 premiers en Cross Categories, attributes_per_category propres).
+    """
+
+    def __init__(self, n_products, n_attributes=300, n_value_lists=40, values_per_list=500,
+                 n_categories=50, attributes_per_category=40, overrides_per_product=5, override_pool=30,
+                 mappings_per_product=20, mapping_pool=60):
+        self.n_products = n_products
+        self.n_attributes = n_attributes
+        self.n_value_lists = n_value_lists
+        self.values_per_list = values_per_list
+        self.n_categories = n_categories
+        self.attributes_per_category = attributes_per_category
+        self.overrides_per_product = overrides_per_product
+        self.override_pool = max(1, min(override_pool, n_attributes))
+        self.mappings_per_product = mappings_per_product
+        self.mapping_pool = max(1, min(mapping_pool, n_attributes))
+        self.written_overrides = {}
+
+    def eans(self, count=None):
+        return [str(FIRST_EAN + i) for i in range(count or self.n_products)]
+
+    def index_of_ean(self, ean):
+        try:
+            i = int(ean) - FIRST_EAN
+        except ValueError:
+            return None
+        return i if 0 <= i < self.n_products else None
+
+    @staticmethod
+    def attribute_id(a):
+        return f"attr-{a:05d}"
+
+    def product_info(self, i):
+        product_id = f"prod-{i:08d}"
+        overrides = self.written_overrides.get(product_id)
+        if overrides is None:
+            overrides = {
+                self.attribute_id((i + k) % self.override_pool): f"valeur {i % 13}"
+                for k in range(self.overrides_per_product)
+            }
+        return {
+            "productId": product_id,
+            "productSku": f"SKU-{i}",
+            "productTitle": f"Produit {i}",
+            "overrides": {attr_id: {"override": value} for attr_id, value in overrides.items()},
+            "attributeMappingValue": {
+                self.attribute_id((i * 7 + k) % self.mapping_pool): {
+                    "attributeMappingValue": f"m{k}", "catalogValue": f"catalogue {k}"
+                }
+                for k in range(self.mappings_per_product)
+            }
+        }
+
+    def catalog_values(self, product_id):
+        i = int(product_id.split("-")[1])
+        return {
+            "col-categ3Code": f"CAT{i % self.n_categories:03d}",
+            "col-ean": str(FIRST_EAN + i),
+            "col-description": f"Description du produit {i}",
+            "col-imageUrl1": f"https://images.example/{i}.jpg"
+        }
+
+    def category_configurations(self):
+        return [
+            {"catalogCategoryPath": [f"CAT{c:03d}"], "channelCategoryPath": ["Racine", f"Catégorie {c}"]}
+            for c in range(self.n_categories)
+        ]
+
+    def channel_attributes(self):
+        statuses = ["Required", "Recommended", "Optional"]
+        attributes = [
+            {
+                "channelAttributeId": self.attribute_id(a),
+                "attributeName": f"Attribut {a}",
+                "attributeDescription": f"Description de l'attribut {a}",
+                "status": statuses[a % 3],
+                "typeValue": "List" if a % 2 == 0 else "Text",
+                "attributeValueListCode": f"LIST-{a % self.n_value_lists:03d}" if a % 2 == 0 and self.n_value_lists else None
+            }
+            for a in range(self.n_attributes)
+        ]
+        categories = [{"channelFullCategoryPath": "Cross Categories", "attributes": attributes[:10]}]
+        specific = attributes[10:]
+        for c in range(self.n_categories):
+            window = [specific[(c * 13 + j) % len(specific)] for j in range(min(self.attributes_per_category, len(specific)))]
+            categories.append({"channelFullCategoryPath": f"Racine > Catégorie {c}", "attributes": window})
+        return categories
+
+    def value_list(self, attribute_id):
+        a = int(attribute_id.split("-")[1])
+        code = a % max(self.n_value_lists, 1)
+        return {"channelAttributeValuesWithMapping": [
+            {"code": f"L{code}-{v}", "label": f"Valeur {v} de la liste {code}"} for v in range(self.values_per_list)
+        ]}
+
+def _page(items, body, max_page_size):
+    size = min(body.get("pageSize", max_page_size), max_page_size)
+    page = body.get("pageNumber", 1)
+    page_count = max(1, -(-len(items) // size))
+    return items[(page - 1) * size: page * size], {"pageCount": page_count, "pageNumber": page, "totalNumberOfEntries": len(items)}
+
+def _make_handler(server):
+    catalog = server.catalog
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, *args):
+            pass
+
+        def _reply(self, endpoint, status, body=None):
+            server.record(endpoint)
+            if server.latency:
+                time.sleep(server.latency)
+            data = b"" if body is None else json.dumps(body).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def _body(self):
+            length = int(self.headers.get("Content-Length") or 0)
+            return json.loads(self.rfile.read(length) or b"{}")
+
+        def do_GET(self):
+            path = self.path.split("?")[0]
+            if re.fullmatch(r"/v2/user/channelCatalogs/[^/]+", path):
+                return self._reply("channelCatalog", 200, {"storeId": STORE_ID, "channelId": CHANNEL_ID})
+            if re.fullmatch(r"/v2/user/catalogs/[^/]+/catalogColumns", path):
+                names = ["categ3Code", "ean", "description", "imageUrl1"]
+                return self._reply("catalogColumns", 200, {
+                    "catalogColumns": [{"catalogColumnName": name, "id": f"col-{name}"} for name in names]
+                })
+            if re.fullmatch(r"/v2/user/channelCatalogs/[^/]+/categories", path):
+                return self._reply("categories", 200, {
+                    "channelCatalogCategoryConfigurations": catalog.category_configurations()
+                })
+            if re.fullmatch(r"/v2/user/channelCatalogs/[^/]+/attributes", path):
+                return self._reply("attributes", 200, catalog.channel_attributes())
+            if m := re.fullmatch(r"/v2/user/channelCatalogs/[^/]+/attributes/([^/]+)/mapping", path):
+                return self._reply("valueList", 200, catalog.value_list(m.group(1)))
+            if re.fullmatch(r"/v2/user/catalogs/[^/]+/customColumns", path):
+                return self._reply("customColumns", 200, {"customColumns": []})
+            self._reply("notFound", 404, {"error": path})
+
+        def do_POST(self):
+            path = self.path.split("?")[0]
+            body = self._body()
+            if re.fullmatch(r"/v2/user/channelCatalogs/[^/]+/products", path):
+                indexes = [catalog.index_of_ean(ean) for ean in body.get("productFilters", {}).get("channelEans", [])]
+                items, pagination = _page([i for i in indexes if i is not None], body, server.max_page_size)
+                return self._reply("products", 200, {
+                    "productInfos": [catalog.product_info(i) for i in items], "paginationResult": pagination
+                })
+            if re.fullmatch(r"/v2/user/catalogs/[^/]+/products/list", path):
+                items, pagination = _page(body.get("productIdList", []), body, server.max_page_size)
+                return self._reply("productsList", 200, {
+                    "products": [{"productId": pid, "values": catalog.catalog_values(pid)} for pid in items],
+                    "paginationResult": pagination
+                })
+            self._reply("notFound", 404, {"error": path})
+
+        def do_PUT(self):
+            path = self.path.split("?")[0]
+            body = self._body()
+            if m := re.fullmatch(r"/v2/user/channelCatalogs/[^/]+/products/([^/]+)/overrides", path):
+                catalog.written_overrides[m.group(1)] = dict(body)
+                return self._reply("putOverrides", 204)
+            self._reply("notFound", 404, {"error": path})
+
+    return Handler
+
+class MockBeezUP:
+    """Serveur HTTP local (thread dédié) servant un SyntheticCatalog."""
+
+    def __init__(self, latency=0.0, max_page_size=1000, port=0, **catalog_options):
+        self.catalog = SyntheticCatalog(**catalog_options)
+        self.latency = latency
+        self.max_page_size = max_page_size
+        self.requests = {}
+        self._lock = threading.Lock()
+        self._httpd = ThreadingHTTPServer(("127.0.0.1", port), _make_handler(self))
+        self._httpd.daemon_threads = True
+        self._thread = None
+
+    @property
+    def base_url(self):
+        return f"http://127.0.0.1:{self._httpd.server_address[1]}/v2"
+
+    def record(self, endpoint):
+        with self._lock:
+            self.requests[endpoint] = self.requests.get(endpoint, 0) + 1
+
+    def reset_counts(self):
+        with self._lock:
+            counts, self.requests = self.requests, {}
+        return counts
+
+    def start(self):
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
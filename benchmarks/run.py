@@ -0,0 +1,177 @@
+"""
+Benchmarks du pipeline de génération contre l'API BeezUP simulée (benchmarks/mock_api.py).
+
+Pour chaque taille (nombre d'EANs), mesure par étape : durée, requêtes émises
+(vues par le serveur simulé et par le client) et pic mémoire Python (tracemalloc).
+
+    python -m benchmarks.run
+    python -m benchmarks.run --sizes 1000 --latency 0.05 --json bench.json
+
+Le client est créé sans cache disque : chaque taille part de zéro, comme un premier run.
+tracemalloc ralentit l'exécution ; --no-memory le désactive pour ne mesurer que les durées.
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from benchmarks.mock_api import MockBeezUP
+from beezup.builder import build_and_export_excel
+from beezup.client import BeezUPClient
+from beezup.extractor import (
+    extract_channel_attributes, extract_octopia_product_fields, extract_products, get_store_and_channel_ids
+)
+from beezup.formatter import build_datainfo_dataframe, build_dropdown_dataframe, clean_attribute_df
+from beezup.frames import build_product_frame
+from beezup.pipeline import (
+    attach_channel_paths, build_template_frame, catalog_column_ids, dedupe_template_columns,
+    merge_octopia_fields, select_attributes
+)
+
+DEFAULT_SIZES = (1_000, 10_000, 50_000)
+CATALOG_ID = "catalog-bench"
+
+class StageRecorder:
+    """Mesure une suite d'étapes : durée, requêtes (serveur et client) et pic mémoire."""
+
+    def __init__(self, server, client, trace_memory=True):
+        self.server = server
+        self.client = client
+        self.trace_memory = trace_memory
+        self.rows = []
+
+    def run(self, stage, func, *args, **kwargs):
+        self.server.reset_counts()
+        calls_before = dict(self.client.call_counts)
+        if self.trace_memory:
+            tracemalloc.start()
+        start = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            seconds = time.perf_counter() - start
+            peak = None
+            if self.trace_memory:
+                peak = tracemalloc.get_traced_memory()[1]
+                tracemalloc.stop()
+            requests = self.server.reset_counts()
+            calls = {
+                name: count - calls_before.get(name, 0)
+                for name, count in self.client.call_counts.items()
+                if count != calls_before.get(name, 0)
+            }
+            self.rows.append({
+                "stage": stage,
+                "seconds": round(seconds, 3),
+                "requests": sum(requests.values()),
+                "requests_by_endpoint": requests,
+                "client_calls": calls,
+                "peak_mb": round(peak / 1024 / 1024, 1) if peak is not None else None
+            })
+
+def run_size(n_eans, args, output_dir):
+    """Exécute le pipeline de génération sur n_eans produits ; renvoie les mesures par étape."""
+    server = MockBeezUP(
+        n_products=n_eans, n_attributes=args.attributes, n_value_lists=args.value_lists,
+        values_per_list=args.values_per_list, n_categories=args.categories,
+        latency=args.latency, max_page_size=args.max_page_size
+    ).start()
+    client = BeezUPClient("bench", rate_limit=args.rate_limit)
+    client.BASE_URL = server.base_url
+    recorder = StageRecorder(server, client, trace_memory=not args.no_memory)
+    eans = server.catalog.eans(n_eans)
+    try:
+        with client:
+            store_id, _channel_id = get_store_and_channel_ids(client, CATALOG_ID)
+
+            product_infos = recorder.run("extract_products", extract_products, client, CATALOG_ID, eans)
+            product_df, override_columns, attr_mapping_columns = recorder.run(
+                "build_product_frame", build_product_frame, product_infos, CATALOG_ID
+            )
+            del product_infos
+
+            column_ids = catalog_column_ids(client, store_id)
+            octopia_df = recorder.run(
+                "extract_octopia_product_fields", extract_octopia_product_fields,
+                client, store_id, column_ids, product_df["Product Id"].tolist()
+            )
+            merged_df = merge_octopia_fields(product_df, octopia_df, override_columns, attr_mapping_columns)
+
+            def prepare_attributes():
+                df = attach_channel_paths(client, CATALOG_ID, merged_df)
+                paths = df["Channel Full Category Path"].unique().tolist()
+                return df, clean_attribute_df(extract_channel_attributes(client, CATALOG_ID, paths))
+
+            paths_df, attribute_df = recorder.run("channel_paths_and_attributes", prepare_attributes)
+            selected_df = select_attributes(attribute_df, statuses=args.statuses)
+
+            def build_template():
+                template_df, selected, _duplicates = build_template_frame(
+                    paths_df, selected_df, override_columns, attr_mapping_columns
+                )
+                return dedupe_template_columns(template_df)[0], selected
+
+            template_df, selected = recorder.run("build_template_frame", build_template)
+            dropdown_df = recorder.run("build_dropdown_dataframe", build_dropdown_dataframe, client, CATALOG_ID, selected)
+            datainfo_df = build_datainfo_dataframe(selected)
+
+            output_file = os.path.join(output_dir, f"bench_{n_eans}.xlsx")
+            recorder.run("build_and_export_excel", build_and_export_excel, template_df, datainfo_df, dropdown_df,
+                         output_file=output_file)
+            shape = (len(template_df), len(template_df.columns))
+            os.remove(output_file)
+    finally:
+        server.stop()
+    return {"eans": n_eans, "template_shape": shape, "stages": recorder.rows}
+
+def print_result(result, out=sys.stdout):
+    rows, cols = result["template_shape"]
+    print(f"\n== {result['eans']} EANs (template {rows} x {cols}) ==", file=out)
+    print(f"{'étape':<32}{'durée (s)':>11}{'requêtes':>10}{'pic (Mo)':>10}", file=out)
+    for row in result["stages"]:
+        peak = f"{row['peak_mb']:.1f}" if row["peak_mb"] is not None else "-"
+        print(f"{row['stage']:<32}{row['seconds']:>11.2f}{row['requests']:>10}{peak:>10}", file=out)
+    total = sum(row["seconds"] for row in result["stages"])
+    requests = sum(row["requests"] for row in result["stages"])
+    print(f"{'total':<32}{total:>11.2f}{requests:>10}", file=out)
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.run",
+                                     description="Benchmarks du pipeline contre l'API BeezUP simulée")
+    parser.add_argument("--sizes", default=",".join(str(s) for s in DEFAULT_SIZES),
+                        help="Nombres d'EANs, séparés par des virgules (défaut : 1000,10000,50000)")
+    parser.add_argument("--attributes", type=int, default=120, help="Nombre d'attributs du canal (M)")
+    parser.add_argument("--value-lists", type=int, default=20, help="Nombre de listes de valeurs distinctes (K)")
+    parser.add_argument("--values-per-list", type=int, default=300, help="Nombre de valeurs par liste")
+    parser.add_argument("--categories", type=int, default=50, help="Nombre de catégories")
+    parser.add_argument("--statuses", default="Required,Recommended",
+                        help="Statuts d'attributs sélectionnés pour le template")
+    parser.add_argument("--latency", type=float, default=0.02, help="Latence simulée par requête (s)")
+    parser.add_argument("--max-page-size", type=int, default=1000, help="Taille de page maximale servie par l'API")
+    parser.add_argument("--rate-limit", type=float, default=10.0, help="Débit du client (req/s)")
+    parser.add_argument("--no-memory", action="store_true", help="Désactive la mesure mémoire (tracemalloc)")
+    parser.add_argument("--json", help="Écrit les mesures dans ce fichier JSON")
+    return parser
+
+def main(argv=None) -> int:
+    args = build_parser().parse_args(argv)
+    args.statuses = [s.strip() for s in args.statuses.split(",") if s.strip()]
+    sizes = [int(s) for s in args.sizes.split(",") if s.strip()]
+
+    results = []
+    with tempfile.TemporaryDirectory() as output_dir:
+        for n_eans in sizes:
+            result = run_size(n_eans, args, output_dir)
+            print_result(result)
+            results.append(result)
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"parameters": vars(args), "results": results}, f, ensure_ascii=False, indent=2)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,14 +1,99 @@
 import streamlit as st
+import hashlib
 import tempfile
-from datetime import datetime
+import time
 
+from beezup.cache import ResponseCache
+from beezup.categories import CategoryIndex
+from beezup.frames import build_product_frame
 from beezup.client import BeezUPClient
 from beezup.extractor import *
 from beezup.formatter import *
 from beezup.builder import build_and_export_excel
+from beezup.mapping import AttributeIndex, apply_column_mappings, parse_attribute_ids
+from beezup.metrics import Metrics
+from beezup.overrides import push_overrides, split_noop
+from beezup.pipeline import (
+    attach_channel_paths, build_template_frame, catalog_column_ids, dedupe_template_columns,
+    merge_octopia_fields, plan_overrides, scan_template, select_attributes, template_filename
+)
+from beezup.snapshots import SNAPSHOT_MAX_AGE, ProductSnapshotStore, extract_products_incremental, snapshot_scope
 
 st.set_page_config(page_title="Edition produits BeezUP V2", layout="wide", page_icon="🐝")
 
+# ---------- MÉMOÏSATION ENTRE RELANCES ---------- #
+# Streamlit relance le script à chaque interaction : les étapes coûteuses sont mises en cache,
+# indexées par leurs vraies entrées (hash de la clé API, catalogue, EANs...).
+# Les paramètres préfixés par "_" ne participent pas à la clé de cache.
+
+# Au-delà, le plan de diff de l'onglet 2 est recalculé sur l'état courant
+DIFF_PLAN_MAX_AGE = 900
+
+@st.cache_resource(show_spinner=False)
+def get_response_cache():
+    """Cache disque des métadonnées catalogue, partagé entre sessions et relances."""
+    return ResponseCache(".cache/beezup_responses.sqlite")
+
+@st.cache_resource(show_spinner=False)
+def get_client(_api_key, api_key_hash):
+    """Client BeezUP partagé (même pool de connexions et même rate limiter) pour une clé API."""
+    return BeezUPClient(_api_key, cache=get_response_cache())
+
+def session_metrics():
+    """Mesures de la session : les autres sessions sur la même clé API ont les leurs."""
+    if "metrics" not in st.session_state:
+        st.session_state["metrics"] = Metrics()
+    return st.session_state["metrics"]
+
+def make_client():
+    """
+    Client BeezUP de la session, branché sur le cache disque des métadonnées : vue du client
+    partagé de la clé API, avec l'option "recharger les métadonnées" et les mesures de la session.
+    """
+    return get_client(api_key, api_key_hash).view(
+        refresh_cache=st.session_state.get("refresh_cache", False), metrics=session_metrics()
+    )
+
+@st.cache_data(ttl=3600, max_entries=1000, show_spinner=False)
+def _cached_store_and_channel_ids(api_key_hash, catalog_id, refresh_token, _client):
+    store_id, channel_id = get_store_and_channel_ids(_client, catalog_id)
+    if store_id is None:
+        # Exception : un échec n'est pas mis en cache
+        raise LookupError(catalog_id)
+    return store_id, channel_id
+
+def resolve_store_and_channel_ids(client, catalog_id):
+    """
+    store_id et channel_id du catalogue, mémorisés ; (None, None) en cas d'échec.
+    "Recharger" change le jeton de la session : seule cette session relit l'API,
+    les entrées mémorisées des autres sessions et clés API restent en place.
+    """
+    if st.session_state.get("refresh_cache", False):
+        st.session_state["ids_refresh_token"] = st.session_state.get("ids_refresh_token", 0) + 1
+    try:
+        return _cached_store_and_channel_ids(
+            api_key_hash, catalog_id, st.session_state.get("ids_refresh_token", 0), client
+        )
+    except LookupError:
+        return None, None
+
+@st.cache_resource(show_spinner=False)
+def get_snapshot_store():
+    """
+    Produits déjà extraits (productInfos et champs catalogue), partagés entre sessions et relances :
+    une relance ne redemande à l'API que les EANs nouveaux ou extraits il y a plus de SNAPSHOT_MAX_AGE.
+    """
+    return ProductSnapshotStore(".cache/beezup_snapshots.sqlite")
+
+@st.cache_data(show_spinner=False)
+def cached_clean_attribute_df(attribute_df):
+    """clean_attribute_df mémorisé par contenu du DataFrame d'attributs."""
+    return clean_attribute_df(attribute_df)
+
+def forget_products(client, catalog_id, product_ids):
+    """Oublie des produits mémorisés dont les overrides viennent d'être modifiés."""
+    get_snapshot_store().invalidate(snapshot_scope(client, catalog_id), catalog_id, product_ids)
+
 # ---------- SIDEBAR ---------- #
 with st.sidebar:
     st.image("décembre.png", width="content", caption="Joyeuses fêtes")
@@ -16,6 +101,11 @@ with st.sidebar:
     api_key = st.text_input("*Clé API BeezUP*", type="password", key="api_key")
     store_name = st.text_input("*Nom de la boutique*", key="store_name")
     catalog_id = st.text_input("*Channel Catalog ID*", key="catalog_id")
+    st.checkbox(
+        "Recharger les métadonnées depuis l'API",
+        key="refresh_cache",
+        help="Ignore le cache local (colonnes, catégories, attributs, listes de valeurs, produits déjà extraits) et le met à jour."
+    )
 
     if st.button("\u21bb Réinitialiser l'application", key="reset_app"):
         api_key_val = st.session_state.get("api_key", "")
@@ -39,6 +129,12 @@ with st.sidebar:
     
         st.rerun()
 
+    # Panneau d'instrumentation, rempli après l'exécution des onglets (voir render_metrics_panel)
+    metrics_panel = st.container()
+
+# Hash de la clé API : clé des caches, jamais la clé elle-même
+api_key_hash = ResponseCache.hash_api_key(api_key) if api_key else ""
+
 # ---------- ONGLETS ---------- #
 tab1, tab2, tab3 = st.tabs(["Générer un template", "Éditer les produits", "Mapper les attributs"])
 
@@ -79,115 +175,50 @@ with tab1:
                 with st.spinner("Génération des listes d'attributs en cours..."):
 
                     # Création du BeezUPClient et extraction des IDs
-                    client = BeezUPClient(api_key)
-                    store_id, channel_id = get_store_and_channel_ids(client, catalog_id)
+                    client = make_client()
+                    metrics = client.metrics
+                    with metrics.span("store_and_channel_ids"):
+                        store_id, channel_id = resolve_store_and_channel_ids(client, catalog_id)
                     st.session_state["client"] = client
                     st.session_state["store_id"] = store_id
                     st.session_state["channel_id"] = channel_id
 
-                    # Extraction et création du dataframe product_df
-                    product_infos = extract_products(client, catalog_id, eans)
-                    all_override_keys, all_attr_mapping_keys = set(), set()
-
-                    for prod in product_infos:
-                        all_override_keys.update(prod.get("overrides", {}).keys())
-                        all_attr_mapping_keys.update(prod.get("attributeMappingValue", {}).keys())
-
-                    override_columns = sorted(list(all_override_keys))
-                    attr_mapping_columns = sorted(list(all_attr_mapping_keys))
-                    rows = []
-
-                    for prod in product_infos:
-                        row = {
-                            "Product Id": prod.get("productId"),
-                            "Offer Code": prod.get("productSku"),
-                            "Name": prod.get("productTitle"),
-                            "Catalog Id": catalog_id
-                        }
-
-                        for col in override_columns:
-                            value = prod.get("overrides", {}).get(col, {})
-                            row[col] = value.get("override") if isinstance(value, dict) else ""
-
-                        for col in attr_mapping_columns:
-                            value = prod.get("attributeMappingValue", {}).get(col, {})
-                            row[col] = f"{value.get('attributeMappingValue')} | {value.get('catalogValue')}" if isinstance(value, dict) else ""
-
-                        rows.append(row)
-
-                    product_df = pd.DataFrame(rows)
-
-                    # Extraction des column_ids des attributs côté catalogue
-                    catalog_columns = client.get_catalog_columns(store_id).get("catalogColumns", [])
-                    categ3_column_id = get_catalog_column_id(catalog_columns, "categ3Code")
-                    ean_column_id = get_catalog_column_id(catalog_columns, "ean")
-                    description_column_id = get_catalog_column_id(catalog_columns, "description")
-
-                    column_ids = {
-                        "Category Code": categ3_column_id,
-                        "EAN": ean_column_id,
-                        "Description": description_column_id
-                    }
-
-                    # Ajout pour extraction des images
-                    # Images 1..6 (on n’ajoute que celles réellement trouvées)
-                    for i in range(1, 7):
-                        img_id = get_catalog_column_id(catalog_columns, f"imageUrl{i}")
-                        if img_id:  # si la colonne image{i} existe dans ce catalogue
-                            column_ids[f"Image {i}"] = img_id
-
-                    # Extraction et création du dataframe octopia_df
-                    product_ids = product_df["Product Id"].tolist()
-                    octopia_df = extract_octopia_product_fields(client, store_id, column_ids, product_ids)
-
-                    # Fusion des dataframes product_df et octopia_df sur la colonne "Product Id"
-                    product_df["Product Id"] = product_df["Product Id"].astype(str).str.strip()
-                    octopia_df["Product Id"] = octopia_df["Product Id"].astype(str).str.strip()
-
-                    # Ajout pour extraction des images
-                    # Colonnes fixes demandées depuis column_ids (en conservant l’ordre “Category/EAN/Description” devant)
-                    base_fixed = ["Category Code", "EAN", "Description"]
-                    image_fixed = [f"Image {i}" for i in range(1, 7) if f"Image {i}" in octopia_df.columns]
-                    octo_cols = ["Product Id"] + base_fixed + image_fixed
-
-                    merged_df = pd.merge(
-                        product_df,
-                        octopia_df[octo_cols],
-                        # octopia_df[["Product Id", "Category Code", "EAN", "Description"]],
-                        on="Product Id",
-                        how="left"
-                    )
-
-                    # Réorganisation : colonnes fixes + overrides + mappings
-                    cols_order = (
-                            ["Category Code", "Product Id", "Offer Code", "EAN", "Name", "Description", "Catalog Id"] +
-                            image_fixed +  # on insère ici les images fixes trouvées
-                            override_columns +
-                            attr_mapping_columns
-                    )
-
-                    # # Réorganisation des colonnes
-                    # cols_order = [
-                    #     "Category Code", "Product Id", "Offer Code", "EAN", "Name", "Description", "Catalog Id"
-                    # ] + override_columns + attr_mapping_columns
-
-                    merged_df = merged_df[[col for col in cols_order if col in merged_df.columns]]
-
-                    # Extraction du mapping catégories Octopia <-> canal de vente
-                    mapping_df = extract_octopia_channel_mapping(client, catalog_id, merged_df["Category Code"].unique())
-
-                    # Remplacement de la colonne "Category Code" par "Channel Full Category Path"
-                    merged_df = merged_df.merge(mapping_df, on="Category Code", how="left")
-                    merged_df.drop(columns=["Category Code"], inplace=True)
-                    merged_df.rename(columns={"Category Code": "Channel Full Category Path"}, inplace=True)
-
-                    cols = merged_df.columns.tolist()
-                    cols.insert(0, cols.pop(cols.index("Channel Full Category Path")))
-                    merged_df = merged_df[cols]
-
-                    # Extraction et création du dataframe attribute_df
-                    channel_paths = merged_df["Channel Full Category Path"].unique().tolist()
-                    attribute_df = extract_channel_attributes(client, catalog_id, channel_paths)
+                    # Extraction des produits et de leurs champs catalogue (catégorie, EAN, description, images) :
+                    # seuls les EANs nouveaux ou trop anciens sont demandés, le reste vient des produits mémorisés
+                    with metrics.span("extract_products_and_fields"):
+                        column_ids = catalog_column_ids(client, store_id)
+                        extraction_stats = {}
+                        max_age = 0 if st.session_state.get("refresh_cache", False) else SNAPSHOT_MAX_AGE
+                        try:
+                            product_infos, octopia_df = extract_products_incremental(
+                                client, get_snapshot_store(), catalog_id, store_id, column_ids, eans,
+                                max_age=max_age, stats=extraction_stats
+                            )
+                        except IncompleteExtractionError as e:
+                            st.error(f"❌ {e} Relance la validation des EANs.")
+                            st.stop()
+                        product_df, override_columns, attr_mapping_columns = build_product_frame(product_infos, catalog_id)
+
+                        # Fusion product_df / octopia_df et réorganisation : colonnes fixes + overrides + mappings
+                        merged_df = merge_octopia_fields(product_df, octopia_df, override_columns, attr_mapping_columns)
+                        metrics.record_frame("product_df", product_df)
+                        metrics.record_frame("octopia_df", octopia_df)
+                        metrics.record_frame("merged_df", merged_df)
+
+                    # Remplacement de "Category Code" par "Channel Full Category Path"
+                    # (index catégories construit une fois par catalogue et conservé pour les relances)
+                    with metrics.span("channel_paths_and_attributes"):
+                        category_indexes = st.session_state.setdefault("category_indexes", {})
+                        if catalog_id not in category_indexes or st.session_state.get("refresh_cache", False):
+                            category_index = CategoryIndex.fetch(client, catalog_id)
+                            if category_index is not None:
+                                category_indexes[catalog_id] = category_index
+                        merged_df = attach_channel_paths(client, catalog_id, merged_df, index=category_indexes.get(catalog_id))
+
+                        # Extraction et création du dataframe attribute_df
+                        channel_paths = merged_df["Channel Full Category Path"].unique().tolist()
+                        attribute_df = extract_channel_attributes(client, catalog_id, channel_paths)
+                        metrics.record_frame("attribute_df", attribute_df)
 
                     # Mise à jour des session_state
                     st.session_state["product_df"] = product_df
@@ -195,90 +226,27 @@ with tab1:
                     st.session_state["attribute_df"] = attribute_df
                     st.session_state["override_columns"] = override_columns
                     st.session_state["attr_mapping_columns"] = attr_mapping_columns
+                    st.session_state["extraction_stats"] = extraction_stats
                     st.session_state["eans_validated"] = True
                     clear_after("eans_validated")
             else:
                 st.error("Merci de renseigner la clé API, le Channel Catalog ID et au moins un EAN.")
                 st.session_state["eans_validated"] = False
 
-    # --- Étape 2 : Sélection attributs
-    if st.session_state.get("eans_validated", False) and "attribute_df" in st.session_state:
-        # 1) Base d'attributs + normalisation
-        attribute_df = st.session_state["attribute_df"].copy()
-        attribute_df["Status"] = attribute_df["Status"].fillna("").str.strip().str.capitalize()
-        attribute_df["Channel Full Category Path"] = attribute_df["Channel Full Category Path"].fillna("")
-
-        # # 👉 Filtre pour exclure les attributs dont le nom contient "[REMOVED BY MKP]"
-        # attribute_df = attribute_df[~attribute_df["Attribute Name"].str.contains(r"\[REMOVED BY MKP\]", case=False, na=False)]
-    
-        # # 2) Priorisation "catégorie spécifique" > "Cross Categories"
-        # #    + à statut égal, on garde le plus restrictif: Required < Recommended < Optional
-        # status_rank = {"Required": 0, "Recommended": 1, "Optional": 2, "": 3}
-        # attribute_df["__is_cross"] = (attribute_df["Channel Full Category Path"] == "Cross Categories").astype(int)
-        # attribute_df["__status_rank"] = attribute_df["Status"].map(status_rank).fillna(3).astype(int)
-
-        # attribute_df = (
-        #     attribute_df
-        #     .sort_values(["Channel Attribute Id", "__is_cross", "__status_rank"], ascending=[True, True, True])
-        #     .drop_duplicates(subset=["Channel Attribute Id"], keep="first")
-        #     .reset_index(drop=True)
-        # )
-
-        # --- Nettoyage des attributs inutiles et doublons ---
-        
-        # 1️⃣ Supprimer les attributs dépréciés marqués [REMOVED BY MKP]
-        attribute_df = attribute_df[
-            ~attribute_df["Attribute Name"].str.contains(r"\[REMOVED BY MKP\]", case=False, na=False)
-        ].copy()
-
-
-        # 2️⃣ Identifier et résoudre les doublons sur la paire (Attribute Name, Channel Attribute Id)
-        if {"Attribute Name", "Channel Attribute Id"}.issubset(attribute_df.columns):
-            # -- Normalisation préventive du statut (au cas où ce ne serait pas déjà fait)
-            attribute_df["Status"] = attribute_df["Status"].fillna("").astype(str).str.strip().str.capitalize()
-        
-            # Priorité des statuts (plus petit = plus restrictif)
-            status_rank = {"Required": 0, "Recommended": 1, "Optional": 2, "": 3}
-            attribute_df["__status_rank"] = attribute_df["Status"].map(status_rank).fillna(3).astype(int)
-        
-            # Flag : 0 = spécifique (préféré), 1 = Cross Categories (moins prioritaire)
-            attribute_df["__is_cross"] = attribute_df["Channel Full Category Path"].fillna("").eq("Cross Categories").astype(int)
-        
-            # Tri : on veut la combinaison la plus restrictive ET spécifique en tête pour CHAQUE paire
-            attribute_df = (
-                attribute_df
-                .sort_values(
-                    by=["Attribute Name", "Channel Attribute Id", "__status_rank", "__is_cross"],
-                    ascending=[True, True, True, True]
-                )
-                .drop_duplicates(subset=["Attribute Name", "Channel Attribute Id"], keep="first")
-                .reset_index(drop=True)
+        # Statistiques de la dernière extraction
+        extraction_stats = st.session_state.get("extraction_stats")
+        if st.session_state.get("eans_validated", False) and extraction_stats:
+            st.caption(
+                f"*{extraction_stats['products']} produit(s) pour {extraction_stats['unique_eans']} EAN(s) unique(s) "
+                f"({extraction_stats['eans']} saisis) — {extraction_stats['cached_eans']} EAN(s) repris de la "
+                f"mémoire locale, {extraction_stats['fetched_eans']} extrait(s) en {extraction_stats['chunks']} lot(s), "
+                f"{extraction_stats['pages']} page(s)*"
             )
-        
-            # Nettoyage des colonnes techniques
-            attribute_df.drop(columns=["__status_rank", "__is_cross"], inplace=True, errors="ignore")
 
-        
-        # # 2️⃣ Identifier les doublons sur le couple Attribute Name + Channel Attribute Id
-        # if {"Attribute Name", "Channel Attribute Id"}.issubset(attribute_df.columns):
-        #     # Ajout d’un flag pour prioriser les attributs spécifiques à la catégorie
-        #     attribute_df["__is_cross"] = attribute_df["Channel Full Category Path"].eq("Cross Categories").astype(int)
-        
-        #     attribute_df = (
-        #         attribute_df.sort_values(
-        #             by=["Attribute Name", "Channel Attribute Id", "__is_cross"],
-        #             ascending=[True, True, True]  # Cross Categories (1) passe après la catégorie spécifique (0)
-        #         )
-        #         # Supprime les doublons, garde la version spécifique
-        #         .drop_duplicates(subset=["Attribute Name", "Channel Attribute Id"], keep="first")
-        #         .reset_index(drop=True)
-        #     )
-        
-        #     # Nettoyage du flag technique
-        #     attribute_df.drop(columns=["__is_cross"], inplace=True, errors="ignore")
-
-        # Label d'affichage
-        attribute_df["display_label"] = attribute_df["Attribute Name"] + " [" + attribute_df["Status"].fillna("") + "]"
+    # --- Étape 2 : Sélection attributs
+    if st.session_state.get("eans_validated", False) and "attribute_df" in st.session_state:
+        # Normalisation, nettoyage et dédoublonnage des attributs (mémorisé entre les relances)
+        attribute_df = cached_clean_attribute_df(st.session_state["attribute_df"])
 
         with st.container(border=True):
             st.subheader("\u2777 Choix des attributs à éditer")
@@ -327,15 +295,7 @@ with tab1:
             selected_ids = selected_ids_pills.union(selected_ids_hand)
 
             # Reconstruction de selected_df depuis le DF priorisé/dédupliqué
-            # selected_df = (
-            #     attribute_df[attribute_df["Channel Attribute Id"].isin(selected_ids)]
-            #     .drop_duplicates(subset=["Channel Attribute Id"])
-            # )
-            selected_df = (
-                attribute_df[attribute_df["Channel Attribute Id"].isin(selected_ids)]
-                .drop_duplicates(subset=["Channel Attribute Id", "Attribute Name"])
-                .reset_index(drop=True)
-            )
+            selected_df = select_attributes(attribute_df, pills_norm, selected_ids_hand)
             st.session_state["selected_df"] = selected_df
 
             # Auto-masquage de l'étape 3 si plus rien n'est sélectionné
@@ -366,69 +326,29 @@ with tab1:
                 attr_mapping_columns = st.session_state["attr_mapping_columns"]
 
                 # Pipeline de génération du template
-                fixed_columns = [
-                    "Channel Full Category Path", "Product Id", "Offer Code", "EAN", "Name", "Description", "Catalog Id"
-                ]
-
-                # Ajout pour extraction des images
-                # Ajouter les images présentes (dans l’ordre)
-                fixed_columns += [f"Image {i}" for i in range(1, 7) if f"Image {i}" in merged_df.columns]
-
-                selected_attr_cols = [row["Channel Attribute Id"] for _, row in selected_df.iterrows()]
-                attr_mapping_to_keep = [col for col in attr_mapping_columns if col in selected_attr_cols]
-                attr_mapping_to_drop = [col for col in attr_mapping_columns if col not in selected_attr_cols]
-                merged_df_ = merged_df.drop(columns=[col for col in attr_mapping_to_drop if col in merged_df.columns])
-
-                final_cols = (
-                    fixed_columns +
-                    override_columns +
-                    attr_mapping_to_keep +
-                    [col for col in selected_attr_cols if col not in override_columns + attr_mapping_to_keep]
-                )
-
-                for col in final_cols:
-                    if col not in merged_df_.columns:
-                        merged_df_[col] = ""
-
-                template_df = merged_df_[[col for col in final_cols if col in merged_df_.columns]]
-
-                # --- Nettoyage des doublons entre Cross Categories et catégorie spécifique ---
-                # Si un attribut apparaît plusieurs fois (même Channel Attribute Id),
-                # on garde la version qui n'appartient PAS à "Cross Categories"
-                if "Channel Origin Category Name" in selected_df.columns:
-                    selected_df = (
-                        selected_df.sort_values(
-                            by=["Channel Attribute Id", "Channel Origin Category Name"],
-                            key=lambda col: col.eq("Cross Categories"),  # True = CrossCat → passe après
-                            ascending=True
-                        )
-                        .drop_duplicates(subset=["Channel Attribute Id"], keep="first")
-                        .reset_index(drop=True)
+                client = st.session_state["client"]
+                metrics = client.metrics
+                with metrics.span("build_template_frame"):
+                    template_df, selected_df, duplicate_names = build_template_frame(
+                        merged_df, selected_df, override_columns, attr_mapping_columns
                     )
-                
+                    metrics.record_frame("template_df", template_df)
+
                 # (optionnel) avertissement si encore des doublons
-                dupes = selected_df[selected_df.duplicated(subset=["Channel Attribute Id"], keep=False)]
-                if not dupes.empty:
+                if duplicate_names:
                     st.warning(
                         f"⚠️ Certains attributs apparaissent encore en double : "
-                        f"{', '.join(dupes['Attribute Name'].unique())}"
+                        f"{', '.join(duplicate_names)}"
                     )
-                    
-                # Renommage des colonnes pour plus de clarté lors du remplissage
-                id_to_label = {
-                    row["Channel Attribute Id"]: f"{row['Attribute Name']} | {row['Channel Attribute Id']}"
-                    for _, row in selected_df.iterrows()
-                }
-                template_df = template_df.rename(columns=id_to_label)
-
-                # Mise à jour des session_states
-                client = st.session_state["client"]
 
                 # Génération du DataFrame des listes de valeurs
-                dropdown_df = build_dropdown_dataframe(client, catalog_id, selected_df)
+                with metrics.span("build_dropdown_dataframe"):
+                    dropdown_df = build_dropdown_dataframe(client, catalog_id, selected_df)
+                    metrics.record_frame("dropdown_df", dropdown_df)
 
                 # Génération du DataFrame des infos attributs
                 datainfo_df = build_datainfo_dataframe(selected_df)
+                metrics.record_frame("datainfo_df", datainfo_df, span="build_template_frame")
 
                 # Mise à jour des session_states
                 st.session_state["template_df"] = template_df
@@ -437,17 +357,8 @@ with tab1:
                 st.session_state["template_generated"] = True
 
             # --- Vérifie et corrige les doublons de colonnes avant affichage ---
-            if template_df.columns.duplicated().any():
-                seen = {}
-                new_cols = []
-                for col in template_df.columns:
-                    if col not in seen:
-                        seen[col] = 1
-                        new_cols.append(col)
-                    else:
-                        seen[col] += 1
-                        new_cols.append(f"{col}_{seen[col]}")  # rend unique
-                template_df.columns = new_cols
+            template_df, renamed_columns = dedupe_template_columns(template_df)
+            if renamed_columns:
                 st.warning(
                     "⚠️ Des colonnes en double ont été détectées et renommées automatiquement "
                     "(ex: 'Attribut | ID_2')."
@@ -458,23 +369,17 @@ with tab1:
 
             # Export du template au format Excel
             with tempfile.NamedTemporaryFile(delete=False, suffix=".xlsx") as tmpfile:
-                build_and_export_excel(
-                    template_df,
-                    datainfo_df,
-                    dropdown_df,
-                    output_file=tmpfile.name
-                )
+                with metrics.span("build_and_export_excel"):
+                    build_and_export_excel(
+                        template_df,
+                        datainfo_df,
+                        dropdown_df,
+                        output_file=tmpfile.name
+                    )
                 tmpfile.seek(0)
 
                 # === Calcul du nom de fichier personnalisé ===
-                today_str = datetime.now().strftime("%Y-%m-%d")
-                store_name = st.session_state.get("store_name", "")
-                if not store_name:
-                    store_name_safe = "no_name"
-                else:
-                    store_name_safe = "".join(c for c in store_name if c.isalnum() or c in ("_", "-")).strip().lower()
-                nb_products = len(template_df)
-                filename = f"template_{store_name_safe}_{today_str} [{nb_products} products].xlsx"
+                filename = template_filename(st.session_state.get("store_name", ""), len(template_df))
 
                 st.download_button(
                     label="Télécharger le template Excel",
@@ -498,200 +403,110 @@ with tab2:
             "Template **rempli** (Excel)", type=["xlsx"], key="upload_filled_template_live"
         )
 
-    # Helpers parsing / normalisation
-    def extract_attr_id(col_name: str) -> str | None:
-        """En-tête 'Label | AttributeId' -> AttributeId, sinon None (colonne fixe)."""
-        if not isinstance(col_name, str):
-            return None
-        parts = [p.strip() for p in col_name.split("|", 1)]
-        return parts[1] if len(parts) == 2 and parts[1] else None
-
-    def normalize_cell_value(v) -> str:
-        """'code | label' -> 'code'; sinon valeur strippée; vide -> ''."""
-        if v is None or (isinstance(v, float) and pd.isna(v)):
-            return ""
-        s = str(v).strip()
-        if not s:
-            return ""
-        if "|" in s:
-            return s.split("|", 1)[0].strip()
-        return s
-
-    # ---- Baseline live : on récupère l'état courant via l'API (sur base des EANs du template) ----
-    def fetch_current_state_by_eans(client: BeezUPClient, catalog_id: str, eans: list[str]) -> tuple[dict, dict]:
-        """
-        Retourne deux dicts :
-          overrides[(product_id, attribute_id)] = valeur override actuelle (normalisée)
-          effective[(product_id, attribute_id)] = valeur effective actuelle (override si présent, sinon mapping) (normalisée)
-        """
-        from beezup.extractor import extract_products
-        overrides, effective = {}, {}
-
-        if not eans:
-            return overrides, effective
-
-        product_infos = extract_products(client, catalog_id, eans)
-        for prod in product_infos:
-            pid = str(prod.get("productId", "")).strip()
-            if not pid:
-                continue
-            ov = prod.get("overrides", {}) or {}
-            mp = prod.get("attributeMappingValue", {}) or {}
-
-            # overrides
-            for attr_id, obj in ov.items():
-                val = normalize_cell_value(obj.get("override", "")) if isinstance(obj, dict) else ""
-                if val:
-                    overrides[(pid, attr_id)] = val
-                    effective[(pid, attr_id)] = val
-
-            # mapping si pas d’override
-            for attr_id, obj in mp.items():
-                if (pid, attr_id) in effective:
-                    continue
-                val = normalize_cell_value(obj.get("attributeMappingValue", "")) if isinstance(obj, dict) else ""
-                if val:
-                    effective[(pid, attr_id)] = val
-
-        return overrides, effective
-
-    def build_payloads_from_template_with_live_baseline(filled_df: pd.DataFrame) -> list[dict]:
+    def compute_diff_plan(uploaded_template, plan_key) -> dict:
         """
-        Construit la liste des payloads à envoyer, en s'assurant que :
-          - TOUTES les clés déjà en override sont renvoyées (même si identiques)
-          - Les nouvelles valeurs du template écrasent celles des overrides
-          - Les attributs non overridés ne sont envoyés que si différents du baseline effectif
+        Lit le template, récupère l'état courant et calcule les payloads ;
+        le plan est conservé en session sous plan_key.
         """
-        # map colonnes -> attribute ids
-        dynamic_map = {j: extract_attr_id(c) for j, c in enumerate(filled_df.columns) if extract_attr_id(c)}
-
-        # garde-fous
-        for req in ["Product Id", "Catalog Id"]:
-            if req not in filled_df.columns:
-                raise ValueError(f"Colonne obligatoire manquante : '{req}'")
-
-        # baseline live à partir des EANs
-        eans = []
-        if "EAN" in filled_df.columns:
-            eans = [str(x).strip() for x in filled_df["EAN"].dropna().astype(str).tolist() if str(x).strip()]
-            eans = list(dict.fromkeys(eans))  # unique
-
-        client = BeezUPClient(api_key)
-        overrides_live, effective_live = fetch_current_state_by_eans(client, catalog_id, eans) if eans else ({}, {})
-
-        rows_out = []
-        for _, row in filled_df.iterrows():
-            product_id = str(row.get("Product Id", "")).strip()
-            catalog_id_row = str(row.get("Catalog Id", "")).strip()
-            ean_row = str(row.get("EAN", "")).strip() if "EAN" in filled_df.columns else ""
-            if not product_id or not catalog_id_row:
-                continue
-
-            # 1) point de départ : TOUTES les clés déjà en override pour ce produit
-            payload = {attr_id: val for (pid, attr_id), val in overrides_live.items() if pid == product_id}
-
-            # 2) appliquer les valeurs du template
-            for j, attr_id in dynamic_map.items():
-                if not attr_id:
-                    continue
-                colname = filled_df.columns[j]
-                norm_val = normalize_cell_value(row.get(colname, None))
-                if not norm_val:
-                    continue
-
-                key = (product_id, attr_id)
-                base_eff = effective_live.get(key, "")
-                in_override = key in overrides_live
-                before = overrides_live.get(key, base_eff)
-
-                if in_override:
-                    # déjà overridé : on renvoie ce qui est dans le template (même si identique)
-                    payload[attr_id] = norm_val
-                else:
-                    # pas d’override existant : envoyer seulement si diff de l’effectif
-                    if norm_val != base_eff:
-                        payload[attr_id] = norm_val
-
-            rows_out.append({
-                "EAN": ean_row,
-                "Product Id": product_id,
-                "Catalog Id": catalog_id_row,
-                "payload": payload,
-                "count": len(payload)
-            })
-        return rows_out
+        metrics = make_client().metrics
+        try:
+            with metrics.span("read_template"):
+                template = scan_template(uploaded_template)
+        except Exception as e:
+            st.error(f"Impossible de lire le fichier Excel : {e}")
+            st.stop()
+
+        with st.spinner("Analyse du template & récupération de l’état courant…"), template:
+            try:
+                # Baseline live : état courant récupéré via l'API sur base des EANs du template
+                with metrics.span("plan_overrides"):
+                    candidates = plan_overrides(make_client(), catalog_id, template)
+            except IncompleteExtractionError as e:
+                # Baseline partielle : on n'envoie rien, les overrides manquants seraient écrasés
+                st.error(f"❌ {e} Envoi impossible sur un état courant partiel, réessaie dans quelques instants.")
+                st.stop()
+
+        plan = {"key": plan_key, "candidates": candidates, "computed_at": time.time()}
+        st.session_state["diff_plan"] = plan
+        return plan
 
     # --- Analyse + envoi ---
     if uploaded_template is not None:
         with st.container(border=True):
             st.subheader("\u2777 Préparation et envoi des mises à jour")
 
-            try:
-                filled_df = pd.read_excel(uploaded_template)
-            except Exception as e:
-                st.error(f"Impossible de lire le fichier Excel : {e}")
-                st.stop()
-
-            with st.spinner("Analyse du template & récupération de l’état courant…"):
-                candidates = build_payloads_from_template_with_live_baseline(filled_df)
-
-            total_rows = len(candidates)
-            total_updates = sum(c["count"] for c in candidates)
-            st.write(f"- **Produits détectés** : {total_rows}")
+            # Plan de diff mémorisé par (contenu du fichier, catalogue, clé API) : les relances,
+            # dont celle déclenchée par le bouton d'envoi, réutilisent le plan au lieu de tout recalculer
+            plan_key = (hashlib.sha256(uploaded_template.getvalue()).hexdigest(), catalog_id, api_key_hash)
+            plan = st.session_state.get("diff_plan")
+            plan_age = time.time() - plan["computed_at"] if plan else None
+
+            col_plan, col_recompute = st.columns([4, 1])
+            recompute = col_recompute.button("\u21bb Recalculer", key="recompute_diff_plan")
+            if plan is None or plan["key"] != plan_key or plan_age > DIFF_PLAN_MAX_AGE or recompute:
+                plan = compute_diff_plan(uploaded_template, plan_key)
+                plan_age = 0.0
+            col_plan.caption(f"*Plan calculé il y a {int(plan_age // 60)} min sur l'état courant BeezUP.*")
+            candidates = plan["candidates"]
+
+            # Produits dont le payload final est identique aux overrides en place : rien à envoyer
+            to_send, unchanged = split_noop(candidates)
+            total_updates = sum(c["count"] for c in to_send)
+            st.write(f"- **Produits détectés** : {len(candidates)}")
+            st.write(f"- **Produits à mettre à jour** : {len(to_send)}")
+            st.write(f"- **Produits sans changement (non envoyés)** : {len(unchanged)}")
+            st.write(f"- **Attributs modifiés (total)** : {sum(c.get('changes', 0) for c in to_send)}")
             st.write(f"- **Attributs envoyés (total)** : {total_updates}")
 
             recap = pd.DataFrame([
-                {"EAN": c["EAN"], "Attributs envoyés": c["count"]}
-                for c in candidates
+                {"EAN": c["EAN"], "Attributs modifiés": c.get("changes", 0), "Attributs envoyés": c["count"]}
+                for c in to_send
             ])
             st.dataframe(recap, hide_index=True, use_container_width=True)
+            if unchanged:
+                with st.expander(f"Produits sans changement ({len(unchanged)})"):
+                    st.dataframe(
+                        pd.DataFrame([{"EAN": c["EAN"], "Product Id": c["Product Id"]} for c in unchanged]),
+                        hide_index=True, use_container_width=True
+                    )
 
             # Bouton d’envoi
+            recheck = st.checkbox(
+                "Revérifier l'état courant avant l'envoi",
+                key="recheck_before_send",
+                help="Recalcule le plan juste avant l'envoi (utile si les produits ont pu être modifiés entre-temps)."
+            )
             if st.button("③ Envoyer dans BeezUP", type="primary"):
-                if not candidates or total_updates == 0:
-                    st.warning("Aucune valeur à envoyer.")
+                if recheck:
+                    plan = compute_diff_plan(uploaded_template, plan_key)
+                    to_send, unchanged = split_noop(plan["candidates"])
+                if not to_send:
+                    st.warning("Aucune valeur à envoyer : les overrides en place correspondent déjà au template.")
                     st.stop()
 
-                client = BeezUPClient(api_key)
-                status_rows = []
+                client = make_client()
                 progress = st.progress(0.0, text="Envoi en cours…")
 
-                for i, c in enumerate(candidates, start=1):
-                    product_id = c["Product Id"]
-                    ean = c["EAN"]
-                    catalog_id_row = c["Catalog Id"]
-                    payload = c["payload"]
-
-                    if not payload:
-                        status_rows.append({
-                            "EAN": ean,
-                            "Product Id": product_id,
-                            "Count": 0,
-                            "Status": "— (aucun changement)"
-                        })
-                        progress.progress(i / len(candidates))
-                        continue
-
-                    route = f"/user/channelCatalogs/{catalog_id_row}/products/{product_id}/overrides"
-                    try:
-                        client.put(route, data=payload)
-                        status_rows.append({
-                            "EAN": ean,
-                            "Product Id": product_id,
-                            "Count": len(payload),
-                            "Status": "OK"
-                        })
-                    except Exception as e:
-                        status_rows.append({
-                            "EAN": ean,
-                            "Product Id": product_id,
-                            "Count": len(payload),
-                            "Status": f"Erreur: {e}"
-                        })
-
-                    progress.progress(i / len(candidates))
-
-                st.success("Envoi terminé.")
+                last_refresh = [0.0]
+
+                def show_progress(done, total, rate, eta):
+                    # Rafraîchissement limité à ~5 fois par seconde
+                    now = time.monotonic()
+                    if done < total and now - last_refresh[0] < 0.2:
+                        return
+                    last_refresh[0] = now
+                    progress.progress(
+                        done / total,
+                        text=f"Envoi en cours… {done}/{total} produits — {rate:.1f} produits/s — reste ~{int(eta)} s"
+                    )
+
+                with client.metrics.span("push_overrides"):
+                    status_rows = push_overrides(client, to_send, on_progress=show_progress)
+                # Les overrides ont changé : le plan et les produits mémorisés sont périmés
+                st.session_state.pop("diff_plan", None)
+                forget_products(client, catalog_id, [c["Product Id"] for c in to_send])
+
+                st.success(f"Envoi terminé ({len(unchanged)} produit(s) sans changement non envoyé(s)).")
                 st.dataframe(pd.DataFrame(status_rows), hide_index=True, use_container_width=True)
 
     else:
@@ -703,6 +518,65 @@ with tab2:
             )
 
 
+# ---------- INSTRUMENTATION ---------- #
+def render_metrics_panel(container):
+    """
+    Mesures de la session (session_metrics) : durée des étapes, appels API par endpoint
+    (nombre, octets, latence), dimensions des DataFrames ; export JSON.
+    Rendu avant l'onglet 3, qui interrompt le script tant qu'aucun attribut n'est saisi.
+    """
+    if not api_key:
+        return
+    metrics = session_metrics()
+    with container.expander("📊 Instrumentation"):
+        if st.button("Remettre à zéro", key="reset_metrics"):
+            metrics.reset()
+        snapshot = metrics.snapshot()
+        if not snapshot["spans"] and not snapshot["endpoints"]:
+            st.caption("*Aucune mesure pour l'instant.*")
+            return
+
+        st.markdown("**Étapes**")
+        st.dataframe(pd.DataFrame([
+            {"Étape": span["name"], "Durée (s)": span["seconds"], "Erreur": span["error"] or ""}
+            for span in reversed(snapshot["spans"])
+        ]), hide_index=True)
+
+        st.markdown("**Appels API**")
+        st.dataframe(pd.DataFrame([
+            {
+                "Endpoint": name,
+                "Requêtes": e["requests"],
+                "Erreurs": e["errors"],
+                "Ko reçus": round(e["bytes_received"] / 1024, 1),
+                "Moyenne (s)": e["mean_seconds"],
+                "Max (s)": e["max_seconds"]
+            }
+            for name, e in snapshot["endpoints"].items()
+        ]), hide_index=True)
+        counters = snapshot["counters"]
+        st.caption(
+            f"*Cache : {counters.get('cache_hit', 0)} réponse(s) servie(s), "
+            f"{counters.get('not_modified', 0)} revalidée(s) — {counters.get('throttled', 0)} réponse(s) 429/503*"
+        )
+
+        if snapshot["frames"]:
+            st.markdown("**DataFrames**")
+            st.dataframe(pd.DataFrame([
+                {"DataFrame": f["label"], "Étape": f["span"] or "", "Lignes": f["rows"], "Colonnes": f["columns"]}
+                for f in reversed(snapshot["frames"])
+            ]), hide_index=True)
+
+        st.download_button(
+            "Exporter en JSON",
+            data=metrics.to_json(),
+            file_name=f"beezup_metrics_{time.strftime('%Y%m%d_%H%M%S')}.json",
+            mime="application/json",
+            key="export_metrics"
+        )
+
+render_metrics_panel(metrics_panel)
+
 # ---------- TAB3 : MAPPER LES ATTRIBUTS NON MAPPÉS ----------
 with tab3:
     st.title("🧩 Mapping automatique des attributs non mappés")
@@ -712,8 +586,8 @@ with tab3:
         st.info("Renseigne la **clé API** et le **Channel Catalog ID** dans la barre latérale pour continuer.")
         st.stop()
 
-    client = BeezUPClient(api_key)
-    store_id, channel_id = get_store_and_channel_ids(client, catalog_id)
+    client = make_client()
+    store_id, channel_id = resolve_store_and_channel_ids(client, catalog_id)
 
     with st.container(border=True):
         st.subheader("Liste des Channel Attribute Id à mapper")
@@ -729,48 +603,66 @@ with tab3:
             key=st.session_state["attr_text_key"]
         )
         
-        attrs_to_map = [a.strip() for a in attr_text.splitlines() if a.strip()]
+        # IDs saisis dédoublonnés : coller deux fois la même liste ne change rien
+        attrs_to_map = parse_attribute_ids(attr_text)
 
         if not attrs_to_map:
             st.info("📝 Renseigne au moins un Channel Attribute Id ci-dessus.")
             st.stop()
 
-        st.write(f"**{len(attrs_to_map)} attribut(s)** à mapper seront associés au champ personnalisé vide.")
-
-        if st.button("Mapper les attributs", type="primary"):       
-            with st.spinner("Vérification / création du champ personnalisé vide..."):
-                # 1️⃣ Vérifie s’il existe déjà un champ perso vide
-                custom_columns = client.get_custom_columns(store_id) or {}
-                custom_id = None
-                for col in custom_columns.get("customColumns", []):
-                    if col.get("userColumName") == "Champ perso vide généré par API":
-                        custom_id = col.get("id")
-                        break
-        
-                # Sinon, création automatique
-                if not custom_id:
-                    custom_id = client.create_custom_column(store_id)
-                    if not custom_id:
-                        st.error("❌ Impossible de créer le champ personnalisé vide.")
-                        st.stop()
+        # Validation des IDs sur l'index des attributs du catalogue (conservé pour les relances)
+        attribute_indexes = st.session_state.setdefault("attribute_indexes", {})
+        if catalog_id not in attribute_indexes or st.session_state.get("refresh_cache", False):
+            attribute_index = AttributeIndex.fetch(client, catalog_id, refresh=st.session_state.get("refresh_cache", False))
+            if attribute_index is not None:
+                attribute_indexes[catalog_id] = attribute_index
+        attribute_index = attribute_indexes.get(catalog_id)
+        if attribute_index is None:
+            st.error("❌ Impossible de récupérer les attributs du catalogue pour valider les IDs.")
+            st.stop()
 
+        unknown = [attr_id for attr_id in attrs_to_map if attr_id not in attribute_index]
+        valid_count = len(attrs_to_map) - len(unknown)
+        st.write(f"**{valid_count} attribut(s)** à mapper seront associés au champ personnalisé vide.")
+        if unknown:
+            st.warning(f"⚠️ {len(unknown)} ID(s) inconnu(s) dans ce catalogue, ignoré(s) : {', '.join(unknown[:20])}"
+                       + (" …" if len(unknown) > 20 else ""))
+
+        keep_existing = st.checkbox(
+            "Conserver les mappings existants",
+            key="keep_existing_mappings",
+            help="Par défaut, les attributs déjà mappés sur une autre colonne sont réassociés au champ "
+                 "personnalisé vide ; cochée, leur mapping actuel est conservé."
+        )
+
+        if st.button("Mapper les attributs", type="primary", disabled=valid_count == 0):
             with st.spinner("Préparation du mapping et envoi à BeezUP..."):
-                # 2️⃣ Récupère le mapping actuel
-                mapping_data = client.get_channel_catalog_data(catalog_id) or {}
-                existing = mapping_data.get("columnMappings", [])
-
-                # 3️⃣ Prépare le nouveau mapping complet
-                new_payload = existing + [
-                    {"channelColumnId": attr_id, "catalogColumnId": custom_id}
-                    for attr_id in attrs_to_map
-                ]
+                # Champ perso vide (recherché, créé si besoin), mapping actuel fusionné par channelColumnId,
+                # un seul PUT et seulement si quelque chose change
+                try:
+                    with client.metrics.span("apply_column_mappings"):
+                        result = apply_column_mappings(
+                            client, catalog_id, store_id, attrs_to_map, attribute_index, keep_existing=keep_existing
+                        )
+                except ValueError as e:
+                    st.error(f"❌ {e}")
+                    st.stop()
 
-                # 4️⃣ Envoie la mise à jour
-                resp = client.update_column_mapping(catalog_id, new_payload)
-                if resp.status_code in (200, 204):
-                    st.success(f"✅ {len(attrs_to_map)} attribut(s) ont été associés au champ personnalisé vide.")
-                else:
-                    st.error(f"❌ Erreur API ({resp.status_code}) : {resp.text}")
+            if result["error"]:
+                st.error(f"❌ Erreur API ({result['status_code']}) : {result['error']}")
+            elif not result["sent"]:
+                st.info("Aucun changement : le mapping est déjà à jour, rien n'a été envoyé.")
+            else:
+                st.success(f"✅ {len(result['added']) + len(result['remapped'])} attribut(s) ont été associés au champ personnalisé vide.")
+            if result["created"]:
+                st.caption("*Champ personnalisé vide créé.*")
+            st.write(f"- **Déjà associés** : {len(result['already'])}")
+            if result["mapped_elsewhere"]:
+                st.write(f"- **Déjà mappés sur une autre colonne (conservés)** : {len(result['mapped_elsewhere'])}")
+            if result["remapped"]:
+                st.write(f"- **Réassociés** : {len(result['remapped'])}")
+            if result["duplicates_removed"]:
+                st.write(f"- **Doublons supprimés du mapping existant** : {result['duplicates_removed']}")
 
 
     
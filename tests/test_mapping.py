@@ -0,0 +1,59 @@
+from beezup.mapping import AttributeIndex, parse_attribute_ids, plan_column_mappings
+
+INDEX = AttributeIndex([
+    {"attributes": [{"channelAttributeId": "a1"}, {"channelAttributeId": "a2"}]},
+    {"attributes": [{"channelAttributeId": "a1"}, {"channelAttributeId": "a3"}, {"channelAttributeId": "a4"}]},
+])
+
+def _mapping(attr_id, column_id):
+    return {"channelColumnId": attr_id, "catalogColumnId": column_id}
+
+def test_index_deduplicates_attributes():
+    assert len(INDEX) == 4
+    assert "a3" in INDEX and "zz" not in INDEX
+
+def test_parse_attribute_ids_strips_and_deduplicates():
+    assert parse_attribute_ids(" a1\na2\n\na1 \n") == ["a1", "a2"]
+
+def test_new_attributes_are_added():
+    plan = plan_column_mappings([_mapping("x", "other")], ["a1", "a2"], "empty", INDEX)
+    assert plan["added"] == ["a1", "a2"]
+    assert plan["changed"]
+    assert plan["payload"] == [_mapping("x", "other"), _mapping("a1", "empty"), _mapping("a2", "empty")]
+
+def test_attribute_mapped_elsewhere_is_remapped_by_default():
+    plan = plan_column_mappings([_mapping("a1", "other")], ["a1"], "empty", INDEX)
+    assert plan["remapped"] == ["a1"] and plan["mapped_elsewhere"] == []
+    assert plan["payload"] == [_mapping("a1", "empty")]
+    assert plan["changed"]
+
+def test_keep_existing_skips_attribute_mapped_elsewhere():
+    plan = plan_column_mappings([_mapping("a1", "other")], ["a1"], "empty", INDEX, keep_existing=True)
+    assert plan["mapped_elsewhere"] == ["a1"] and plan["remapped"] == []
+    assert plan["payload"] == [_mapping("a1", "other")]
+    assert not plan["changed"]
+
+def test_already_mapped_attributes_need_no_put():
+    existing = [_mapping("a1", "empty"), _mapping("a2", "empty")]
+    plan = plan_column_mappings(existing, ["a1", "a2", "a1"], "empty", INDEX)
+    assert plan["already"] == ["a1", "a2"]
+    assert plan["payload"] == existing
+    assert not plan["changed"]
+
+def test_unknown_ids_are_skipped():
+    plan = plan_column_mappings([], ["zz", "a3"], "empty", INDEX)
+    assert plan["unknown"] == ["zz"]
+    assert plan["payload"] == [_mapping("a3", "empty")]
+
+def test_mapping_without_catalog_column_is_added():
+    plan = plan_column_mappings([{"channelColumnId": "a4", "catalogColumnId": None}], ["a4"], "empty", INDEX)
+    assert plan["added"] == ["a4"]
+    assert plan["payload"] == [_mapping("a4", "empty")]
+
+def test_duplicate_existing_mappings_are_merged():
+    existing = [_mapping("a1", "empty"), _mapping("x", "other"), _mapping("a1", "empty")]
+    plan = plan_column_mappings(existing, ["a1"], "empty", INDEX)
+    assert plan["duplicates_removed"] == 1
+    assert plan["payload"] == [_mapping("x", "other"), _mapping("a1", "empty")]
+    # Le nettoyage des doublons suffit à justifier l'envoi
+    assert plan["changed"]
@@ -0,0 +1,77 @@
+import pandas as pd
+import pytest
+
+from benchmarks.mock_api import FIRST_EAN, MockBeezUP, STORE_ID
+from beezup.client import BeezUPClient
+from beezup.extractor import extract_octopia_product_fields, extract_products
+from beezup.frames import build_product_frame
+from beezup.pipeline import catalog_column_ids, merge_octopia_fields
+from beezup.snapshots import ProductSnapshotStore, extract_products_incremental
+
+CATALOG_ID = "catalog-test"
+# Produits dont l'EAN catalogue diffère de l'EAN canal demandé
+MISMATCHED = {3, 7}
+
+@pytest.fixture
+def server():
+    server = MockBeezUP(n_products=40, n_attributes=30, n_categories=5).start()
+    catalog_values = server.catalog.catalog_values
+
+    def values(product_id):
+        values = catalog_values(product_id)
+        if int(product_id.split("-")[1]) in MISMATCHED:
+            values["col-ean"] = "0" + values["col-ean"]
+        return values
+
+    server.catalog.catalog_values = values
+    yield server
+    server.stop()
+
+@pytest.fixture
+def client(server):
+    client = BeezUPClient("test", rate_limit=1000)
+    client.BASE_URL = server.base_url
+    with client:
+        yield client
+
+@pytest.fixture
+def store(tmp_path):
+    return ProductSnapshotStore(str(tmp_path / "snapshots.sqlite"))
+
+def _merged(product_infos, octopia_df):
+    product_df, override_columns, attr_mapping_columns = build_product_frame(product_infos, CATALOG_ID)
+    return merge_octopia_fields(product_df, octopia_df, override_columns, attr_mapping_columns)
+
+def _full(client, eans):
+    column_ids = catalog_column_ids(client, STORE_ID)
+    product_infos = extract_products(client, CATALOG_ID, eans)
+    product_ids = [info["productId"] for info in product_infos]
+    return _merged(product_infos, extract_octopia_product_fields(client, STORE_ID, column_ids, product_ids))
+
+def _incremental(client, store, eans, **kwargs):
+    column_ids = catalog_column_ids(client, STORE_ID)
+    return _merged(*extract_products_incremental(client, store, CATALOG_ID, STORE_ID, column_ids, eans, **kwargs))
+
+def test_forced_refresh_matches_full_extraction(client, store, server):
+    eans = server.catalog.eans(40)[::-1]
+    pd.testing.assert_frame_equal(_incremental(client, store, eans, max_age=0), _full(client, eans))
+
+def test_partial_reuse_matches_full_extraction(client, store, server):
+    eans = server.catalog.eans(40)
+    _incremental(client, store, eans[:25])
+    server.reset_counts()
+    stats = {}
+    merged = _incremental(client, store, eans, stats=stats)
+    assert stats["cached_eans"] == 25 and stats["fetched_eans"] == 15
+    pd.testing.assert_frame_equal(merged, _full(client, eans))
+
+def test_mismatched_catalog_ean_is_reused(client, store, server):
+    eans = [str(FIRST_EAN + i) for i in (1, 3, 7, 9)]
+    first = _incremental(client, store, eans)
+    assert len(first) == 4
+    server.reset_counts()
+    stats = {}
+    second = _incremental(client, store, eans, stats=stats)
+    assert stats["fetched_eans"] == 0
+    assert "products" not in server.reset_counts()
+    pd.testing.assert_frame_equal(second, first)
@@ -0,0 +1,72 @@
+import openpyxl
+import pytest
+
+from benchmarks.mock_api import MockBeezUP
+from beezup.client import BeezUPClient
+from beezup.diff import is_duplicate_header
+from beezup.frames import _mapping_label, build_product_frame
+from beezup.overrides import split_noop
+from beezup.pipeline import generate_template, plan_overrides, scan_template
+
+CATALOG_ID = "catalog-test"
+STATUSES = ["Required", "Recommended", "Optional"]
+
+@pytest.fixture
+def client():
+    server = MockBeezUP(n_products=300, n_attributes=60, n_value_lists=3, values_per_list=20, n_categories=5).start()
+    client = BeezUPClient("test", rate_limit=1000)
+    client.BASE_URL = server.base_url
+    client.server = server
+    with client:
+        yield client
+    server.stop()
+
+@pytest.fixture
+def template_file(client, tmp_path):
+    path = str(tmp_path / "template.xlsx")
+    generate_template(client, CATALOG_ID, client.server.catalog.eans(300), path, statuses=STATUSES)
+    return path
+
+def _plan(client, path):
+    with scan_template(path) as template:
+        return split_noop(plan_overrides(client, CATALOG_ID, template))
+
+def test_unedited_template_sends_nothing(client, template_file):
+    to_send, unchanged = _plan(client, template_file)
+    assert to_send == []
+    assert len(unchanged) == 300
+
+def test_edited_cells_are_the_only_updates(client, template_file, tmp_path):
+    workbook = openpyxl.load_workbook(template_file)
+    sheet = workbook["Template"]
+    headers = [cell.value for cell in sheet[1]]
+    column = next(i for i, name in enumerate(headers, start=1) if name and "| attr-" in name)
+    for row in range(2, 12):
+        sheet.cell(row=row, column=column, value="valeur modifiée")
+    edited = str(tmp_path / "edited.xlsx")
+    workbook.save(edited)
+
+    to_send, _ = _plan(client, edited)
+    assert len(to_send) == 10
+    assert sum(candidate["changes"] for candidate in to_send) == 10
+
+def test_missing_mapping_is_blank():
+    assert _mapping_label({}) == ""
+    assert _mapping_label({"attributeMappingValue": None, "catalogValue": None}) == ""
+    assert _mapping_label({"attributeMappingValue": "m", "catalogValue": "c"}) == "m | c"
+
+def test_override_wins_over_mapping():
+    product_df, override_columns, attr_mapping_columns = build_product_frame([
+        {"productId": "p1", "overrides": {"a": {"override": "o"}},
+         "attributeMappingValue": {"a": {"attributeMappingValue": "m", "catalogValue": "c"}}},
+        {"productId": "p2", "attributeMappingValue": {"a": {"attributeMappingValue": "m", "catalogValue": "c"}}},
+    ], CATALOG_ID)
+    assert override_columns == ["a"] and attr_mapping_columns == []
+    assert product_df["a"].tolist() == ["o", "m | c"]
+
+def test_duplicate_headers_are_not_attributes():
+    columns = {"Couleur | attr-1", "Couleur | attr-1_2", "Couleur | attr-1.1", "Taille | attr_2"}
+    assert is_duplicate_header("Couleur | attr-1_2", columns)
+    assert is_duplicate_header("Couleur | attr-1.1", columns)
+    assert not is_duplicate_header("Couleur | attr-1", columns)
+    assert not is_duplicate_header("Taille | attr_2", columns)